@@ -4,6 +4,30 @@ from __future__ import unicode_literals
 import re
 
 
+# Each pass below matches exactly what the corresponding pass of the original regular expressions matched,
+# written so that the regex engine does not backtrack, or replaced by str.replace() for literal strings.
+ts_re = re.compile(r'\\ts(-s)*\s*\\\*\s*', flags=re.UNICODE | re.MULTILINE)
+zaln_s_re = re.compile(r'\\zaln-s[^*]*\*', flags=re.UNICODE | re.MULTILINE)
+k_s_re = re.compile(r'\\k-s[^\\\n]*(?:\\(?!\*)[^\\\n]*)*\\\*', flags=re.UNICODE | re.MULTILINE)
+w_re = re.compile(r'\\w ([^|]+)\|[^\\\n]*(?:\\(?!w\*)[^\\\n]*)*\\w\*', flags=re.UNICODE | re.MULTILINE)
+
+# Clean up bad USFM data and fix punctuation
+cleanup_passes = [
+    (re.compile(r'  +', flags=re.UNICODE | re.MULTILINE), ' '),
+    (re.compile(r"\s*' s(?!\w)", flags=re.UNICODE | re.MULTILINE), "'s"),
+    (re.compile(r'\\s5', flags=re.UNICODE | re.MULTILINE), ''),
+    (re.compile(r'\\fqa([^*]+)\\fqa(?![*])', flags=re.UNICODE | re.MULTILINE), r'\\fqa\1\\fqa*'),
+]
+chapter_split_re = re.compile(r'\\c ')
+quote_re = re.compile(r'\s*"\s*([^"]+)\s*"\s*', flags=re.UNICODE | re.MULTILINE | re.DOTALL)
+final_passes = [
+    (re.compile(r'\\(\w+\**)([^\w* \n])', flags=re.UNICODE | re.MULTILINE), r'\\\1 \2'),  # \\q1" => \q1 "
+    (re.compile(r" ' ", flags=re.UNICODE | re.MULTILINE), r" '"),
+    (re.compile(r' +([:;.?,!\]})-])', flags=re.UNICODE | re.MULTILINE), r'\1'),
+    (re.compile(r'([{(\[-]) +', flags=re.UNICODE | re.MULTILINE), r'\1'),
+]
+
+
 def unalign_usfm(aligned_usfm):
     """
     Converts an aligned USFM string to an unaligned USFM compatible string
@@ -11,31 +35,30 @@ def unalign_usfm(aligned_usfm):
     :return: the unaligned USFM of the string
     """
     # Remove all tags used for alignments and words
-    usfm = re.sub(r'\\ts(-s)*\s*\\\*\s*', r'', aligned_usfm, flags=re.UNICODE | re.MULTILINE)
-    usfm = re.sub(r'\\zaln-s[^*]*?\*', r'', usfm, flags=re.UNICODE | re.MULTILINE)
-    usfm = re.sub(r'\\zaln-e\\\*', r'', usfm, flags=re.UNICODE | re.MULTILINE)
-    usfm = re.sub(r'\\k-s.*?\\\*', r'', usfm, flags=re.UNICODE | re.MULTILINE)
-    usfm = re.sub(r'\\k-e\\\*', r'', usfm, flags=re.UNICODE | re.MULTILINE)
-    usfm = re.sub(r'\\w ([^|]+)\|.*?\\w\*', r'\1', usfm, flags=re.UNICODE | re.MULTILINE)
-    usfm = re.sub(r'^\n', '', usfm, flags=re.UNICODE | re.MULTILINE)
-    usfm = re.sub(r'^([^\\].*)\n(?=[^\\])', r'\1 ', usfm, flags=re.UNICODE | re.MULTILINE)
-    usfm = re.sub(r'^\\(.*)\n(?=[^\\])', r'\\\1 ', usfm, flags=re.UNICODE | re.MULTILINE)
-    usfm = re.sub(r'  +', ' ', usfm, flags=re.UNICODE | re.MULTILINE)
-
-    # Clean up bad USFM data and fixing punctuation
-    usfm = re.sub(r"\s*' s(?!\w)", "'s", usfm, flags=re.UNICODE | re.MULTILINE)
-    usfm = re.sub(r'\\s5', '', usfm, flags=re.UNICODE | re.MULTILINE)
-    usfm = re.sub(r'\\fqa([^*]+)\\fqa(?![*])', r'\\fqa\1\\fqa*', usfm, flags=re.UNICODE | re.MULTILINE)
+    usfm = ts_re.sub('', aligned_usfm) if '\\ts' in aligned_usfm else aligned_usfm
+    usfm = zaln_s_re.sub('', usfm)
+    usfm = usfm.replace('\\zaln-e\\*', '')
+    if '\\k-' in usfm:
+        usfm = k_s_re.sub('', usfm)
+        usfm = usfm.replace('\\k-e\\*', '')
+    usfm = w_re.sub(lambda match: match.group(1), usfm)    # faster than a template replacement
+
+    # Drop empty lines, and join each line that does not start with a marker to the line before it
+    lines = usfm.split('\n')
+    lines = [line for line in lines[:-1] if line] + lines[-1:]
+    parts = [lines[0]]
+    for line in lines[1:]:
+        parts.append(' ' if line and line[0] != '\\' else '\n')
+        parts.append(line)
+    usfm = ''.join(parts)
+
+    for pattern, replacement in cleanup_passes:
+        usfm = pattern.sub(replacement, usfm)
 
     # Pair up quotes by chapter
-    chapters = re.compile(r'\\c ').split(usfm)
-    usfm = chapters[0]
-    for chapter in chapters[1:]:
-        chapter = re.sub(r'\s*"\s*([^"]+)\s*"\s*', r' "\1" ', chapter, flags=re.UNICODE | re.MULTILINE | re.DOTALL)
-        usfm += '\\c {0}'.format(chapter)
-    usfm = re.sub(r'\\(\w+\**)([^\w* \n])', r'\\\1 \2', usfm, flags=re.UNICODE | re.MULTILINE)  # \\q1" => \q1 "
-    usfm = re.sub(r" ' ", r" '", usfm, flags=re.UNICODE | re.MULTILINE)
-    usfm = re.sub(r' +([:;.?,!\]})-])', r'\1', usfm, flags=re.UNICODE | re.MULTILINE)
-    usfm = re.sub(r'([{(\[-]) +', r'\1', usfm, flags=re.UNICODE | re.MULTILINE)
+    chapters = chapter_split_re.split(usfm)
+    usfm = '\\c '.join(chapters[:1] + [quote_re.sub(r' "\1" ', chapter) for chapter in chapters[1:]])
+    for pattern, replacement in final_passes:
+        usfm = pattern.sub(replacement, usfm)
 
     return usfm.strip()
@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+# Bulk stream editor, used by streamEdit.py.
+# Applies a list of regular expression rules to every matching file under a folder, in a pool of worker processes.
+# Each rule is a regular expression substitution on the whole text of a file, or on each line of it the way
+# convertByLine() in streamEdit.py does. The rules are applied in order, so the result of one rule is the input of the next.
+# A rule has key substrings, at least one of which occurs in any text the rule can change. They are derived from
+# the pattern unless they are given. Rules whose keys do not occur are skipped, and files in which no key occurs
+# are not decoded at all.
+# Files are read and written as streamEdit.py reads and writes them, with \n line endings.
+# Only files that actually change are written. Each is written to a temporary file that then replaces the original,
+# after the original is copied to a .orig backup file unless there is one already.
+# In a dry run, no files are written; the result just reports what would change.
+# The same module is used in the usfm and md folders.
+
+import io
+import os
+import re
+import shutil
+try:
+    import re._parser as sre_parse
+except ImportError:     # before Python 3.11
+    import sre_parse
+
+class Rule:
+    # pattern is a regular expression, compiled or not. replacement is as for re.sub().
+    # keys is a list of strings, at least one of which occurs in any text that the rule changes.
+    # If keys is not given, the longest string that every match of the pattern contains is the key,
+    # and if there is no such string, the rule is tried on every file.
+    # count is the maximum number of substitutions per file, 0 for no limit.
+    # With byLine, the rule is applied to each line as convertByLine() does: after each substitution the pattern
+    # is searched for again from the start of the line, until it is not found or count substitutions have been
+    # made in the line.
+    def __init__(self, name, pattern, replacement, keys=None, count=0, byLine=False):
+        self.name = name
+        self.pattern = re.compile(pattern) if isinstance(pattern, str) else pattern
+        self.replacement = replacement
+        self.keys = keys if keys is not None else patternKeys(self.pattern)
+        self.count = count
+        self.byLine = byLine
+
+# Returns [the longest literal string that every match of the pattern contains], or None if there is none.
+# Only the literal characters at the top level of the pattern, or in groups at the top level that do not ignore case,
+# are considered.
+def patternKeys(pattern):
+    if not isinstance(pattern.pattern, str) or pattern.flags & re.IGNORECASE:
+        return None
+    runs = [""]
+    def addLiterals(items):
+        for (op, av) in items:
+            if op == sre_parse.LITERAL:
+                runs[-1] += chr(av)
+            elif op == sre_parse.SUBPATTERN and not av[1] & re.IGNORECASE:
+                addLiterals(av[-1])
+            else:
+                runs.append("")
+    addLiterals(sre_parse.parse(pattern.pattern, pattern.flags))
+    key = max(runs, key=len)
+    return [key] if key else None
+
+# The result of editFolder()
+class EditResult:
+    def __init__(self):
+        self.nFiles = 0         # number of files scanned
+        self.changed = []       # the files that were changed, or would be changed in a dry run, in order
+        self.hits = dict()      # the number of substitutions made by each rule, by rule name
+        self.skipped = 0        # number of files that would change but were left alone because of max_changes
+
+    # Writes a summary of the result to the stream.
+    def report(self, stream, dry_run=False):
+        verb = "Would change" if dry_run else "Changed"
+        for path in self.changed:
+            stream.write(f"{verb} {path}\n")
+        for (name, count) in self.hits.items():
+            stream.write(f"  {name}: {count} substitution(s)\n")
+        stream.write(f"{verb} {len(self.changed)} of {self.nFiles} files.\n")
+        if self.skipped:
+            stream.write(f"{self.skipped} more file(s) not changed because of the maximum number of changes.\n")
+
+# Applies the rules to the text.
+# Returns the new text, and the number of substitutions made by each rule that made any.
+def applyRules(text, rules):
+    hits = dict()
+    for rule in rules:
+        if rule.keys is None or any(key in text for key in rule.keys):
+            if rule.byLine:
+                (text, n) = subLines(rule, text)
+            else:
+                (text, n) = rule.pattern.subn(rule.replacement, text, count=rule.count)
+            if n:
+                hits[rule.name] = n
+    return (text, hits)
+
+# Applies a byLine rule to each line of the text.
+# Returns the new text and the number of substitutions made.
+def subLines(rule, text):
+    lines = text.split('\n')
+    n = 0
+    for i in range(len(lines)):
+        line = lines[i] + '\n' if i < len(lines) - 1 else lines[i]
+        nLine = 0
+        sub = rule.pattern.search(line)
+        while sub and (rule.count == 0 or nLine < rule.count):
+            replacement = rule.replacement(sub) if callable(rule.replacement) else sub.expand(rule.replacement)
+            line = line[0:sub.start()] + replacement + line[sub.end():]
+            nLine += 1
+            sub = rule.pattern.search(line)
+        lines[i] = line
+        n += nLine
+    return ("".join(lines), n)
+
+# Returns True if none of the rules can change the file, judging by its contents as bytes, with \n line endings.
+def noKeys(contents, rules):
+    for rule in rules:
+        if rule.keys is None or any(key.encode('utf-8') in contents for key in rule.keys):
+            return False
+    return True
+
+# Applies the rules to one file. Writes the file only if write is True and the text changes.
+# Returns (path, substitutions made by each rule, whether the text changes).
+def editFile(path, rules, write, backup=True):
+    with open(path, 'rb') as input:
+        contents = input.read()
+    if b'\r' in contents:
+        contents = contents.replace(b'\r\n', b'\n').replace(b'\r', b'\n')     # as read in text mode
+    if noKeys(contents, rules):
+        return (path, {}, False)
+    text = contents.decode('utf-8-sig')
+    (newtext, hits) = applyRules(text, rules)
+    changed = (newtext != text)
+    if changed and write:
+        replaceFile(path, newtext, backup)
+    return (path, hits, changed)
+
+# Replaces the file with the text, after making a backup copy of the original.
+def replaceFile(path, text, backup):
+    tmppath = f"{path}.{os.getpid()}.tmp"
+    try:
+        with io.open(tmppath, "tw", encoding='utf-8', newline='\n') as output:
+            output.write(text)
+        if backup:
+            bakpath = path + ".orig"
+            if not os.path.isfile(bakpath):
+                shutil.copy2(path, bakpath)
+        os.replace(tmppath, path)
+    finally:
+        if os.path.exists(tmppath):
+            os.remove(tmppath)
+
+# Returns the paths of the files under the folder whose names match filename_re, in the order they are edited.
+def listFiles(folder, filename_re):
+    paths = []
+    for entry in os.listdir(folder):
+        if entry[0] != '.':
+            path = os.path.join(folder, entry)
+            if os.path.isdir(path):
+                paths += listFiles(path, filename_re)
+            elif filename_re.match(entry):
+                paths.append(path)
+    return paths
+
+def editFileWorker(args):
+    return editFile(*args)
+
+# Applies the rules to each file under the folder whose name matches filename_re.
+# Changes at most max_changes files, the first ones in folder order, if max_changes is given.
+# Uses the specified number of worker processes, or edits the files in this process if workers is 1.
+# Returns an EditResult.
+def editFolder(folder, rules, filename_re, workers=None, dry_run=False, backup=True, max_changes=None):
+    paths = listFiles(folder, filename_re)
+    result = EditResult()
+    result.nFiles = len(paths)
+    # With a limit on the number of changes, the files are scanned first, and only the first ones that change are written.
+    write = not dry_run and max_changes is None
+    outcomes = mapFiles([(path, rules, write, backup) for path in paths], workers)
+    changed = [(path, hits) for (path, hits, isChanged) in outcomes if isChanged]
+    if max_changes is not None and len(changed) > max_changes:
+        result.skipped = len(changed) - max_changes
+        changed = changed[:max_changes]
+    if max_changes is not None and not dry_run:
+        outcomes = mapFiles([(path, rules, True, backup) for (path, hits) in changed], workers)
+        changed = [(path, hits) for (path, hits, isChanged) in outcomes if isChanged]
+    for (path, hits) in changed:
+        result.changed.append(path)
+        for (name, n) in hits.items():
+            result.hits[name] = result.hits.get(name, 0) + n
+    return result
+
+# Calls editFile() with each of the arguments, in worker processes if there is more than one worker.
+# Returns the results in order.
+def mapFiles(arglist, workers):
+    if workers == 1 or len(arglist) < 2:
+        return [editFile(*args) for args in arglist]
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(editFileWorker, arglist, chunksize=32))
@@ -57,6 +57,7 @@ nChanged = 0
 max_files = 11111
 
 import substitutions    # change substitutions modules as necessary; generic one is just "substitutions"
+from substituter import Substituter
 
 suppress1 = False       # Suppress hash mark cleanup
 suppress2 = False       # Suppress stdout informational messages
@@ -417,20 +418,19 @@ def preliminary_cleanup(text):
 
     return text
 
-# Applies the substitutions found in substitutions.py, plus two that are language specific
+substituters = dict()      # the compiled substitutions for each language_code
+
+# Applies the substitutions found in substitutions.py, plus some that are language specific
 def substitution(text):
-    if language_code != 'en':
-#        fromstr = "rc://" + language_code + "/"
-#        text = text.replace(fromstr, "rc://*/")
-#        fromstr = "rc://" + language_code + " /"
-#        text = text.replace(fromstr, "rc://*/")
-        substitutions.subs.append(	("rc://" + language_code + "/", "rc://*/") )
-        substitutions.subs.append(	("rc://" + language_code + " /", "rc://*/") )
-        substitutions.subs.append(	("rc:// " + language_code + "/", "rc://*/") )
-        substitutions.subs.append(	("rc://en/", "rc://*/") )
-
-    for pair in substitutions.subs:
-        text = text.replace(pair[0], pair[1])
+    if language_code not in substituters:
+        subs = list(substitutions.subs)
+        if language_code != 'en':
+            subs.append(	("rc://" + language_code + "/", "rc://*/") )
+            subs.append(	("rc://" + language_code + " /", "rc://*/") )
+            subs.append(	("rc:// " + language_code + "/", "rc://*/") )
+            subs.append(	("rc://en/", "rc://*/") )
+        substituters[language_code] = Substituter(subs)
+    text = substituters[language_code].apply(text)
     if resource_type == 'tq':
         text = text.replace("\n\n\n", "\n\n")
     return text
@@ -10,6 +10,7 @@ import os
 import codecs
 import string
 import sys
+import bulkedit
 
 # Globals
 source_dir = r'C:\DCS\Urdu-Deva\ur-deva_tn.RPP'
@@ -24,6 +25,8 @@ yes_backup = True
 # The matches occur in sequence, so the result of one match impacts the next.
 inlinekey = []
 inlinekey.append( re.compile(r'(##+ )', flags=re.UNICODE) )
+# What each match at the start of a line is replaced with, as for match.expand()
+inlinereplacement = ""
 
 # Copies lines from input to output.
 # Modifies targeted input lines before writing them to output.
@@ -43,7 +46,7 @@ def convertByLine(path):
         for i in range(len(inlinekey)):
             sub = inlinekey[i].match(line)
             if sub:
-                line = line[len(sub.group(1)):]
+                line = sub.expand(inlinereplacement) + line[sub.end():]
         output.write(line)
     output.close
 
@@ -200,6 +203,18 @@ replacement = ""
 #sub_re = re.compile(r'[Ll]ih?at[\s]*\:+[\s]*\n+[\s]*\[\[', re.UNICODE)
 #sub_re = re.compile(r'# +[\*]+(.*)[\*]+', re.UNICODE)
 
+# Set use_bulkedit to edit the files with these rules instead of convertFile(), in parallel.
+# The rules make the same changes as convertByLine(), from inlinekey and inlinereplacement:
+# one substitution per key, at the start of each line.
+# For the changes of convertFileBySub() instead, use bulkedit.Rule("sub_re", sub_re, replacement).
+# The rules are applied in order. Files that do not contain a key string of any rule, which bulkedit derives
+# from the patterns, are skipped quickly. A dry run (or --dry-run) reports the changes without writing files.
+use_bulkedit = False
+dry_run = False
+workers = os.cpu_count()
+rules = [bulkedit.Rule(f"inlinekey[{i}]", re.compile("^(?:" + key.pattern + ")", key.flags), inlinereplacement, count=1, byLine=True)
+         for (i, key) in enumerate(inlinekey)]
+
 # Stream edit the file by a simple, regular expression substitution
 # To do only one substitution per file, change the count argument to re.sub(), below.
 def convertFileBySub(path):
@@ -245,8 +260,19 @@ def convertFolder(folder):
 
 # Processes all .txt files in specified directory, one at a time
 if __name__ == "__main__":
+    if "--dry-run" in sys.argv:
+        sys.argv.remove("--dry-run")
+        dry_run = True
+    if dry_run and not use_bulkedit:
+        sys.stderr.write("A dry run reports the changes of the bulk edit rules. Set use_bulkedit to use them.\n")
+        sys.exit(-1)
     if len(sys.argv) > 1 and sys.argv[1] != 'hard-coded-path':
         source_dir = sys.argv[1]
+
+    if use_bulkedit and source_dir and os.path.isdir(source_dir):
+        result = bulkedit.editFolder(source_dir, rules, filename_re, workers, dry_run, yes_backup, max_changes)
+        result.report(sys.stdout, dry_run)
+        sys.exit(0)
     
     if source_dir and os.path.isdir(source_dir):
         convertFolder(source_dir)
@@ -257,4 +283,4 @@ if __name__ == "__main__":
         convertFile(path)
         sys.stdout.write("Done. Changed " + str(nChanged) + " files.\n")
     else:
-        sys.stderr.write("Usage: python streamEdit.py <folder>\n  Use . for current folder.\n")
+        sys.stderr.write("Usage: python streamEdit.py <folder> [--dry-run]\n  Use . for current folder.\n")
@@ -14,16 +14,17 @@ import os
 import re
 import logging
 import tempfile
+import time
 import markdown2
 import shutil
 import subprocess
 import string
-import requests
 import sys
 import argparse
 import jsonpickle
 import yaml
 from collections import OrderedDict
+from functools import lru_cache
 from typing import List, Type
 from bs4 import BeautifulSoup
 from abc import abstractmethod
@@ -31,6 +32,7 @@ from weasyprint import HTML, LOGGER
 from .resource import Resource, Resources
 from .rc_link import ResourceContainerLink
 from ..general_tools.file_utils import write_file, read_file, load_json_object
+from ..general_tools.image_cache import ImageCache
 
 DEFAULT_LANG_CODE = 'en'
 DEFAULT_OWNER = 'unfoldingWord'
@@ -41,6 +43,26 @@ LANGUAGE_FILES = {
 }
 APPENDIX_LINKING_LEVEL = 1
 APPENDIX_RESOURCES = ['ta', 'tw']
+HIGHLIGHT_SEPARATOR_RE = re.compile(r'\s*…\s*|\s*\.\.\.\s*')
+
+
+@lru_cache(maxsize=8192)
+def get_highlight_pattern(part, span_tolerant):
+    """
+    Compiles the pattern that PdfConverter.highlight_text() splits a text with to highlight one part of a phrase.
+    Compiled patterns are kept for the rest of the run, since the same quotes are highlighted in many texts.
+    :param str part: The part of the phrase, between ellipses
+    :param bool span_tolerant: True if the text has spans, which may then come between the words of the part
+    :return: The compiled pattern, and the part itself if the pattern only matches the part as it is, otherwise None
+    """
+    escaped_part = re.escape(part)
+    if span_tolerant:
+        split_pattern = '(' + re.sub('(\\\\ +)', r'(\\s+|(\\s*</*span[^>]*>\\s*)+)', escaped_part) + ')'
+    else:
+        split_pattern = '(' + escaped_part + ')'
+    literal = part if split_pattern == '(' + escaped_part + ')' else None
+    split_pattern += '(?![^<]*>)'  # don't match within HTML tags
+    return re.compile(split_pattern), literal
 
 
 class PdfConverter:
@@ -59,6 +81,8 @@ class PdfConverter:
         self.save_dir = None
         self.log_dir = None
         self.images_dir = None
+        self.image_cache_dir = None
+        self.image_cache = None
         self.output_res_dir = None
 
         self.bad_links = {}
@@ -226,6 +250,12 @@ class PdfConverter:
         if not os.path.isdir(self.images_dir):
             os.makedirs(self.images_dir)
 
+        if 'IMAGE_CACHE_DIR' in os.environ:
+            self.image_cache_dir = os.environ['IMAGE_CACHE_DIR']
+            self.logger.info(f'Using env var IMAGE_CACHE_DIR: {self.image_cache_dir}')
+        else:
+            self.image_cache_dir = os.path.join(self.output_dir, 'image_cache')
+
         self.save_dir = os.path.join(self.output_res_dir, 'save')
         if not os.path.isdir(self.save_dir):
             os.makedirs(self.save_dir)
@@ -272,16 +302,7 @@ class PdfConverter:
                 body_html += self.get_appendix_html(self.resources['ta'])
             if 'tw' in self.resources:
                 body_html += self.get_appendix_html(self.resources['tw'])
-            self.logger.info('Fixing links in body HTML...')
-            body_html = self.fix_links(body_html)
-            body_html = self._fix_links(body_html)
-            self.logger.info('Replacing RC links in body HTML...')
-            body_html = self.replace_rc_links(body_html)
-            self.logger.info('Generating Contributors HTML...')
-            body_html += self.get_contributors_html()
-            body_html = self.download_all_images(body_html)
-            self.logger.info('Generating TOC HTML...')
-            body_html, toc_html = self.get_toc_html(body_html)
+            body_html, toc_html = self.process_body_html(body_html)
 
             with open(os.path.join(self.converters_dir, 'templates/template.html')) as template_file:
                 html_template = string.Template(template_file.read())
@@ -477,21 +498,88 @@ class PdfConverter:
         else:
             return {}
 
+    def get_html_stages(self):
+        """
+        Returns the stages that post-process the body HTML, in order, as (description, kind, function).
+        A 'text' stage takes the HTML and returns the new HTML. A 'dom' stage takes the parsed BeautifulSoup tree,
+        changes it in place, and may return a result. All the dom stages work on the same tree, which is parsed
+        after the last text stage and serialized once at the end.
+        """
+        return [
+            ('Fixing links in body HTML', 'text', self.fix_links),
+            ('Fixing URLs in body HTML', 'text', self._fix_links),
+            ('Replacing RC links in body HTML', 'text', self.replace_rc_links),
+            ('Generating Contributors HTML', 'text', lambda html: html + self.get_contributors_html()),
+            ('Downloading images', 'dom', self.download_all_images_in_soup),
+            ('Generating TOC HTML', 'dom', self.get_toc_html_from_soup),
+        ]
+
+    def process_body_html(self, body_html):
+        """
+        Runs the stages of get_html_stages() on the body HTML, and logs the time each took.
+        :param body_html: the HTML of the body, with the appendices
+        :return: [body HTML, TOC HTML]
+        """
+        timings = []
+        results = {}
+        soup = None
+        for description, kind, function in self.get_html_stages():
+            self.logger.info(f'{description}...')
+            start = time.perf_counter()
+            if kind == 'text':
+                body_html = function(body_html)
+            else:
+                if soup is None:
+                    soup = BeautifulSoup(body_html, 'html.parser')
+                    timings.append(('Parsing body HTML', time.perf_counter() - start))
+                    start = time.perf_counter()
+                results[function] = function(soup)
+            timings.append((description, time.perf_counter() - start))
+        if soup is not None:
+            start = time.perf_counter()
+            body_html = str(soup)
+            timings.append(('Serializing body HTML', time.perf_counter() - start))
+        for description, seconds in timings:
+            self.logger.info(f'{description}: {seconds:.2f}s')
+        return [body_html, results.get(self.get_toc_html_from_soup, '')]
+
     def download_all_images(self, html):
+        soup = BeautifulSoup(html, 'html.parser')
+        self.download_all_images_in_soup(soup)
+        return str(soup)
+
+    def download_all_images_in_soup(self, soup):
         img_dir = os.path.join(self.images_dir, f'{self.main_resource.repo_name}_images')
         os.makedirs(img_dir, exist_ok=True)
-        soup = BeautifulSoup(html, 'html.parser')
+        imgs_by_url = {}
+        filenames = {}
         for img in soup.find_all('img'):
             if img['src'].startswith('http'):
                 url = img['src']
-                filename = re.search(r'/([\w_-]+[.](jpg|gif|png))$', url).group(1)
+                if url not in filenames:
+                    match = re.search(r'/([\w_-]+[.](jpg|gif|png))$', url)
+                    filenames[url] = match.group(1) if match else None
+                    if not match:
+                        self.logger.error(f'Image not included in the PDF, no image file name: {url}')
+                if filenames[url]:
+                    imgs_by_url.setdefault(url, []).append(img)
+        if not imgs_by_url:
+            return
+        if not self.image_cache:
+            self.image_cache = ImageCache(self.image_cache_dir, logger=self.logger)
+        cached_paths = self.image_cache.fetch_all(imgs_by_url.keys())
+        for url, imgs in imgs_by_url.items():
+            filename = filenames[url]
+            filepath = os.path.join(img_dir, filename)
+            if cached_paths[url]:
+                self.image_cache.copy(cached_paths[url], filepath)
+            elif os.path.isfile(filepath):
+                self.logger.warning(f'Could not download image {url}, using {filepath}')
+            else:
+                self.logger.error(f'Image not included in the PDF: {url}')
+                continue
+            for img in imgs:
                 img['src'] = f'images/{self.main_resource.repo_name}_images/{filename}'
-                filepath = os.path.join(img_dir, filename)
-                if not os.path.exists(filepath):
-                    with open(filepath, 'wb') as f:
-                        response = requests.get(url)
-                        f.write(response.content)
-        return str(soup)
 
     @abstractmethod
     def get_body_html(self):
@@ -503,12 +591,20 @@ class PdfConverter:
                 return rc
 
     def get_toc_html(self, body_html):
+        soup = BeautifulSoup(body_html, 'html.parser')
+        toc_html = self.get_toc_html_from_soup(soup)
+        return [str(soup), toc_html]
+
+    def get_toc_html_from_soup(self, soup):
+        """
+        Returns the HTML of the table of contents of the body, and adds the running heading before each header in it.
+        :param soup: the BeautifulSoup tree of the body HTML, which is changed in place
+        """
         toc_html = f'''
 <article id="contents">
     {self.toc_title}
 '''
         prev_toc_level = 0
-        soup = BeautifulSoup(body_html, 'html.parser')
         done = {}
         heading_titles = [None, None, None, None, None, None]
         for header in soup.find_all(re.compile(r'^h\d'), {'class': 'section-header'}):
@@ -552,7 +648,7 @@ class PdfConverter:
         for level in range(prev_toc_level, 0, -1):
             toc_html += '</li>\n</ul>\n'
         toc_html += '</article>'
-        return [str(soup), toc_html]
+        return toc_html
 
     def get_cover_html(self):
         if self.project_id:
@@ -639,19 +735,18 @@ class PdfConverter:
 
     @staticmethod
     def highlight_text(text, phrase):
-        parts = re.split(r'\s*…\s*|\s*\.\.\.\s*', phrase)
+        parts = HIGHLIGHT_SEPARATOR_RE.split(phrase)
+        span_tolerant = '<span' in text
         processed_text = ''
         to_process_text = text
         for idx, part in enumerate(parts):
             if not part.strip():
                 continue
-            escaped_part = re.escape(part)
-            if '<span' in text:
-                split_pattern = '(' + re.sub('(\\\\ +)', r'(\\s+|(\\s*</*span[^>]*>\\s*)+)', escaped_part) + ')'
+            split_re, literal = get_highlight_pattern(part, span_tolerant)
+            if literal is not None and literal not in to_process_text:
+                splits = [to_process_text]
             else:
-                split_pattern = '(' + escaped_part + ')'
-            split_pattern += '(?![^<]*>)'  # don't match within HTML tags
-            splits = re.split(split_pattern, to_process_text, 1)
+                splits = split_re.split(to_process_text, 1)
             processed_text += splits[0]
             if len(splits) > 1:
                 highlight_classes = "highlight"
@@ -668,6 +763,20 @@ class PdfConverter:
             processed_text += to_process_text
         return processed_text
 
+    @staticmethod
+    def can_highlight(text, phrase):
+        """
+        Returns True if highlight_text() would highlight anything of the phrase in the text, without highlighting it.
+        That is the case when the first part of the phrase is found, since later parts are only looked for after it.
+        """
+        for part in HIGHLIGHT_SEPARATOR_RE.split(phrase):
+            if part.strip():
+                split_re, literal = get_highlight_pattern(part, '<span' in text)
+                if literal is not None and literal not in text:
+                    return False
+                return split_re.search(text) is not None
+        return False
+
     def highlight_text_with_phrases(self, orig_text, phrases, rc, ignore=None):
         highlighted_text = orig_text
         phrases.sort(key=len, reverse=True)
@@ -695,8 +804,8 @@ class PdfConverter:
                     phrase.replace('’', "'"),
                     # All right pointing curly single quotes made straight
                     phrase.replace('‘', "'")]
-                for alt_phrase in alt_phrase:
-                    if orig_text != self.highlight_text(orig_text, alt_phrase):
+                for alt_phrase in OrderedDict.fromkeys(alt_phrase):
+                    if self.can_highlight(orig_text, alt_phrase):
                         bad_highlights[phrase] = alt_phrase
                         break
                 self.add_bad_highlight(rc, orig_text, bad_highlights)
@@ -14,7 +14,8 @@ import os
 import re
 from datetime import datetime
 from ..general_tools.file_utils import write_file, read_file, load_json_object, unzip, load_yaml_object
-from ..general_tools.usfm_utils import usfm3_to_usfm2
+from ..general_tools.usfm_index import get_usfm2_verses
+from ..general_tools.verse_objects import load_book_chapters, AlignmentIndex, find_target_from_split
 from .pdf_converter import PdfConverter, run_converter
 
 
@@ -24,6 +25,7 @@ class TnPdfConverter(PdfConverter):
         super().__init__(*args, **kwargs)
         self.chapters_and_verses = {}
         self.verse_usfm = {}
+        self.book_chapters = {}
         self.chunks_text = {}
         self.resource_data = {}
         self.rc_lookup = {}
@@ -112,42 +114,12 @@ class TnPdfConverter(PdfConverter):
         self.populate_verse_usfm_ust()
 
     def populate_verse_usfm_ust(self):
-        book_data = {}
         book_file = os.path.join(self.resources['ust'].repo_dir, f'{self.book_number}-{self.book_id.upper}.usfm')
-        usfm3 = read_file(book_file)
-        usfm2 = usfm3_to_usfm2(usfm3)
-        chapters = usfm2.split(r'\c ')
-        for chapter_usfm in chapters[1:]:
-            chapter = int(re.findall('(\d+)', chapter_usfm)[0])
-            book_data[chapter] = {}
-            chapter_usfm = r'\c '+chapter_usfm
-            verses = chapter_usfm.split(r'\v ')
-            for verseUsfm in verses[1:]:
-                verse = int(re.findall('(\d+)', verseUsfm)[0])
-                verseUsfm = r'\v '+verseUsfm
-                if re.match(r'^\\v \d+\s*$', verseUsfm, flags=re.MULTILINE):
-                    verseUsfm = ''
-                book_data[chapter][verse] = verseUsfm
-        self.verse_usfm[self.ust_id] = book_data
+        self.verse_usfm[self.ust_id] = get_usfm2_verses(book_file, self.save_dir)
 
     def populate_verse_usfm_ult(self):
-        bookData = {}
         book_file = os.path.join(self.ult_dir, '{0}-{1}.usfm'.format(self.book_number, self.book_id.upper()))
-        usfm3 = read_file(book_file)
-        usfm2 = usfm3_to_usfm2(usfm3)
-        chapters = usfm2.split(r'\c ')
-        for chapterUsfm in chapters[1:]:
-            chapter = int(re.findall('(\d+)', chapterUsfm)[0])
-            bookData[chapter] = {}
-            chapterUsfm = r'\c '+chapterUsfm
-            verses = chapterUsfm.split(r'\v ')
-            for verseUsfm in verses[1:]:
-                verse = int(re.findall('(\d+)', verseUsfm)[0])
-                verseUsfm = r'\v '+verseUsfm
-                if re.match(r'^\\v \d+\s*$', verseUsfm, flags=re.MULTILINE):
-                    verseUsfm = ''
-                bookData[chapter][verse] = verseUsfm
-        self.verse_usfm[self.ult_id] = bookData
+        self.verse_usfm[self.ult_id] = get_usfm2_verses(book_file, self.save_dir)
 
     def populate_chapters_and_verses(self):
         versification_file = os.path.join(self.versification_dir, '{0}.json'.format(self.book_id))
@@ -453,108 +425,43 @@ class TnPdfConverter(PdfConverter):
         new_html += footer_html
         return new_html
 
+    def get_book_chapters(self, resource):
+        if resource not in self.book_chapters:
+            bible = self.resources[resource]
+            book_file = os.path.join(bible.repo_dir, f'{self.book_number}-{self.book_id.upper()}.usfm')
+            cache_file = os.path.join(self.save_dir, f'{bible.repo_name}_{self.book_id}_{bible.commit}_verse_objects.json')
+            self.book_chapters[resource] = load_book_chapters(book_file, cache_file)
+        return self.book_chapters[resource]
+
     def get_all_words_to_match(self, resource, chapter, verse):
-        path = '{0}/{1}/{2}.json'.format(
-            get_latest_version(os.path.join(self.tn_resources_dir, '{0}/bibles/{1}'.format(self.lang_code, resource))),
-            self.book_id, chapter)
         words = []
-        data = load_json_object(path)
+        data = self.get_book_chapters(resource)[str(chapter)]
         chapter = int(chapter)
         if chapter in self.tw_words_data and verse in self.tw_words_data[chapter]:
             context_ids = self.tw_words_data[int(chapter)][int(verse)]
             verse_objects = data[str(verse)]['verseObjects']
+            alignment_index = AlignmentIndex(verse_objects)
             for context_id in context_ids:
-                aligned_text = self.get_aligned_text(verse_objects, context_id, False)
+                aligned_text = self.get_aligned_text(verse_objects, context_id, False, alignment_index)
                 if aligned_text:
                     words.append({'text': aligned_text, 'contextId': context_id})
         return words
 
     def find_target_from_combination(self, verse_objects, quote, occurrence):
-        ol_words = []
-        word_list = []
-        for verse_object in verse_objects:
-            if 'content' in verse_object and 'type' in verse_object and verse_object['type'] == 'milestone':
-                ol_words.append(verse_object['content'])
-                target_words = []
-                for child in verse_object['children']:
-                    if child['type'] == 'word':
-                        target_words.append(child['text'])
-                target = ' '.join(target_words)
-                found = False
-                for idx, word in enumerate(word_list):
-                    if word['ol'] == verse_object['content'] and 'occurrence' in verse_object and \
-                            word['occurrence'] == verse_object['occurrence']:
-                        word_list[idx]['target'] += ' ... ' + target
-                        found = True
-                if not found:
-                    word_list.append({'ol': verse_object['content'], 'target': target, 'occurrence': verse_object['occurrence']})
-        combinations = []
-        occurrences = {}
-        for i in range(0, len(word_list)):
-            ol = word_list[i]['ol']
-            target = word_list[i]['target']
-            for j in range(i, len(word_list)):
-                if i != j:
-                    ol += ' '+word_list[j]['ol']
-                    target += ' '+word_list[j]['target']
-                if ol not in occurrences:
-                    occurrences[ol] = 0
-                occurrences[ol] += 1
-                combinations.append({'ol': ol, 'target': target, 'occurrence': occurrences[ol]})
-        for combination in combinations:
-            if combination['ol'] == quote and combination['occurrence'] == occurrence:
-                return combination['target']
-        return None
+        return AlignmentIndex(verse_objects).find_target_from_combination(quote, occurrence)
 
     def find_target_from_split(self, verse_objects, quote, occurrence, is_match=False):
-        words_to_match = []
-        if isinstance(quote, list):
-            for q in quote:
-                words_to_match.append(q['word'])
-        else:
-            words_to_match = quote.split(' ')
-        separator = ' '
-        needs_ellipsis = False
-        text = ''
-        for index, verse_object in enumerate(verse_objects):
-            last_match = False
-            if 'type' in verse_object and (verse_object['type'] == 'milestone' or verse_object['type'] == 'word'):
-                if ((('content' in verse_object and verse_object['content'] in words_to_match) or ('lemma' in verse_object and verse_object['lemma'] in words_to_match)) and verse_object['occurrence'] == occurrence) or is_match:
-                    last_match = True
-                    if needs_ellipsis:
-                        separator += '... '
-                        needs_ellipsis = False
-                    if text:
-                        text += separator
-                    separator = ' '
-                    if 'text' in verse_object and verse_object['text']:
-                        text += verse_object['text']
-                    if 'children' in verse_object and verse_object['children']:
-                        text += self.find_target_from_split(verse_object['children'], quote, occurrence, True)
-                elif 'children' in verse_object and verse_object['children']:
-                    child_text = self.find_target_from_split(verse_object['children'], quote, occurrence, is_match)
-                    if child_text:
-                        last_match = True
-                        if needs_ellipsis:
-                            separator += '... '
-                            needs_ellipsis = False
-                        text += (separator if text else '') + child_text
-                        separator = ' '
-                    elif text:
-                        needs_ellipsis = True
-            if last_match and (index+1) in verse_objects and verse_objects[index + 1]['type'] == "text" and text:
-                if separator == ' ':
-                    separator = ''
-                separator += verse_objects[index + 1]['text']
-        return text
+        return find_target_from_split(verse_objects, quote, occurrence, is_match)
 
-    def get_aligned_text(self, verse_objects, context_id, is_match=False):
+    def get_aligned_text(self, verse_objects, context_id, is_match=False, alignment_index=None):
         if not verse_objects or not context_id or 'quote' not in context_id or not context_id['quote']:
             return ''
-        text = self.find_target_from_combination(verse_objects, context_id['quote'], context_id['occurrence'])
+        if alignment_index is None:
+            alignment_index = AlignmentIndex(verse_objects)
+        text = alignment_index.find_target_from_combination(context_id['quote'], context_id['occurrence'])
         if text:
             return text
-        text = self.find_target_from_split(verse_objects, context_id['quote'], context_id['occurrence'])
+        text = alignment_index.find_target_from_split(context_id['quote'], context_id['occurrence'])
         if text:
             return text
         rc = 'rc://{0}/{1}/bible/{2}/{3}/{4}'.format(self.lang_code, self.ult_id, self.book_id,
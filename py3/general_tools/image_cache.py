@@ -0,0 +1,167 @@
+"""
+Shared, content-addressed cache of downloaded images, with a concurrent downloader.
+
+Each image is stored once under objects/, named by the SHA-256 of its content, and each URL has an entry under
+urls/, named by the SHA-256 of the URL, that records the object and the ETag and Last-Modified headers it was
+fetched with. Converters of any language or resource that use the same cache directory share the images.
+An entry younger than max_age is used without a request. An older one is revalidated with If-None-Match and
+If-Modified-Since, and is still used if the server cannot be reached.
+All files are written to a temporary file first and then renamed, so several processes can share the cache.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class ImageCache:
+
+    def __init__(self, cache_dir, max_workers=8, retries=3, backoff_factor=0.5, timeout=(10, 60), max_age=86400,
+                 session=None, logger=None):
+        """
+        :param str cache_dir: The directory of the cache, which is created if needed
+        :param int max_workers: The maximum number of images downloaded at the same time
+        :param int retries: The number of times a failed request is retried
+        :param float backoff_factor: The delay before the first retry, in seconds, which doubles with each retry
+        :param tuple timeout: The connect and read timeouts of each request, in seconds
+        :param int max_age: The age in seconds after which a cached image is revalidated
+        :param requests.Session session: The session to use, instead of a new pooled session
+        :param logging.Logger logger: The logger to report failed downloads to
+        """
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.max_age = max_age
+        self.logger = logger if logger else logging.getLogger(__name__)
+        self.objects_dir = os.path.join(cache_dir, 'objects')
+        self.urls_dir = os.path.join(cache_dir, 'urls')
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.urls_dir, exist_ok=True)
+        if not session:
+            session = requests.Session()
+            retry = Retry(total=retries, backoff_factor=backoff_factor, status_forcelist=[429, 500, 502, 503, 504],
+                          raise_on_status=False)
+            adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers, max_retries=retry)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+        self.session = session
+
+    def entry_path(self, url):
+        return os.path.join(self.urls_dir, hashlib.sha256(url.encode('utf-8')).hexdigest() + '.json')
+
+    def object_path(self, digest):
+        return os.path.join(self.objects_dir, digest)
+
+    def read_entry(self, url):
+        """
+        :param str url: The URL of the image
+        :return: The cache entry of the URL, or None if the URL is not cached or its object is missing
+        """
+        try:
+            with open(self.entry_path(url)) as entry_file:
+                entry = json.load(entry_file)
+        except (OSError, ValueError):
+            return None
+        if entry.get('url') != url or not os.path.isfile(self.object_path(entry.get('object', ''))):
+            return None
+        return entry
+
+    def write_entry(self, url, entry):
+        write_atomically(self.entry_path(url), json.dumps(entry).encode('utf-8'))
+
+    def fetch(self, url):
+        """
+        Returns the path of the cached image at the URL, downloading or revalidating it if needed.
+
+        :param str url: The URL of the image
+        :return: The path of the image in the cache, or None if it could not be downloaded
+        """
+        entry = self.read_entry(url)
+        if entry and time.time() - entry['fetched'] < self.max_age:
+            return self.object_path(entry['object'])
+        headers = {}
+        if entry and entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry and entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        try:
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
+            if entry and response.status_code == 304:
+                entry['fetched'] = time.time()
+                self.write_entry(url, entry)
+                return self.object_path(entry['object'])
+            response.raise_for_status()
+        except requests.RequestException as e:
+            if entry:
+                self.logger.warning(f'Could not revalidate image {url}, using the cached copy: {e}')
+                return self.object_path(entry['object'])
+            self.logger.error(f'Could not download image {url}: {e}')
+            return None
+        digest = hashlib.sha256(response.content).hexdigest()
+        object_path = self.object_path(digest)
+        if not os.path.isfile(object_path):
+            write_atomically(object_path, response.content)
+        self.write_entry(url, {
+            'url': url,
+            'object': digest,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'fetched': time.time()
+        })
+        return object_path
+
+    def fetch_all(self, urls):
+        """
+        Fetches the images at the URLs, up to max_workers at the same time.
+
+        :param urls: The URLs of the images. Each is fetched once, however often it occurs
+        :return: A dict of the path of each image in the cache, or None if it could not be downloaded, by URL
+        """
+        urls = list(dict.fromkeys(urls))
+        if len(urls) < 2:
+            return {url: self.fetch(url) for url in urls}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return dict(zip(urls, executor.map(self.fetch, urls)))
+
+    @staticmethod
+    def copy(cached_path, target_path):
+        """
+        Puts the cached image at the target path, as a hard link if possible, unless it is already there.
+
+        :param str cached_path: The path of the image in the cache, as returned by fetch()
+        :param str target_path: The path the image is needed at
+        """
+        if os.path.isfile(target_path) and (os.path.samefile(cached_path, target_path) or
+                                            os.path.getsize(cached_path) == os.path.getsize(target_path) and
+                                            file_digest(target_path) == os.path.basename(cached_path)):
+            return
+        tmp_path = f'{target_path}.{os.getpid()}.tmp'
+        try:
+            os.link(cached_path, tmp_path)
+        except OSError:
+            shutil.copyfile(cached_path, tmp_path)
+        os.replace(tmp_path, target_path)
+
+
+def write_atomically(path, content):
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def file_digest(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
@@ -0,0 +1,260 @@
+# coding=utf-8
+
+from __future__ import unicode_literals
+import mmap
+import os
+import re
+import struct
+from .usfm_utils import usfm3_to_usfm2
+
+# Sidecar file layout:
+#   header: magic, size and mtime (ns) of the indexed USFM file, number of entries
+#   entries: chapter, first verse, last verse, start offset, end offset
+# An entry with verse 0 covers a whole chapter, from its \c marker to the next \c marker or the end of the file.
+# Chapter 0, verse 0 covers the book header before the first \c marker.
+# A verse entry covers the verse from its \v marker to the next \v or \c marker or the end of the file.
+# Offsets are byte offsets into the UTF-8 file.
+INDEX_EXTENSION = '.usfmidx'
+INDEX_MAGIC = b'USFMIDX1'
+INDEX_HEADER = struct.Struct('<8sqqI')
+INDEX_ENTRY = struct.Struct('<HHHQQ')
+
+marker_re = re.compile(br'\\([cv])[ \t]+(\d+)(?:-(\d+))?')
+
+
+class UsfmIndex(object):
+    """
+    Maps (chapter, verse) to byte ranges in a USFM file, so that single verses or verse ranges can be read
+    through mmap without reading the rest of the book.
+
+    The index is stored in a .usfmidx sidecar, and is rebuilt automatically when the size or modification time
+    of the USFM file changes. Converters keep the sidecars in their working or save folder rather than in the
+    resource repos.
+    """
+
+    def __init__(self, usfm_file, index_file=None, index_dir=None):
+        """
+        :param str|unicode usfm_file: The USFM file to index
+        :param str|unicode index_file: The sidecar file
+        :param str|unicode index_dir: The folder of the sidecar file, if index_file is not given. The sidecar is named
+            after the folder and the name of the USFM file, e.g. en_ult_01-GEN.usfmidx. Defaults to the folder of the
+            USFM file, with the sidecar named after the USFM file.
+        """
+        self.usfm_file = usfm_file
+        self.index_file = index_file or index_path(usfm_file, index_dir)
+        self.ranges = {}
+        self.last_verses = {}
+        self._file = None
+        self._mmap = None
+        stat = os.stat(usfm_file)
+        if not self._load(stat.st_size, stat.st_mtime_ns):
+            self._build()
+            self._save(stat.st_size, stat.st_mtime_ns)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        if self._mmap:
+            self._mmap.close()
+            self._mmap = None
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def chapters(self):
+        """
+        :return: The chapter numbers in the book, in order
+        """
+        return sorted(chapter for (chapter, verse) in self.ranges if chapter and not verse)
+
+    def verses(self, chapter):
+        """
+        :param int chapter:
+        :return: The first verse numbers of the verses in the chapter, in order
+        """
+        return sorted(verse for (c, verse) in self.ranges if c == chapter and verse)
+
+    def get_chapter(self, chapter):
+        """
+        :param int chapter: The chapter number, or 0 for the book header
+        :return: The USFM text of the chapter, starting with its \\c marker
+        """
+        return self._read(*self.ranges[(chapter, 0)])
+
+    def get_verse(self, chapter, verse):
+        """
+        :param int chapter:
+        :param int verse: The first verse number of the verse or verse bridge (e.g. 3 for \\v 3-4)
+        :return: The USFM text of the verse, starting with its \\v marker
+        """
+        return self._read(*self.ranges[(chapter, verse)])
+
+    def get_verses(self, chapter, first_verse, last_verse):
+        """
+        Returns the USFM text of a range of verses in one chapter. Verses in the range that do not exist are skipped.
+        :param int chapter:
+        :param int first_verse:
+        :param int last_verse:
+        :return: The USFM text from the first to the last existing verse in the range, or '' if there are none
+        """
+        ranges = [self.ranges[(chapter, verse)] for verse in range(first_verse, last_verse + 1)
+                  if (chapter, verse) in self.ranges]
+        if not ranges:
+            return ''
+        return self._read(min(start for start, end in ranges), max(end for start, end in ranges))
+
+    def _read(self, start, end):
+        if not self._mmap:
+            self._file = open(self.usfm_file, 'rb')
+            if os.fstat(self._file.fileno()).st_size == 0:
+                return ''
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._mmap[start:end].decode('utf-8').replace('\r\n', '\n')
+
+    def _build(self):
+        with open(self.usfm_file, 'rb') as f:
+            data = f.read()
+        chapter = 0
+        chapter_start = 0
+        verse = None
+        for match in marker_re.finditer(data):
+            if verse is not None:
+                self._add(chapter, verse, last_verse, verse_start, match.start())
+                verse = None
+            if match.group(1) == b'c':
+                self._add(chapter, 0, 0, chapter_start, match.start())
+                chapter = int(match.group(2))
+                chapter_start = match.start()
+                for key in [key for key in self.ranges if key[0] == chapter]:
+                    del self.ranges[key]    # a repeated chapter replaces the earlier one
+            elif chapter:
+                verse = int(match.group(2))
+                last_verse = int(match.group(3) or verse)
+                verse_start = match.start()
+        if verse is not None:
+            self._add(chapter, verse, last_verse, verse_start, len(data))
+        self._add(chapter, 0, 0, chapter_start, len(data))
+
+    def _add(self, chapter, verse, last_verse, start, end):
+        self.ranges[(chapter, verse)] = (start, end)
+        self.last_verses[(chapter, verse)] = last_verse
+
+    def _load(self, size, mtime_ns):
+        try:
+            with open(self.index_file, 'rb') as f:
+                data = f.read()
+            magic, indexed_size, indexed_mtime_ns, count = INDEX_HEADER.unpack_from(data)
+        except (IOError, OSError, struct.error):
+            return False
+        if magic != INDEX_MAGIC or indexed_size != size or indexed_mtime_ns != mtime_ns or \
+                len(data) != INDEX_HEADER.size + count * INDEX_ENTRY.size:
+            return False
+        for chapter, verse, last_verse, start, end in INDEX_ENTRY.iter_unpack(data[INDEX_HEADER.size:]):
+            self.ranges[(chapter, verse)] = (start, end)
+            self.last_verses[(chapter, verse)] = last_verse
+        return True
+
+    def _save(self, size, mtime_ns):
+        entries = [INDEX_ENTRY.pack(chapter, verse, self.last_verses[(chapter, verse)], start, end)
+                   for (chapter, verse), (start, end) in sorted(self.ranges.items())]
+        try:
+            index_dir = os.path.dirname(self.index_file)
+            if index_dir and not os.path.isdir(index_dir):
+                os.makedirs(index_dir)
+            with open(self.index_file, 'wb') as f:
+                f.write(INDEX_HEADER.pack(INDEX_MAGIC, size, mtime_ns, len(entries)))
+                f.write(b''.join(entries))
+        except (IOError, OSError):
+            pass    # the index is still usable from memory
+
+
+def index_path(usfm_file, index_dir=None):
+    """
+    :param str|unicode usfm_file:
+    :param str|unicode index_dir: See UsfmIndex
+    :return: The path of the .usfmidx sidecar of the USFM file
+    """
+    name = os.path.splitext(os.path.basename(usfm_file))[0]
+    if not index_dir:
+        return os.path.join(os.path.dirname(usfm_file), name + INDEX_EXTENSION)
+    folder = os.path.basename(os.path.dirname(os.path.abspath(usfm_file)))
+    return os.path.join(index_dir, '{0}_{1}{2}'.format(folder, name, INDEX_EXTENSION))
+
+
+class Usfm2Verses(object):
+    """
+    The verses of a USFM 3 book as USFM 2, by chapter and verse: {chapter: {verse: usfm}},
+    where the usfm of a verse with no text is ''.
+
+    Each chapter is read through the index and converted when it is first used, and only the most recently used
+    chapters are kept, so the whole book is never held in memory. Changes to the {verse: usfm} of a chapter
+    last as long as the chapter is kept.
+    Gives the same verses as converting the whole book with usfm3_to_usfm2() and splitting it at the \\c and \\v markers.
+    """
+
+    def __init__(self, usfm_file, index_dir=None, keep=2):
+        """
+        :param str|unicode usfm_file:
+        :param str|unicode index_dir: The folder of the .usfmidx sidecar, see UsfmIndex
+        :param int keep: The number of converted chapters to keep
+        """
+        self.index = UsfmIndex(usfm_file, index_dir=index_dir)
+        self.index.close()      # the book is opened again when a chapter is read
+        self._chapters = self.index.chapters()
+        self.keep = keep
+        self._kept = {}         # the converted chapters, least recently used first
+
+    def __contains__(self, chapter):
+        return chapter in self._kept or chapter in self._chapters
+
+    def __iter__(self):
+        return iter(self._chapters)
+
+    def __len__(self):
+        return len(self._chapters)
+
+    def keys(self):
+        return list(self._chapters)
+
+    def __getitem__(self, chapter):
+        if chapter in self._kept:
+            self._kept[chapter] = self._kept.pop(chapter)
+            return self._kept[chapter]
+        if chapter not in self._chapters:
+            raise KeyError(chapter)
+        verses = self._convert(chapter)
+        self._kept[chapter] = verses
+        while len(self._kept) > self.keep:
+            del self._kept[next(iter(self._kept))]
+        return verses
+
+    def __repr__(self):
+        return 'Usfm2Verses({0!r}, chapters {1})'.format(self.index.usfm_file, self._chapters)
+
+    def _convert(self, chapter):
+        try:
+            chapter_usfm = usfm3_to_usfm2(self.index.get_chapter(chapter), strip=(chapter == self._chapters[-1]))
+        finally:
+            self.index.close()
+        verses = {}
+        for verse_usfm in chapter_usfm.split(r'\v ')[1:]:
+            verse = int(re.findall(r'(\d+)', verse_usfm)[0])
+            verse_usfm = r'\v ' + verse_usfm
+            if re.match(r'^\\v \d+\s*$', verse_usfm, flags=re.MULTILINE):
+                verse_usfm = ''
+            verses[verse] = verse_usfm
+        return verses
+
+
+def get_usfm2_verses(usfm_file, index_dir=None):
+    """
+    Returns the verses of a USFM 3 book as USFM 2, converting one chapter at a time as it is used.
+    :param str|unicode usfm_file:
+    :param str|unicode index_dir: The folder of the .usfmidx sidecar, see UsfmIndex
+    :return: Usfm2Verses, {chapter: {verse: usfm}}, where the usfm of a verse with no text is ''
+    """
+    return Usfm2Verses(usfm_file, index_dir)
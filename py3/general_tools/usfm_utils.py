@@ -3,10 +3,11 @@
 from __future__ import unicode_literals
 import re
 
-def usfm3_to_usfm2(usfm):
+def usfm3_to_usfm2(usfm, strip=True):
     """
     Converts a USFM 3 string to a USFM 2 compatible string
     :param usfm3:
+    :param strip: Strips leading and trailing white space. Pass False when converting a book one chapter at a time.
     :return: the USFM 2 version of the string
     """
     # Kind of usfm3 to usfm2
@@ -34,4 +35,4 @@ def usfm3_to_usfm2(usfm):
     usfm = re.sub(r' +([:;.?,!\]})-])', r'\1', usfm, flags=re.UNICODE | re.MULTILINE)
     usfm = re.sub(r'([{(\[-]) +', r'\1', usfm, flags=re.UNICODE | re.MULTILINE)
 
-    return usfm.strip()
+    return usfm.strip() if strip else usfm
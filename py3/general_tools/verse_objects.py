@@ -0,0 +1,290 @@
+# coding=utf-8
+
+from __future__ import unicode_literals
+import os
+import re
+from .file_utils import load_json_object, write_file
+
+# Converts aligned USFM 3 (ULT, UST, UHB, UGNT) to the verseObjects structure of the chapter JSON files
+# that translationCore and tc-source-content-updater produce with usfm-js, so that the alignment of a book
+# can be read straight from its USFM file.
+
+chapter_re = re.compile(r'\\c[ \t]+(\d+)')
+verse_re = re.compile(r'\\v[ \t]+(\d+(?:-\d+)?)[ \t]?')
+attribute_re = re.compile(r'([\w-]+)="([^"]*)"')
+token_re = re.compile(
+    r'\\([a-z]+)-s\s*\|?([^\\]*?)\\\*'          # 1, 2: milestone start and its attributes, e.g. \zaln-s |x-strong="G1" ...\*
+    r'|\\([a-z]+)-e\\\*'                        # 3: milestone end, e.g. \zaln-e\*
+    r'|\\ts\\\*'                                # chunk marker, ignored
+    r'|\\w[ \t]+([^|\\]*)\|?([^\\]*)\\w\*'      # 4, 5: word and its attributes
+    r'|\\(f|fe|x)[ \t]+(.*?)\\\6\*'             # 6, 7: footnote or cross reference
+    r'|\\(\+?[a-z]+\d*)(\*?)[ \t]?'             # 8, 9: any other marker
+    r'|([^\\]+|\\)',                            # 10: text, or a stray backslash
+    flags=re.DOTALL)
+
+paragraph_tags = {'p', 'm', 'mi', 'nb', 'b', 'pc', 'pr', 'pm', 'pmo', 'pmc', 'pmr', 'cls', 'pi', 'ph', 'li', 'lim',
+                  'lf', 'lh', 'po', 'tr'}
+quote_tags = {'q', 'qr', 'qc', 'qm', 'qd'}
+section_tags = {'s', 'ms', 'mr', 'r', 'd', 'sp', 'sr', 'sd', 'qa', 'cl', 'cd'}
+integer_attributes = {'occurrence', 'occurrences'}
+
+
+def get_attributes(attributes):
+    """
+    :param str|unicode attributes: The attributes of a \\w marker or a milestone, e.g. 'x-occurrence="1" x-occurrences="2"'
+    :return: A dict of the attributes, with any x- prefix removed and the occurrence attributes as ints
+    """
+    result = {}
+    for name, value in attribute_re.findall(attributes):
+        if name.startswith('x-'):
+            name = name[2:]
+        if name in integer_attributes and value.isdigit():
+            value = int(value)
+        result[name] = value
+    return result
+
+
+def get_marker_type(tag):
+    """
+    :param str|unicode tag: A marker without its number, e.g. 'q' for \\q1
+    :return: The verseObject type of the marker
+    """
+    if tag in paragraph_tags:
+        return 'paragraph'
+    if tag in quote_tags:
+        return 'quote'
+    if tag in section_tags:
+        return 'section'
+    return 'char'
+
+
+def usfm_to_verse_objects(usfm):
+    """
+    Converts the USFM of one verse (or of the text of a chapter before its first verse) to a list of verseObjects.
+    Alignment milestones become 'milestone' objects with their aligned words as children, \\w markers become
+    'word' objects, footnotes become 'footnote' objects and the text in between becomes 'text' objects.
+    :param str|unicode usfm: The USFM, without its \\v marker
+    :return: The list of verseObjects
+    """
+    verse_objects = []
+    stack = []          # (closing tag, list to go back to) of each open milestone or character marker
+    current = verse_objects
+    pos = 0
+    while pos < len(usfm):
+        match = token_re.match(usfm, pos)
+        pos = match.end()
+        (milestone, attributes, milestone_end, word, word_attributes, note, note_content, tag, end,
+         text) = match.groups()
+        if text is not None:
+            if current and current[-1]['type'] == 'text':
+                current[-1]['text'] += text
+            else:
+                current.append({'type': 'text', 'text': text})
+        elif word is not None:
+            word_object = {'text': word, 'tag': 'w', 'type': 'word'}
+            word_object.update(get_attributes(word_attributes))
+            current.append(word_object)
+        elif milestone is not None:
+            milestone_object = {'tag': milestone, 'type': 'milestone'}
+            milestone_object.update(get_attributes(attributes))
+            milestone_object['children'] = []
+            current.append(milestone_object)
+            stack.append((milestone + '-e', current))
+            current = milestone_object['children']
+        elif milestone_end is not None:
+            if stack and stack[-1][0] == milestone_end + '-e':
+                parent = stack.pop()[1]
+                parent[-1]['endTag'] = milestone_end + '-e\\*'
+                current = parent
+        elif note is not None:
+            current.append({'tag': note, 'type': 'footnote', 'content': note_content, 'endTag': note + '*'})
+        elif tag is not None:
+            name = tag.lstrip('+')
+            if end:
+                if stack and stack[-1][0] == name:
+                    parent = stack.pop()[1]
+                    parent[-1]['endTag'] = tag + '*'
+                    current = parent
+                continue
+            marker_type = get_marker_type(name.rstrip('0123456789'))
+            marker_object = {'tag': name, 'type': marker_type}
+            if marker_type == 'char':
+                marker_object['children'] = []
+                current.append(marker_object)
+                stack.append((name, current))
+                current = marker_object['children']
+            elif marker_type == 'section':
+                line_end = usfm.find('\n', pos)
+                pos = len(usfm) if line_end < 0 else line_end + 1
+                marker_object['content'] = usfm[match.end():pos]
+                current.append(marker_object)
+            else:
+                current.append(marker_object)
+    return verse_objects
+
+
+def usfm_to_chapters(usfm):
+    """
+    Converts an aligned USFM book to the same data as the chapter JSON files produced by tc-source-content-updater.
+    Text after a \\c marker and before the first \\v marker of the chapter is stored as the 'front' verse.
+    :param str|unicode usfm: The USFM of the book
+    :return: {chapter: {verse: {'verseObjects': [...]}}}, where chapters and verses are strings
+    """
+    chapters = {}
+    chapter_matches = list(chapter_re.finditer(usfm))
+    for index, chapter_match in enumerate(chapter_matches):
+        chapter_end = chapter_matches[index + 1].start() if index + 1 < len(chapter_matches) else len(usfm)
+        chapter_usfm = usfm[chapter_match.end():chapter_end]
+        chapter = {}
+        verse_matches = list(verse_re.finditer(chapter_usfm))
+        front = chapter_usfm[:verse_matches[0].start()] if verse_matches else chapter_usfm
+        front = front.lstrip(' \t\r\n')
+        if front:
+            chapter['front'] = {'verseObjects': usfm_to_verse_objects(front)}
+        for verse_index, verse_match in enumerate(verse_matches):
+            verse_end = verse_matches[verse_index + 1].start() if verse_index + 1 < len(verse_matches) \
+                else len(chapter_usfm)
+            chapter[verse_match.group(1)] = {
+                'verseObjects': usfm_to_verse_objects(chapter_usfm[verse_match.end():verse_end])
+            }
+        chapters[chapter_match.group(1)] = chapter
+    return chapters
+
+
+def load_book_chapters(usfm_file, cache_file=None):
+    """
+    Returns the verseObjects of every verse of an aligned USFM book (see usfm_to_chapters()).
+    When a cache file is given, the result is read from it if it exists, and written to it otherwise.
+    Name the cache file after the commit of the repo the book is in, so that it is rebuilt when the book changes.
+    :param str|unicode usfm_file: The USFM file of the book
+    :param str|unicode cache_file: A JSON file to cache the result in
+    :return: {chapter: {verse: {'verseObjects': [...]}}}, where chapters and verses are strings
+    """
+    if cache_file and os.path.isfile(cache_file):
+        chapters = load_json_object(cache_file)
+        if chapters:
+            return chapters
+    with open(usfm_file, 'r', encoding='utf-8-sig') as f:
+        usfm = f.read().replace('\r\n', '\n')
+    chapters = usfm_to_chapters(usfm)
+    if cache_file:
+        write_file(cache_file, chapters, indent=None)
+    return chapters
+
+
+def get_combination_targets(verse_objects):
+    """
+    Maps each combination of consecutive original language (OL) words aligned in a verse to its target text.
+    The words are the contents of the verse's top-level milestones, with repeated (content, occurrence) pairs merged.
+    The occurrence of a combination counts the combinations with the same OL text, in order.
+    :param list verse_objects: The verseObjects of the verse
+    :return: {(OL text, occurrence): target text}
+    """
+    word_list = []      # [OL text, target text, occurrence]
+    word_index = {}     # (OL text, occurrence): index in word_list
+    for verse_object in verse_objects:
+        if 'content' in verse_object and 'type' in verse_object and verse_object['type'] == 'milestone':
+            target = ' '.join([child['text'] for child in verse_object['children'] if child['type'] == 'word'])
+            key = (verse_object['content'], verse_object.get('occurrence'))
+            if 'occurrence' in verse_object and key in word_index:
+                word_list[word_index[key]][1] += ' ... ' + target
+            else:
+                word_index[key] = len(word_list)
+                word_list.append([verse_object['content'], target, verse_object['occurrence']])
+    combinations = {}
+    occurrences = {}
+    for i in range(0, len(word_list)):
+        ol = word_list[i][0]
+        target = word_list[i][1]
+        for j in range(i, len(word_list)):
+            if i != j:
+                ol += ' ' + word_list[j][0]
+                target += ' ' + word_list[j][1]
+            occurrences[ol] = occurrences.get(ol, 0) + 1
+            combinations[(ol, occurrences[ol])] = target
+    return combinations
+
+
+def find_target_from_split(verse_objects, quote, occurrence, is_match=False):
+    """
+    Finds the target text aligned to the words of an OL quote wherever they are in the verse, joining
+    the separate parts with an ellipsis. Used when the quote is not a combination of consecutive words.
+    :param list verse_objects: The verseObjects of the verse, or the children of a verseObject
+    :param str|list quote: The OL quote, or a list of {'word': ...}
+    :param int occurrence:
+    :param bool is_match: True if all the words of the verseObjects are to be included
+    :return: The target text, or ''
+    """
+    words_to_match = []
+    if isinstance(quote, list):
+        for q in quote:
+            words_to_match.append(q['word'])
+    else:
+        words_to_match = quote.split(' ')
+    separator = ' '
+    needs_ellipsis = False
+    text = ''
+    for index, verse_object in enumerate(verse_objects):
+        last_match = False
+        if 'type' in verse_object and (verse_object['type'] == 'milestone' or verse_object['type'] == 'word'):
+            if ((('content' in verse_object and verse_object['content'] in words_to_match) or ('lemma' in verse_object and verse_object['lemma'] in words_to_match)) and verse_object['occurrence'] == occurrence) or is_match:
+                last_match = True
+                if needs_ellipsis:
+                    separator += '... '
+                    needs_ellipsis = False
+                if text:
+                    text += separator
+                separator = ' '
+                if 'text' in verse_object and verse_object['text']:
+                    text += verse_object['text']
+                if 'children' in verse_object and verse_object['children']:
+                    text += find_target_from_split(verse_object['children'], quote, occurrence, True)
+            elif 'children' in verse_object and verse_object['children']:
+                child_text = find_target_from_split(verse_object['children'], quote, occurrence, is_match)
+                if child_text:
+                    last_match = True
+                    if needs_ellipsis:
+                        separator += '... '
+                        needs_ellipsis = False
+                    text += (separator if text else '') + child_text
+                    separator = ' '
+                elif text:
+                    needs_ellipsis = True
+        if last_match and (index+1) in verse_objects and verse_objects[index + 1]['type'] == "text" and text:
+            if separator == ' ':
+                separator = ''
+            separator += verse_objects[index + 1]['text']
+    return text
+
+
+class AlignmentIndex(object):
+    """
+    The alignment of one verse, indexed once for looking up the target text of any number of OL quotes,
+    such as the quotes of all the tW links in the verse.
+    """
+
+    def __init__(self, verse_objects):
+        """
+        :param list verse_objects: The verseObjects of the verse
+        """
+        self.verse_objects = verse_objects
+        self.combinations = get_combination_targets(verse_objects)
+        self.split_targets = {}     # find_target_from_split() results by (OL words, occurrence)
+
+    def find_target_from_combination(self, quote, occurrence):
+        """
+        :return: The target text of the quote if it is a combination of consecutive OL words, otherwise None
+        """
+        if not isinstance(quote, str):
+            return None
+        return self.combinations.get((quote, occurrence))
+
+    def find_target_from_split(self, quote, occurrence):
+        """
+        :return: The same as find_target_from_split() for the whole verse, computed once for each set of words
+        """
+        words = tuple(q['word'] for q in quote) if isinstance(quote, list) else tuple(quote.split(' '))
+        key = (words, occurrence)
+        if key not in self.split_targets:
+            self.split_targets[key] = find_target_from_split(self.verse_objects, quote, occurrence)
+        return self.split_targets[key]
@@ -0,0 +1,132 @@
+# coding=utf-8
+"""
+ImageCache must download each image once, revalidate stale entries with 304s, and keep its cached copy
+when the server fails, checked against a local http.server serving 200, 304, 404 and 503 responses.
+"""
+
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from ..general_tools.image_cache import ImageCache, file_digest
+
+
+class ImageHandler(BaseHTTPRequestHandler):
+    """
+    /image/<name>.png is an image with an ETag, /missing.png is a 404, /down.png is always a 503,
+    and /flaky.png is a 503 on every other request.
+    """
+
+    def do_GET(self):
+        self.server.requests.append((self.path, self.headers.get('If-None-Match')))
+        if self.server.down or self.path == '/down.png':
+            self.send_error(503)
+        elif self.path == '/flaky.png':
+            self.server.flaky_count += 1
+            if self.server.flaky_count % 2:
+                self.send_error(503)
+            else:
+                self.send_image(b'flaky image')
+        elif self.path.startswith('/image/'):
+            self.send_image(('image ' + os.path.splitext(self.path.split('/')[-1])[0].split('-')[0]).encode('utf-8'))
+        else:
+            self.send_error(404)
+
+    def send_image(self, content):
+        etag = '"' + content.decode('utf-8').replace(' ', '-') + '"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/png')
+        self.send_header('Content-Length', str(len(content)))
+        self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), ImageHandler)
+    httpd.requests = []
+    httpd.flaky_count = 0
+    httpd.down = False
+    httpd.url = 'http://127.0.0.1:{0}'.format(httpd.server_address[1])
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def new_cache(tmp_path, max_age=86400):
+    return ImageCache(str(tmp_path / 'cache'), max_workers=4, retries=2, backoff_factor=0, timeout=(5, 5),
+                      max_age=max_age)
+
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def test_each_url_is_downloaded_once_and_shared(server, tmp_path):
+    # a-1.png and a-2.png have the same content, so share one object
+    urls = ['{0}/image/{1}.png'.format(server.url, name) for name in ('a-1', 'a-2', 'b', 'c') * 5]
+    paths = new_cache(tmp_path).fetch_all(urls)
+    assert sorted(paths) == sorted(set(urls))
+    assert [read(paths[url]) for url in urls[:4]] == [b'image a', b'image a', b'image b', b'image c']
+    assert paths[urls[0]] == paths[urls[1]]
+    assert os.path.basename(paths[urls[2]]) == file_digest(paths[urls[2]])
+    assert sorted(path for (path, etag) in server.requests) == ['/image/a-1.png', '/image/a-2.png',
+                                                                '/image/b.png', '/image/c.png']
+    del server.requests[:]
+    assert new_cache(tmp_path).fetch_all(urls) == paths
+    assert server.requests == []
+
+
+def test_stale_entries_are_revalidated_with_304(server, tmp_path):
+    url = server.url + '/image/a.png'
+    path = new_cache(tmp_path).fetch(url)
+    del server.requests[:]
+    assert new_cache(tmp_path, max_age=0).fetch(url) == path
+    assert server.requests == [('/image/a.png', '"image-a"')]
+    assert read(path) == b'image a'
+
+
+def test_failed_downloads_are_none(server, tmp_path):
+    cache = new_cache(tmp_path)
+    paths = cache.fetch_all([server.url + '/missing.png', server.url + '/down.png'])
+    assert paths == {server.url + '/missing.png': None, server.url + '/down.png': None}
+    assert [path for (path, etag) in server.requests].count('/missing.png') == 1
+    assert [path for (path, etag) in server.requests].count('/down.png') == 3
+    assert os.listdir(cache.objects_dir) == []
+
+
+def test_a_503_is_retried(server, tmp_path):
+    path = new_cache(tmp_path).fetch(server.url + '/flaky.png')
+    assert read(path) == b'flaky image'
+    assert server.flaky_count == 2
+
+
+def test_the_cached_copy_is_used_when_the_server_is_down(server, tmp_path):
+    url = server.url + '/image/a.png'
+    path = new_cache(tmp_path).fetch(url)
+    server.down = True
+    assert new_cache(tmp_path, max_age=0).fetch(url) == path
+    assert new_cache(tmp_path, max_age=0).fetch(server.url + '/image/b.png') is None
+
+
+def test_copy_puts_the_image_in_place(server, tmp_path):
+    cached_path = new_cache(tmp_path).fetch(server.url + '/image/a.png')
+    target_path = str(tmp_path / 'a.png')
+    ImageCache.copy(cached_path, target_path)
+    assert read(target_path) == b'image a'
+    ImageCache.copy(cached_path, target_path)
+    assert read(target_path) == b'image a'
@@ -0,0 +1,30 @@
+# coding=utf-8
+"""
+render_html_documents() must give each text the same document as render_html() does on its own.
+"""
+
+import os
+
+from ..usfm_tools.singlehtmlRenderer import SingleHTMLRenderer
+
+data_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                        'usfm', 'tests', 'data')
+
+
+def chunk_texts():
+    with open(os.path.join(data_dir, '57-TIT.usfm'), encoding='utf-8') as f:
+        chapters = f.read().split('\\c ')[1:]
+    texts = []
+    for chapter in chapters:
+        (number, verses) = chapter.split('\n', 1)
+        for chunk in verses.split('\\v ')[1:]:
+            texts.append('\\id TIT\n\\ide UTF-8\n\\h Titus\n\\mt Titus\n\n\\c {0}\n\\v {1}'.format(number.strip(), chunk))
+    return texts
+
+
+def test_documents_match_render_html():
+    texts = chunk_texts()
+    expected = [SingleHTMLRenderer().render_html(text) for text in texts]
+    renderer = SingleHTMLRenderer()
+    assert renderer.render_html_documents(texts) == expected
+    assert renderer.render_html_documents([]) == []
@@ -0,0 +1,70 @@
+# coding=utf-8
+"""
+Usfm2Verses must give the same verses as converting the whole book with usfm3_to_usfm2() and splitting it,
+as TnConverter and TnPdfConverter used to, while converting one chapter at a time.
+"""
+
+import os
+import re
+import shutil
+
+import pytest
+
+from ..general_tools.usfm_index import UsfmIndex, get_usfm2_verses, INDEX_EXTENSION
+from ..general_tools.usfm_utils import usfm3_to_usfm2
+
+data_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                        'usfm', 'tests', 'data')
+books = sorted(f for f in os.listdir(data_dir) if f.endswith('.usfm'))
+
+
+def whole_book_verses(usfm_file):
+    with open(usfm_file, encoding='utf-8') as f:
+        usfm2 = usfm3_to_usfm2(f.read())
+    book_data = {}
+    for chapter_usfm in usfm2.split(r'\c ')[1:]:
+        chapter = int(re.findall(r'(\d+)', chapter_usfm)[0])
+        book_data[chapter] = {}
+        for verse_usfm in (r'\c ' + chapter_usfm).split(r'\v ')[1:]:
+            verse = int(re.findall(r'(\d+)', verse_usfm)[0])
+            verse_usfm = r'\v ' + verse_usfm
+            if re.match(r'^\\v \d+\s*$', verse_usfm, flags=re.MULTILINE):
+                verse_usfm = ''
+            book_data[chapter][verse] = verse_usfm
+    return book_data
+
+
+@pytest.fixture(params=books)
+def book(request, tmp_path):
+    repo_dir = tmp_path / 'en_ult'
+    repo_dir.mkdir()
+    shutil.copy(os.path.join(data_dir, request.param), str(repo_dir))
+    return str(repo_dir / request.param)
+
+
+def test_chapters_match_the_whole_book_conversion(book, tmp_path):
+    expected = whole_book_verses(book)
+    verses = get_usfm2_verses(book, str(tmp_path / 'save'))
+    assert list(verses) == list(expected)
+    assert {chapter: verses[chapter] for chapter in verses} == expected
+    assert len(verses._kept) <= verses.keep
+
+
+def test_sidecar_is_kept_in_the_index_dir(book, tmp_path):
+    index_dir = tmp_path / 'save'
+    get_usfm2_verses(book, str(index_dir))
+    name = 'en_ult_' + os.path.splitext(os.path.basename(book))[0] + INDEX_EXTENSION
+    assert os.listdir(str(index_dir)) == [name]
+    assert not [f for f in os.listdir(os.path.dirname(book)) if f.endswith(INDEX_EXTENSION)]
+    with UsfmIndex(book, index_dir=str(index_dir)) as index:
+        assert index.chapters() == list(whole_book_verses(book))
+
+
+def test_missing_chapter_and_changes_to_kept_chapters(book, tmp_path):
+    verses = get_usfm2_verses(book, str(tmp_path / 'save'))
+    assert 999 not in verses
+    with pytest.raises(KeyError):
+        verses[999]
+    chapter = list(verses)[0]
+    verses[chapter][999] = ''
+    assert verses[chapter][999] == ''
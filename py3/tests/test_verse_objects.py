@@ -0,0 +1,219 @@
+# coding=utf-8
+"""
+usfm_to_chapters() must give the verseObjects that usfm-js gives for aligned USFM, and AlignmentIndex must find
+the same target text for every quote as the linear scans of the verseObjects that the tW and tN converters used
+before the alignment of a verse was indexed.
+"""
+
+import itertools
+import os
+import random
+
+import pytest
+
+from ..general_tools.verse_objects import AlignmentIndex, load_book_chapters, usfm_to_chapters
+
+data_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                        'usfm', 'tests', 'data')
+
+
+def word(text, occurrence=1, occurrences=1):
+    return {'text': text, 'tag': 'w', 'type': 'word', 'occurrence': occurrence, 'occurrences': occurrences}
+
+
+def text(text):
+    return {'type': 'text', 'text': text}
+
+
+def aligned(strong, lemma, morph, occurrence, occurrences, content, *children):
+    result = {'tag': 'zaln', 'type': 'milestone', 'strong': strong, 'lemma': lemma}
+    if morph:
+        result['morph'] = morph
+    result.update({'occurrence': occurrence, 'occurrences': occurrences, 'content': content,
+                   'children': list(children), 'endTag': 'zaln-e\\*'})
+    return result
+
+
+def test_book_to_verse_objects():
+    chapters = load_book_chapters(os.path.join(data_dir, '41-MAT-aligned.usfm'))
+    assert list(chapters) == ['1', '2']
+    assert list(chapters['1']) == ['front', '1', '2', '3', '4-5']
+    assert list(chapters['2']) == ['front', '1']
+    assert chapters['1']['front']['verseObjects'] == [{'tag': 'p', 'type': 'paragraph'}, text('\n')]
+    assert chapters['2']['front']['verseObjects'] == [
+        {'tag': 's', 'type': 'section', 'content': 'The visit of the wise men\n'},
+        {'tag': 'p', 'type': 'paragraph'},
+        text('\n')]
+    assert chapters['1']['2']['verseObjects'] == [
+        aligned('G00110', 'Ἀβραάμ', None, 1, 1, 'Ἀβραὰμ', word('Abraham')),
+        text('\n'),
+        aligned('G10800', 'γεννάω', None, 1, 1, 'ἐγέννησεν',
+                word('was'), text('\n'), word('the', 1, 2), text('\n'), word('father')),
+        text(' of Isaac.\n')]
+    assert chapters['1']['3']['verseObjects'] == [
+        aligned('G24550', 'Ἰούδας', 'Gr,N,,,,,AMS,', 1, 1, 'Ἰούδαν',
+                aligned('G25320', 'καί', 'Gr,CC,,,,,,,,', 1, 2, 'καὶ', word('Judah'))),
+        {'tag': 'f', 'type': 'footnote', 'content': '+ \\ft Some versions read \\fqa Judas\\fqa*.', 'endTag': 'f*'},
+        text('\n'),
+        {'tag': 'q1', 'type': 'quote'},
+        aligned('G25320', 'καί', 'Gr,CC,,,,,,,,', 2, 2, 'καὶ', word('and')),
+        text(' his brothers.\n')]
+    assert chapters['1']['4-5']['verseObjects'] == [
+        aligned('G53290', 'Φαρές', 'Gr,N,,,,,AMS,', 1, 1, 'Φαρὲς', word('Perez')),
+        text(' and Zerah.\n')]
+
+
+def test_char_markers_and_attributes():
+    usfm = '\\c 1\n\\v 1 \\w Paul|lemma="x" x-occurrence="2" x-occurrences="n"\\w* \\add a \\+nd servant\\+nd*\\add*\n'
+    assert usfm_to_chapters(usfm) == {'1': {'1': {'verseObjects': [
+        {'text': 'Paul', 'tag': 'w', 'type': 'word', 'lemma': 'x', 'occurrence': 2, 'occurrences': 'n'},
+        text(' '),
+        {'tag': 'add', 'type': 'char', 'endTag': 'add*', 'children': [
+            text('a '),
+            {'tag': 'nd', 'type': 'char', 'endTag': '+nd*', 'children': [text('servant')]}]},
+        text('\n')]}}}
+
+
+def linear_find_target_from_combination(verse_objects, quote, occurrence):
+    ol_words = []
+    word_list = []
+    for verse_object in verse_objects:
+        if 'content' in verse_object and 'type' in verse_object and verse_object['type'] == 'milestone':
+            target = ' '.join([child['text'] for child in verse_object['children'] if child['type'] == 'word'])
+            found = False
+            for idx, word in enumerate(word_list):
+                if word['ol'] == verse_object['content'] and 'occurrence' in verse_object and \
+                        word['occurrence'] == verse_object['occurrence']:
+                    word_list[idx]['target'] += ' ... ' + target
+                    found = True
+            if not found:
+                word_list.append({'ol': verse_object['content'], 'target': target,
+                                  'occurrence': verse_object['occurrence']})
+            ol_words.append(verse_object['content'])
+    combinations = []
+    occurrences = {}
+    for i in range(0, len(word_list)):
+        ol = word_list[i]['ol']
+        target = word_list[i]['target']
+        for j in range(i, len(word_list)):
+            if i != j:
+                ol += ' ' + word_list[j]['ol']
+                target += ' ' + word_list[j]['target']
+            occurrences[ol] = occurrences.get(ol, 0) + 1
+            combinations.append({'ol': ol, 'target': target, 'occurrence': occurrences[ol]})
+    for combination in combinations:
+        if combination['ol'] == quote and combination['occurrence'] == occurrence:
+            return combination['target']
+    return None
+
+
+def linear_find_target_from_split(verse_objects, quote, occurrence, is_match=False):
+    words_to_match = []
+    if isinstance(quote, list):
+        for q in quote:
+            words_to_match.append(q['word'])
+    else:
+        words_to_match = quote.split(' ')
+    separator = ' '
+    needs_ellipsis = False
+    text = ''
+    for index, verse_object in enumerate(verse_objects):
+        last_match = False
+        if 'type' in verse_object and (verse_object['type'] == 'milestone' or verse_object['type'] == 'word'):
+            if ((('content' in verse_object and verse_object['content'] in words_to_match) or
+                 ('lemma' in verse_object and verse_object['lemma'] in words_to_match)) and
+                    verse_object['occurrence'] == occurrence) or is_match:
+                last_match = True
+                if needs_ellipsis:
+                    separator += '... '
+                    needs_ellipsis = False
+                if text:
+                    text += separator
+                separator = ' '
+                if 'text' in verse_object and verse_object['text']:
+                    text += verse_object['text']
+                if 'children' in verse_object and verse_object['children']:
+                    text += linear_find_target_from_split(verse_object['children'], quote, occurrence, True)
+            elif 'children' in verse_object and verse_object['children']:
+                child_text = linear_find_target_from_split(verse_object['children'], quote, occurrence, is_match)
+                if child_text:
+                    last_match = True
+                    if needs_ellipsis:
+                        separator += '... '
+                        needs_ellipsis = False
+                    text += (separator if text else '') + child_text
+                    separator = ' '
+                elif text:
+                    needs_ellipsis = True
+        if last_match and (index+1) in verse_objects and verse_objects[index + 1]['type'] == "text" and text:
+            if separator == ' ':
+                separator = ''
+            separator += verse_objects[index + 1]['text']
+    return text
+
+
+def milestone(content, occurrence, *children):
+    return {'tag': 'zaln', 'type': 'milestone', 'content': content, 'lemma': content.lower(),
+            'occurrence': occurrence, 'occurrences': 2,
+            'children': [{'text': child, 'tag': 'w', 'type': 'word', 'occurrence': 1, 'occurrences': 1}
+                         if isinstance(child, str) else child for child in children]}
+
+
+# A verse with an OL word aligned twice, the same word at two occurrences, and nested milestones
+repeated_verse = [
+    milestone('A', 1, 'one', 'two'),
+    {'type': 'text', 'text': ' '},
+    milestone('B', 1, milestone('C', 1, 'three'), 'four'),
+    {'type': 'text', 'text': ', '},
+    milestone('A', 2, 'five'),
+    milestone('D', 1, 'six'),
+    {'type': 'text', 'text': ' '},
+    milestone('A', 1, 'seven'),
+    milestone('B', 2, 'eight'),
+    {'type': 'text', 'text': '.'},
+]
+
+
+def verses():
+    chapters = load_book_chapters(os.path.join(data_dir, '41-MAT-aligned.usfm'))
+    result = [('MAT {0}:{1}'.format(chapter, verse), chapters[chapter][verse]['verseObjects'])
+              for chapter in chapters for verse in chapters[chapter]]
+    result.append(('repeated', repeated_verse))
+    return result
+
+
+def quotes(verse_objects):
+    words = [verse_object['content'] for verse_object in verse_objects if 'content' in verse_object]
+    result = set(['', 'missing', 'A B', words[0] + ' missing'] if words else ['', 'missing'])
+    for i in range(len(words)):
+        for j in range(i + 1, len(words) + 1):
+            result.add(' '.join(words[i:j]))
+    for n in range(1, 4):
+        for combination in itertools.permutations(set(words), n):
+            result.add(' '.join(combination))
+    return sorted(result)
+
+
+@pytest.mark.parametrize(('ref', 'verse_objects'), verses(), ids=lambda value: value if isinstance(value, str) else '')
+def test_index_matches_the_linear_scans(ref, verse_objects):
+    index = AlignmentIndex(verse_objects)
+    for quote in quotes(verse_objects):
+        for occurrence in (1, 2, 3):
+            expected = linear_find_target_from_combination(verse_objects, quote, occurrence)
+            assert index.find_target_from_combination(quote, occurrence) == expected, (quote, occurrence)
+            expected = linear_find_target_from_split(verse_objects, quote, occurrence)
+            assert index.find_target_from_split(quote, occurrence) == expected, (quote, occurrence)
+            words = [{'word': word} for word in quote.split(' ')]
+            assert index.find_target_from_combination(words, occurrence) is None
+            assert index.find_target_from_split(words, occurrence) == expected, (quote, occurrence)
+
+
+def test_repeated_lookups_give_the_same_targets():
+    index = AlignmentIndex(repeated_verse)
+    lookups = [(quote, occurrence) for quote in quotes(repeated_verse) for occurrence in (1, 2)]
+    random.Random(0).shuffle(lookups)
+    for (quote, occurrence) in lookups * 2:
+        assert index.find_target_from_split(quote, occurrence) == \
+            linear_find_target_from_split(repeated_verse, quote, occurrence)
+    assert index.find_target_from_combination('A', 1) == 'one two ... seven'
+    assert index.find_target_from_combination('A B', 1) == 'one two ... seven four'
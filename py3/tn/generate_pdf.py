@@ -31,11 +31,12 @@ from glob import glob
 from bs4 import BeautifulSoup
 from weasyprint import HTML, LOGGER
 from datetime import datetime
-from ..usfm_tools.transform import UsfmTransform
+from ..usfm_tools.singlehtmlRenderer import SingleHTMLRenderer
 from ..general_tools.file_utils import write_file, read_file, load_json_object, unzip, load_yaml_object
 from ..general_tools.url_utils import download_file
 from ..general_tools.bible_books import BOOK_NUMBERS, BOOK_CHAPTER_VERSES
-from ..general_tools.usfm_utils import usfm3_to_usfm2
+from ..general_tools.usfm_index import get_usfm2_verses
+from ..general_tools.verse_objects import load_book_chapters, AlignmentIndex, find_target_from_split
 
 
 _print = print
@@ -136,6 +137,7 @@ class TnConverter(object):
         self.rc_references = {}
         self.chapters_and_verses = {}
         self.verse_usfm = {}
+        self.book_chapters = {}
         self.chunks_text = {}
         self.resource_data = {}
         self.rc_lookup = {}
@@ -402,6 +404,7 @@ class TnConverter(object):
             return
 
         chunks_text = {}
+        chunks = {self.ult_id: [], self.ust_id: []}  # (usfm, chapter, chunks_text entry) of each chunk of the book
         for chapter_data in self.chapters_and_verses:
             chapter = chapter_data['chapter']
             chunks_text[str(chapter)] = {}
@@ -435,12 +438,16 @@ class TnConverter(object):
                     if resource not in chunks_text[str(chapter)][str(first_verse)]:
                         chunks_text[str(chapter)][str(first_verse)][resource] = {}
                     chunks_text[str(chapter)][str(first_verse)][resource] = {
-                        'usfm': chunk_usfm,
-                        'html': self.get_chunk_html(chunk_usfm, resource, chapter, first_verse)
+                        'usfm': chunk_usfm
                     }
-            if not os.path.exists(save_dir):
-                os.makedirs(save_dir)
-            write_file(save_file, chunks_text)
+                    chunks[resource].append((chunk_usfm, chapter, chunks_text[str(chapter)][str(first_verse)][resource]))
+        for resource in chunks:
+            chunks_html = self.get_chunks_html([(usfm, chapter) for (usfm, chapter, entry) in chunks[resource]], resource)
+            for (usfm, chapter, entry), html in zip(chunks[resource], chunks_html):
+                entry['html'] = html
+        if not os.path.exists(save_dir):
+            os.makedirs(save_dir)
+        write_file(save_file, chunks_text)
         self.chunks_text = chunks_text
 
     def determine_if_regeneration_needed(self):
@@ -648,42 +655,12 @@ class TnConverter(object):
         self.populate_verse_usfm_ust()
 
     def populate_verse_usfm_ust(self):
-        book_data = {}
         book_file = os.path.join(self.ust_dir, '{0}-{1}.usfm'.format(self.book_number, self.book_id.upper()))
-        usfm3 = read_file(book_file)
-        usfm2 = usfm3_to_usfm2(usfm3)
-        chapters = usfm2.split(r'\c ')
-        for chapter_usfm in chapters[1:]:
-            chapter = int(re.findall('(\d+)', chapter_usfm)[0])
-            book_data[chapter] = {}
-            chapter_usfm = r'\c '+chapter_usfm
-            verses = chapter_usfm.split(r'\v ')
-            for verseUsfm in verses[1:]:
-                verse = int(re.findall('(\d+)', verseUsfm)[0])
-                verseUsfm = r'\v '+verseUsfm
-                if re.match(r'^\\v \d+\s*$', verseUsfm, flags=re.MULTILINE):
-                    verseUsfm = ''
-                book_data[chapter][verse] = verseUsfm
-        self.verse_usfm[self.ust_id] = book_data
+        self.verse_usfm[self.ust_id] = get_usfm2_verses(book_file, os.path.join(self.output_dir, 'save'))
 
     def populate_verse_usfm_ult(self):
-        bookData = {}
         book_file = os.path.join(self.ult_dir, '{0}-{1}.usfm'.format(self.book_number, self.book_id.upper()))
-        usfm3 = read_file(book_file)
-        usfm2 = usfm3_to_usfm2(usfm3)
-        chapters = usfm2.split(r'\c ')
-        for chapterUsfm in chapters[1:]:
-            chapter = int(re.findall('(\d+)', chapterUsfm)[0])
-            bookData[chapter] = {}
-            chapterUsfm = r'\c '+chapterUsfm
-            verses = chapterUsfm.split(r'\v ')
-            for verseUsfm in verses[1:]:
-                verse = int(re.findall('(\d+)', verseUsfm)[0])
-                verseUsfm = r'\v '+verseUsfm
-                if re.match(r'^\\v \d+\s*$', verseUsfm, flags=re.MULTILINE):
-                    verseUsfm = ''
-                bookData[chapter][verse] = verseUsfm
-        self.verse_usfm[self.ult_id] = bookData
+        self.verse_usfm[self.ult_id] = get_usfm2_verses(book_file, os.path.join(self.output_dir, 'save'))
 
     def populate_chapters_and_verses(self):
         versification_file = os.path.join(self.versification_dir, '{0}.json'.format(self.book_id))
@@ -990,108 +967,44 @@ class TnConverter(object):
         new_html += footer_html
         return new_html
 
+    def get_book_chapters(self, resource):
+        if resource not in self.book_chapters:
+            book_file = os.path.join(self.working_dir, '{0}_{1}'.format(self.lang_code, resource),
+                                     '{0}-{1}.usfm'.format(self.book_number, self.book_id.upper()))
+            cache_file = os.path.join(self.output_dir, 'verse_objects', '{0}_{1}_{2}_{3}.json'.format(
+                self.lang_code, resource, self.book_id, self.generation_info[resource]['commit']))
+            self.book_chapters[resource] = load_book_chapters(book_file, cache_file)
+        return self.book_chapters[resource]
+
     def get_all_words_to_match(self, resource, chapter, verse):
-        path = '{0}/{1}/{2}.json'.format(
-            get_latest_version(os.path.join(self.tn_resources_dir, '{0}/bibles/{1}'.format(self.lang_code, resource))),
-            self.book_id, chapter)
         words = []
-        data = load_json_object(path)
+        data = self.get_book_chapters(resource)[str(chapter)]
         chapter = int(chapter)
         if chapter in self.tw_words_data and verse in self.tw_words_data[chapter]:
             context_ids = self.tw_words_data[int(chapter)][int(verse)]
             verse_objects = data[str(verse)]['verseObjects']
+            alignment_index = AlignmentIndex(verse_objects)
             for context_id in context_ids:
-                aligned_text = self.get_aligned_text(verse_objects, context_id, False)
+                aligned_text = self.get_aligned_text(verse_objects, context_id, False, alignment_index)
                 if aligned_text:
                     words.append({'text': aligned_text, 'contextId': context_id})
         return words
 
     def find_target_from_combination(self, verse_objects, quote, occurrence):
-        ol_words = []
-        word_list = []
-        for verse_object in verse_objects:
-            if 'content' in verse_object and 'type' in verse_object and verse_object['type'] == 'milestone':
-                ol_words.append(verse_object['content'])
-                target_words = []
-                for child in verse_object['children']:
-                    if child['type'] == 'word':
-                        target_words.append(child['text'])
-                target = ' '.join(target_words)
-                found = False
-                for idx, word in enumerate(word_list):
-                    if word['ol'] == verse_object['content'] and 'occurrence' in verse_object and \
-                            word['occurrence'] == verse_object['occurrence']:
-                        word_list[idx]['target'] += ' ... ' + target
-                        found = True
-                if not found:
-                    word_list.append({'ol': verse_object['content'], 'target': target, 'occurrence': verse_object['occurrence']})
-        combinations = []
-        occurrences = {}
-        for i in range(0, len(word_list)):
-            ol = word_list[i]['ol']
-            target = word_list[i]['target']
-            for j in range(i, len(word_list)):
-                if i != j:
-                    ol += ' '+word_list[j]['ol']
-                    target += ' '+word_list[j]['target']
-                if ol not in occurrences:
-                    occurrences[ol] = 0
-                occurrences[ol] += 1
-                combinations.append({'ol': ol, 'target': target, 'occurrence': occurrences[ol]})
-        for combination in combinations:
-            if combination['ol'] == quote and combination['occurrence'] == occurrence:
-                return combination['target']
-        return None
+        return AlignmentIndex(verse_objects).find_target_from_combination(quote, occurrence)
 
     def find_target_from_split(self, verse_objects, quote, occurrence, is_match=False):
-        words_to_match = []
-        if isinstance(quote, list):
-            for q in quote:
-                words_to_match.append(q['word'])
-        else:
-            words_to_match = quote.split(' ')
-        separator = ' '
-        needs_ellipsis = False
-        text = ''
-        for index, verse_object in enumerate(verse_objects):
-            last_match = False
-            if 'type' in verse_object and (verse_object['type'] == 'milestone' or verse_object['type'] == 'word'):
-                if ((('content' in verse_object and verse_object['content'] in words_to_match) or ('lemma' in verse_object and verse_object['lemma'] in words_to_match)) and verse_object['occurrence'] == occurrence) or is_match:
-                    last_match = True
-                    if needs_ellipsis:
-                        separator += '... '
-                        needs_ellipsis = False
-                    if text:
-                        text += separator
-                    separator = ' '
-                    if 'text' in verse_object and verse_object['text']:
-                        text += verse_object['text']
-                    if 'children' in verse_object and verse_object['children']:
-                        text += self.find_target_from_split(verse_object['children'], quote, occurrence, True)
-                elif 'children' in verse_object and verse_object['children']:
-                    child_text = self.find_target_from_split(verse_object['children'], quote, occurrence, is_match)
-                    if child_text:
-                        last_match = True
-                        if needs_ellipsis:
-                            separator += '... '
-                            needs_ellipsis = False
-                        text += (separator if text else '') + child_text
-                        separator = ' '
-                    elif text:
-                        needs_ellipsis = True
-            if last_match and (index+1) in verse_objects and verse_objects[index + 1]['type'] == "text" and text:
-                if separator == ' ':
-                    separator = ''
-                separator += verse_objects[index + 1]['text']
-        return text
+        return find_target_from_split(verse_objects, quote, occurrence, is_match)
 
-    def get_aligned_text(self, verse_objects, context_id, is_match=False):
+    def get_aligned_text(self, verse_objects, context_id, is_match=False, alignment_index=None):
         if not verse_objects or not context_id or 'quote' not in context_id or not context_id['quote']:
             return ''
-        text = self.find_target_from_combination(verse_objects, context_id['quote'], context_id['occurrence'])
+        if alignment_index is None:
+            alignment_index = AlignmentIndex(verse_objects)
+        text = alignment_index.find_target_from_combination(context_id['quote'], context_id['occurrence'])
         if text:
             return text
-        text = self.find_target_from_split(verse_objects, context_id['quote'], context_id['occurrence'])
+        text = alignment_index.find_target_from_split(context_id['quote'], context_id['occurrence'])
         if text:
             return text
         rc = 'rc://{0}/{1}/bible/{2}/{3}/{4}'.format(self.lang_code, self.ult_id, self.book_id,
@@ -1461,36 +1374,53 @@ class TnConverter(object):
         text = re.sub(r' 0*(\d+):0*(\d+)(-*)0*(\d*)', r' \1:\2\3\4', text, flags=re.IGNORECASE | re.MULTILINE)
         return text
 
-    def get_chunk_html(self, usfm, resource, chapter, verse):
-        usfm_chunks_path = os.path.join(self.working_dir, 'usfm_chunks', 'usfm-{0}-{1}-{2}-{3}-{4}'.
-                                        format(self.lang_code, resource, self.book_id, chapter, verse))
-        filename_base = '{0}-{1}-{2}-{3}'.format(resource, self.book_id, chapter, verse)
-        html_file = os.path.join(usfm_chunks_path, '{0}.html'.format(filename_base))
-        usfm_file = os.path.join(usfm_chunks_path, '{0}.usfm'.format(filename_base))
-        if not os.path.exists(usfm_chunks_path):
-            os.makedirs(usfm_chunks_path)
-        usfm = '''\id {0}
+    def get_chunk_usfm(self, usfm, chapter):
+        return '''\id {0}
 \ide UTF-8
 \h {1}
 \mt {1}
 
 \c {2}
 {3}'''.format(self.book_id.upper(), self.book_title, chapter, usfm)
-        write_file(usfm_file, usfm)
-        UsfmTransform.buildSingleHtml(usfm_chunks_path, usfm_chunks_path, filename_base)
-        html = read_file(os.path.join(usfm_chunks_path, filename_base+'.html'))
+
+    def get_chunk_html(self, usfm, resource, chapter, verse):
+        html = SingleHTMLRenderer().render_html(self.get_chunk_usfm(usfm, chapter))
         soup = BeautifulSoup(html, 'html.parser')
-        header = soup.find('h1')
+        return self.get_chunk_body_html(soup.body, resource)
+
+    def get_chunks_html(self, chunks, resource):
+        """
+        Renders all the chunks of the book for the resource, with the same result as calling get_chunk_html()
+        for each chunk. Each chunk is rendered as its own document into one buffer, and their bodies are then
+        parsed as a single document, each in its own div.
+        :param list chunks: (usfm, chapter) of each chunk
+        :param str resource:
+        :return list: The HTML of each chunk
+        """
+        documents = SingleHTMLRenderer().render_html_documents([self.get_chunk_usfm(usfm, chapter)
+                                                                for (usfm, chapter) in chunks])
+        bodies = []
+        for document in documents:
+            start = document.find('<body>')
+            end = document.rfind('</body>')
+            if start < 0 or end < start:
+                self.logger.error('Unable to render the {0} chunks together'.format(resource))
+                return [self.get_chunk_html(usfm, resource, chapter, None) for (usfm, chapter) in chunks]
+            bodies.append('<div class="usfm-chunk">{0}</div>'.format(document[start+len('<body>'):end]))
+        soup = BeautifulSoup('<html><body>{0}</body></html>'.format(''.join(bodies)), 'html.parser')
+        return [self.get_chunk_body_html(div, resource)
+                for div in soup.body.find_all('div', {'class': 'usfm-chunk'}, recursive=False)]
+
+    def get_chunk_body_html(self, body, resource):
+        header = body.find('h1')
         if header:
             header.decompose()
-        chapter = soup.find('h2')
+        chapter = body.find('h2')
         if chapter:
             chapter.decompose()
-        for span in soup.find_all('span', {'class': 'v-num'}):
+        for span in body.find_all('span', {'class': 'v-num'}):
             span['id'] = '{0}-{1}'.format(resource, span['id'])
-        html = ''.join(['%s' % x for x in soup.body.contents])
-        write_file(html_file, html)
-        return html
+        return ''.join(['%s' % x for x in body.contents])
 
 
 def main(ta_tag, tn_tag, tw_tag, ust_tag, ult_tag, ust_id, ult_id, tn_id,
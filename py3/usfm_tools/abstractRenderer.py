@@ -1,6 +1,6 @@
 import logging
 
-from .books import loadBooks, silNames
+from .books import loadBooks, bookID, silNames
 from .parseUsfm import parseString
 
 
@@ -21,6 +21,16 @@ class AbstractRenderer:
         self.booksUsfm = loadBooks(usfmDir)
 
 
+    def loadUSFMString(self, usfm):
+        """
+        Loads a single book from a string, the same way that loadUSFM() loads it from a file
+        """
+        self.booksUsfm = {}
+        usfm = usfm.replace('\r\n', '\n').replace('\r', '\n').lstrip()
+        if usfm[:4] == r'\id ' and usfm[4:7] in silNames:
+            self.booksUsfm[bookID(usfm)] = usfm
+
+
     def run(self):
         # logging.debug(f"AbstractRenderer.run() to convert {len(self.booksUsfm)} books…")
         self.unknowns = []
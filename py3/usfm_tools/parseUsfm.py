@@ -536,8 +536,40 @@ def createToken(t):
 
 
 
+class TokenClass(type):
+    """
+    Metaclass that gives each token class an integer marker code and a one-bit mask, in order of
+    definition, and empty __slots__ so that token instances carry no __dict__.
+    Classify a token with a single test against the category masks, e.g. token.bit & POETRY.
+    """
+    ncodes = 0
+
+    def __new__(meta, name, bases, namespace):
+        namespace.setdefault('__slots__', ())
+        cls = super().__new__(meta, name, bases, namespace)
+        cls.code = TokenClass.ncodes
+        cls.bit = 1 << cls.code
+        TokenClass.ncodes += 1
+        return cls
+
+
+def tokenMask(*classes):
+    """
+    Returns the bitmask that matches tokens of any of the specified classes.
+    :param classes: UsfmToken subclasses
+    :return: int
+    """
+    mask = 0
+    for cls in classes:
+        mask |= cls.bit
+    return mask
+
+
+# The isX() methods are kept for compatibility. Prefer the bitmasks where speed matters.
 # noinspection PyMethodMayBeStatic
-class UsfmToken:
+class UsfmToken(metaclass=TokenClass):
+    __slots__ = ('value', 'type')
+
     def __init__(self, value=''):
         self.value = value
         self.type = None
@@ -1323,3 +1355,15 @@ class BKStartToken(UsfmToken):
 class BKEndToken(UsfmToken):
     def renderOn(self, printer):  return printer.render_bk_e(self)
     def is_bk_e(self):            return True
+
+
+# Category masks
+POETRY = tokenMask(QToken, Q1Token, Q2Token, Q3Token, Q4Token, QAToken, QRToken, QCToken)
+PARAGRAPH = tokenMask(PToken, MToken, PIToken, PI1Token, PI2Token, PCToken, MIToken, NBToken)
+FOOTNOTE = tokenMask(FStartToken, FEndToken, FEStartToken, FEEndToken, FRToken, FREndToken, FKToken,
+                     FTToken, FTEndToken, FQToken, FQEndToken, FQAToken, FQAEndToken, FQBToken,
+                     FVStartToken, FVEndToken, FDCStartToken, FDCEndToken, FPToken)
+CROSSREF = tokenMask(XStartToken, XEndToken, XOToken, XTToken)
+TITLE = tokenMask(HToken, TOC1Token, TOC2Token, TOC3Token, MTToken, MT1Token, MT2Token, MT3Token,
+                  IMTToken, IMT1Token, IMT2Token, IMT3Token)
+INTRO = tokenMask(ISToken, IS1Token, IS2Token, IS3Token, IPToken, IOTToken, IOToken, IO1Token, IMToken)
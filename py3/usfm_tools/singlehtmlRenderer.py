@@ -1,3 +1,4 @@
+import io
 import logging
 import re
 
@@ -8,15 +9,23 @@ from .parseUsfm import UsfmToken
 #
 #   Simplest renderer. Ignores everything except ascii text.
 #
+#   render_html() and render_html_documents() render from strings to memory, for tn/generate_pdf.py.
+#   The legacy tn/generate_tn_pdf.py still writes each chunk to a file and renders it with the external
+#   usfm_tools package, which has no in-memory API; it has not been changed to use them.
+#
 
 class SingleHTMLRenderer(AbstractRenderer):
-    def __init__(self, inputDir, outputFilename):
+    def __init__(self, inputDir=None, outputFilename=None):
         # logging.debug(f"SingleHTMLRenderer.__init__( {inputDir}, {outputFilename} ) …")
         # Unset
         self.f = None  # output file stream
         # IO
         self.outputFilename = outputFilename
         self.inputDir = inputDir
+        self.resetState()
+
+
+    def resetState(self):
         # Position
         self.cb = ''    # Current Book
         self.cc = '001'    # Current Chapter
@@ -48,10 +57,51 @@ class SingleHTMLRenderer(AbstractRenderer):
         self.loadUSFM(self.inputDir) # Result is in self.booksUsfm
         #print(f"About to render USFM ({len(self.booksUsfm)} books): {str(self.booksUsfm)[:300]} …")
         with open(self.outputFilename, 'wt', encoding='utf-8') as self.f:
-            warning_list = self.run()
-            self.writeFootnotes()
-            self.writeCrossReferences()
-            self.f.write('\n    </body>\n</html>\n')
+            warning_list = self.writeDocument()
+        return warning_list
+
+
+    def render_html(self, usfm_text):
+        """
+        Renders one book from a string to an in-memory buffer, without using the input directory or output file.
+        Gives the same HTML that render() writes for a directory holding just that book.
+        The warnings are left in self.warning_list.
+        :param str usfm_text: The USFM of the book, starting with its \\id marker
+        :return str: The HTML document
+        """
+        self.resetState()
+        self.loadUSFMString(usfm_text)
+        self.f = io.StringIO()
+        self.warning_list = self.writeDocument()
+        return self.f.getvalue()
+
+
+    def render_html_documents(self, usfm_texts):
+        """
+        Renders many small texts, such as the chunks of a book, each as a separate document with the same result
+        as render_html(). Each text is still parsed and rendered on its own; only the output buffer is shared,
+        and it is sliced into the documents at the end.
+        The warnings of all the texts are left in self.warning_list.
+        :param list usfm_texts: The USFM of each piece, starting with its \\id marker
+        :return list: The HTML document of each piece
+        """
+        self.f = io.StringIO()
+        self.warning_list = set()
+        ends = []
+        for usfm_text in usfm_texts:
+            self.resetState()
+            self.loadUSFMString(usfm_text)
+            self.warning_list |= self.writeDocument()
+            ends.append(self.f.tell())
+        html = self.f.getvalue()
+        return [html[start:end] for (start, end) in zip([0] + ends, ends)]
+
+
+    def writeDocument(self):
+        warning_list = self.run()
+        self.writeFootnotes()
+        self.writeCrossReferences()
+        self.f.write('\n    </body>\n</html>\n')
         return warning_list
 
 
@@ -628,19 +628,19 @@ def takeUnknown(state, token):
         report_error(f"{state.referenceString} - Unknown USFM token: '\\{value}'")
 
 
+footnoteMask = parseUsfm.tokenMask(parseUsfm.FStartToken, parseUsfm.FEndToken,
+                                   parseUsfm.FRToken, parseUsfm.FREndToken,
+                                   parseUsfm.FTToken, parseUsfm.FTEndToken,
+                                   parseUsfm.FPToken,
+                                   parseUsfm.FEStartToken, parseUsfm.FEEndToken)
+
 # Returns True if token is part of a footnote
 def isFootnote(token):
-    return token.isF_S() or token.isF_E() \
-        or token.isFR() or token.isFR_E() \
-        or token.isFT() or token.isFT_E() \
-        or token.isFP() \
-        or token.isFE_S() or token.isFE_E()
+    return token.bit & footnoteMask
 
 # Returns true if token is part of a cross reference.
 def isCrossRef(token):
-    return token.isX_S() or token.isX_E() \
-        or token.isXO() \
-        or token.isXT()
+    return token.bit & parseUsfm.CROSSREF
 
 
 # Returns True if the specified reference immediately FOLLOWS a verse that does not appear in some manuscripts.
@@ -649,22 +649,33 @@ def isOptional(ref):
 #   return ref in { 'MAT 17:21', 'MAT 18:11', 'MAT 23:14', 'MRK 7:16', 'MRK 9:44', 'MRK 9:46', 'MRK 11:26', 'MRK 15:28', 'MRK 16:9', 'MRK 16:12', 'MRK 16:14', 'MRK 16:17', 'MRK 16:19', 'LUK 17:36', 'LUK 23:17', 'JHN 5:4', 'JHN 7:53', 'JHN 8:1', 'JHN 8:4', 'JHN 8:7', 'JHN 8:9', 'ACT 8:37', 'ACT 15:34', 'ACT 24:7', 'ACT 28:29', 'ROM 16:24' }
     return ref in { 'MAT 17:22', 'MAT 18:12', 'MAT 23:15', 'MRK 7:17', 'MRK 9:45', 'MRK 9:47', 'MRK 11:27', 'MRK 15:29', 'LUK 17:37', 'LUK 23:18', 'JHN 5:5', 'ACT 8:38', 'ACT 15:35', 'ACT 24:8', 'ACT 28:30', 'ROM 16:25' }
 
+poetryMask = parseUsfm.tokenMask(parseUsfm.QToken, parseUsfm.Q1Token, parseUsfm.QAToken, parseUsfm.SPToken)
+
 def isPoetry(token):
-    return token.isQ() or token.isQ1() or token.isQA() or token.isSP()
+    return token.bit & poetryMask
+
+introMask = parseUsfm.tokenMask(parseUsfm.ISToken, parseUsfm.IS1Token, parseUsfm.IPToken, parseUsfm.IOTToken,
+                                parseUsfm.IO1Token)
 
 def isIntro(token):
-    return token.is_is1() or token.is_ip() or token.is_iot() or token.is_io1()
+    return token.bit & introMask
+
+# RJH added this 16May2019 -- doesn't contain all character format codes yet
+characterFormattingMask = parseUsfm.tokenMask(parseUsfm.ADDStartToken, parseUsfm.ADDEndToken,
+                                              parseUsfm.NDStartToken, parseUsfm.NDEndToken,
+                                              parseUsfm.WJStartToken, parseUsfm.WJEndToken,
+                                              parseUsfm.BDStartToken, parseUsfm.BDEndToken,
+                                              parseUsfm.BDITStartToken, parseUsfm.BDITEndToken,
+                                              parseUsfm.SCStartToken, parseUsfm.SCEndToken,
+                                              parseUsfm.CAStartToken, parseUsfm.CAEndToken,
+                                              parseUsfm.VAStartToken, parseUsfm.VAEndToken)
 
 def isCharacterFormatting(token):
-    # RJH added this 16May2019 -- doesn't contain all character format codes yet
-    return token.isADDS() or token.isADDE() \
-        or token.isNDS() or token.isNDE() \
-        or token.isWJS() or token.isWJE() \
-        or token.isBDS() or token.isBDE() \
-        or token.isBDITS() or token.isBDITE() \
-        or token.isSCS() or token.isSCE() \
-        or token.isCAS() or token.isCAE() \
-        or token.isVAS() or token.isVAE()
+    return token.bit & characterFormattingMask
+
+textCarryingMask = parseUsfm.tokenMask(parseUsfm.BToken, parseUsfm.MToken, parseUsfm.DToken) \
+    | footnoteMask | parseUsfm.CROSSREF | poetryMask | introMask \
+    | characterFormattingMask  # RJH added this (for \wj fields, etc.)
 
 def isTextCarryingToken(token):
     """
@@ -672,9 +683,7 @@ def isTextCarryingToken(token):
                     and character (e.g., footnote) markers???
             Also, does it check if they actually contain text?
     """
-    return token.isB() or token.isM() or token.isD() or isFootnote(token) \
-        or isCrossRef(token) or isPoetry(token) or isIntro(token) \
-        or isCharacterFormatting(token) # RJH added this (for \wj fields, etc.)
+    return token.bit & textCarryingMask
 
 
 def take(token):
@@ -24,6 +24,7 @@ import subprocess
 import csv
 import json
 import git
+from collections import OrderedDict
 from glob import glob
 from bs4 import BeautifulSoup
 from usfm_tools.transform import UsfmTransform
@@ -40,6 +41,7 @@ DEFAULT_UST_ID = 'ust'
 DEFAULT_ULT_ID = 'ult'
 DEFAULT_TN_ID = 'tn'
 OWNERS = [DEFAULT_OWNER, 'STR', 'Door43-Catalog']
+CHAPTER_CACHE_SIZE = 16  # decoded chapter files kept by a TnConverter, enough for the ULT and UST chapters in use
 
 
 def print(obj):
@@ -71,6 +73,41 @@ def get_latest_version(path_to_versions):
         return path_to_versions
 
 
+class LruCache(object):
+    """
+    A bounded cache of the most recently used values, which loads the other values when they are asked for,
+    and counts its hits and misses for the log.
+    """
+
+    def __init__(self, name, loader, max_size):
+        """
+        :param str name: The name of the cache in the log
+        :param loader: The function that returns the value of a key that is not in the cache
+        :param int max_size: The number of values to keep
+        """
+        self.name = name
+        self.loader = loader
+        self.max_size = max_size
+        self.values = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        if key in self.values:
+            self.hits += 1
+            value = self.values.pop(key)
+        else:
+            self.misses += 1
+            value = self.loader(key)
+            if len(self.values) >= self.max_size:
+                self.values.popitem(last=False)
+        self.values[key] = value
+        return value
+
+    def log_stats(self, logger):
+        logger.info('{0} cache: {1} hits, {2} misses'.format(self.name, self.hits, self.misses))
+
+
 class TnConverter(object):
 
     def __init__(self, ta_tag=None, tn_tag=None, tw_tag=None, ust_tag=None, ult_tag=None, ugnt_tag=None,
@@ -144,6 +181,8 @@ class TnConverter(object):
         self.openQuote = False
         self.nextFollowsQuote = False
         self.generation_info = {}
+        self.bible_paths = LruCache('Bible path', self.get_bible_path, 4)
+        self.chapter_data = LruCache('Chapter verseObjects', load_json_object, CHAPTER_CACHE_SIZE)
         _print(self.ult_id)
 
     def run(self):
@@ -197,6 +236,8 @@ class TnConverter(object):
                                                                              format(self.book_file_id))))
                 self.generate_tn_pdf()
             _print('PDF file can be found at {0}/{1}.pdf'.format(self.output_dir, self.book_file_id))
+        self.bible_paths.log_stats(self.logger)
+        self.chapter_data.log_stats(self.logger)
 
     def save_bad_links(self):
         bad_links = "BAD LINKS:\n"
@@ -865,11 +906,13 @@ class TnConverter(object):
         newHtml += footerHtml
         return newHtml
 
+    def get_bible_path(self, resource):
+        return get_latest_version('tools/tn/{0}/bibles/{1}'.format(self.lang_code, resource))
+
     def get_all_words_to_match(self, resource, chapter, verse):
-        path = '{0}/{1}/{2}.json'.format(get_latest_version('tools/tn/{0}/bibles/{1}'.format(self.lang_code, resource)),
-                                         self.book_id, chapter)
+        path = '{0}/{1}/{2}.json'.format(self.bible_paths.get(resource), self.book_id, chapter)
         words = []
-        data = load_json_object(path)
+        data = self.chapter_data.get(path)
         chapter = int(chapter)
         if chapter in self.tw_words_data and verse in self.tw_words_data[chapter]:
             contextIds = self.tw_words_data[int(chapter)][int(verse)]
@@ -46,6 +46,7 @@ sys.path.append(r"C:\DCS\tools\md") # TODO: make package and load from package
 import stars
 import tsv
 import substitutions    # this module specifies the string substitutions to apply
+from substituter import Substituter
 
 
 # Calculates and returns the new header level.
@@ -179,6 +180,7 @@ def cleanAsterisks(note):
     #     note = note.replace("** ", "**", 1)
     return note
 
+substituter = Substituter(substitutions.subs)
 rightparen_re = re.compile(r'[^0-9०-९]\)', re.UNICODE)  # right paren not preceded by a number
 
 # Makes corrections on the vernacular note field.
@@ -201,8 +203,7 @@ def cleanNote(note, english_note):
     note = note.replace("rc://en/", replacement)
     note = note.replace("rc://en_ta/", "rc://" + language_code + "/ta/")
     note = cleanAsterisks(note)
-    for pair in substitutions.subs:
-        note = note.replace(pair[0], pair[1])
+    note = substituter.apply(note)
     note = uncloseHeadings(note)
     note = fixSpacing(note)     # fix spacing around hash marks
     note = fixHeadingLevels(note)
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+# This script times usfm_utils.unalign_usfm() against the original sequence of regular expression
+# passes, which is reproduced below as unalign_usfm_regex(), and checks that both produce the same output.
+# Run it on aligned books (UHB, UGNT, ULT, UST) after changing either function.
+#
+# Usage: python benchmark_unalign.py <folder or file> [repetitions]
+
+# Global variables
+source_dir = r"C:\DCS\English\en_ult"
+repetitions = 3
+
+import sys
+import os
+import io
+import re
+import time
+import usfm_utils
+
+nFiles = 0
+nDiffs = 0
+totalRegex = 0
+totalCurrent = 0
+
+# The original implementation of unalign_usfm()
+def unalign_usfm_regex(aligned_usfm):
+    usfm = re.sub(r'\\ts(-s)*\s*\\\*\s*', r'', aligned_usfm, flags=re.UNICODE | re.MULTILINE)
+    usfm = re.sub(r'\\zaln-s[^*]*?\*', r'', usfm, flags=re.UNICODE | re.MULTILINE)
+    usfm = re.sub(r'\\zaln-e\\\*', r'', usfm, flags=re.UNICODE | re.MULTILINE)
+    usfm = re.sub(r'\\k-s.*?\\\*', r'', usfm, flags=re.UNICODE | re.MULTILINE)
+    usfm = re.sub(r'\\k-e\\\*', r'', usfm, flags=re.UNICODE | re.MULTILINE)
+    usfm = re.sub(r'\\w ([^|]+)\|.*?\\w\*', r'\1', usfm, flags=re.UNICODE | re.MULTILINE)
+    usfm = re.sub(r'^\n', '', usfm, flags=re.UNICODE | re.MULTILINE)
+    usfm = re.sub(r'^([^\\].*)\n(?=[^\\])', r'\1 ', usfm, flags=re.UNICODE | re.MULTILINE)
+    usfm = re.sub(r'^\\(.*)\n(?=[^\\])', r'\\\1 ', usfm, flags=re.UNICODE | re.MULTILINE)
+    usfm = re.sub(r'  +', ' ', usfm, flags=re.UNICODE | re.MULTILINE)
+    usfm = re.sub(r"\s*' s(?!\w)", "'s", usfm, flags=re.UNICODE | re.MULTILINE)
+    usfm = re.sub(r'\\s5', '', usfm, flags=re.UNICODE | re.MULTILINE)
+    usfm = re.sub(r'\\fqa([^*]+)\\fqa(?![*])', r'\\fqa\1\\fqa*', usfm, flags=re.UNICODE | re.MULTILINE)
+    chapters = re.compile(r'\\c ').split(usfm)
+    usfm = chapters[0]
+    for chapter in chapters[1:]:
+        chapter = re.sub(r'[ \t]*"([^"]+)"[ \t]*', r' "\1" ', chapter, flags=re.UNICODE | re.MULTILINE | re.DOTALL)
+        usfm += '\\c {0}'.format(chapter)
+    usfm = re.sub(r'\\(\w+\**)([^\w* \n])', r'\\\1 \2', usfm, flags=re.UNICODE | re.MULTILINE)
+    usfm = re.sub(r" ' ", r" '", usfm, flags=re.UNICODE | re.MULTILINE)
+    usfm = re.sub(r' +([:;.?,!\]})-])', r'\1', usfm, flags=re.UNICODE | re.MULTILINE)
+    usfm = re.sub(r'([{(\[-]) +', r'\1', usfm, flags=re.UNICODE | re.MULTILINE)
+    return usfm.strip()
+
+# Returns the best time in seconds of several calls to fn(str), and the result.
+def timeit(fn, str):
+    best = None
+    for i in range(repetitions):
+        start = time.perf_counter()
+        result = fn(str)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return (best, result)
+
+def benchmarkFile(path):
+    global nFiles, nDiffs, totalRegex, totalCurrent
+    with io.open(path, "tr", 1, encoding="utf-8-sig") as input:
+        str = input.read(-1)
+    nFiles += 1
+    (regexTime, expected) = timeit(unalign_usfm_regex, str)
+    (currentTime, actual) = timeit(usfm_utils.unalign_usfm, str)
+    totalRegex += regexTime
+    totalCurrent += currentTime
+    fname = os.path.basename(path)
+    sys.stdout.write(f"{fname}: {len(str)} chars, regex {regexTime*1000:.1f} ms, unalign_usfm {currentTime*1000:.1f} ms\n")
+    if actual != expected:
+        nDiffs += 1
+        pos = next((i for i in range(min(len(expected), len(actual))) if expected[i] != actual[i]), min(len(expected), len(actual)))
+        sys.stdout.write(f"  output differs at offset {pos}:\n    regex:        {expected[pos:pos+60]!r}\n    unalign_usfm: {actual[pos:pos+60]!r}\n")
+
+def benchmarkFolder(folder):
+    for fname in os.listdir(folder):
+        path = os.path.join(folder, fname)
+        if fname[0] != '.' and os.path.isdir(path):
+            benchmarkFolder(path)
+        elif fname.endswith('sfm'):
+            benchmarkFile(path)
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] != 'hard-coded-path':
+        source_dir = sys.argv[1]
+    if len(sys.argv) > 2:
+        repetitions = int(sys.argv[2])
+    if os.path.isdir(source_dir):
+        benchmarkFolder(source_dir)
+    elif os.path.isfile(source_dir):
+        benchmarkFile(source_dir)
+    else:
+        sys.stderr.write("Invalid folder or file: " + source_dir)
+        exit(-1)
+    if totalCurrent > 0:
+        sys.stdout.write(f"{nFiles} file(s), {nDiffs} with different output. Total regex {totalRegex:.2f}s, unalign_usfm {totalCurrent:.2f}s ({totalRegex/totalCurrent:.1f}x)\n")
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+# This script times the whole-file checks of verifyUSFM, done by a single verifyUSFM.scanText() pass,
+# against the original separate regular expression passes, which are reproduced below as wholeFileRegex(),
+# and checks that both report the same messages.
+# Run it on large books after changing either one.
+#
+# Usage: python benchmark_wholefile.py <folder or file> [repetitions]
+
+# Global variables
+source_dir = r"C:\DCS\English\en_ult"
+repetitions = 5
+
+import sys
+import os
+import io
+import time
+import usfm_utils
+import verifyUSFM
+
+nFiles = 0
+nDiffs = 0
+totalRegex = 0
+totalScan = 0
+messages = []
+verifier = None
+
+# Collects the messages instead of writing them to issues.txt
+def collectError(msg, errorId=0, summarize_only=False):
+    messages.append((msg, errorId))
+
+# The original whole-file checks of verifyFile(), verifyWholeFile() and verifyChapterAndVerseMarkers()
+def wholeFileRegex(raw, contents, path):
+    v = verifyUSFM
+    reportError = verifier.reportError
+    if v.wjwj_re.search(raw):
+        reportError("Empty \\wj \\wj* pair(s) in " + path, 77)
+    if v.backslasheol_re.search(raw):
+        reportError("Stranded backslash(es) at end of line(s) in " + path, 78)
+    if '\x00' in raw:
+        reportError("Null bytes found in " + path, 79)
+    for badactor in v.bad_chapter_re1.finditer(contents):
+        reportError("Missing newline before chapter marker: " + badactor.group(1) + " in " + path, 69)
+    for badactor in v.bad_chapter_re2.finditer(contents):
+        reportError("Missing space before chapter number: " + badactor.group(0) + " in " + path, 70)
+    for badactor in v.bad_chapter_re3.finditer(contents):
+        reportError("Missing space after chapter number: " + badactor.group(1) + " in " + path, 71)
+    for badactor in v.bad_verse_re1.finditer(contents):
+        s = badactor.group(1)
+        if s[0] < ' ' or s[0] > '~': # not printable ascii
+            s = s[1:]
+        reportError("Missing white space before verse marker: " + s + " in " + path, 72)
+    for badactor in v.bad_verse_re2.finditer(contents):
+        reportError("Missing space before verse number: " + badactor.group(0) + " in " + path, 73)
+    for badactor in v.bad_verse_re3.finditer(contents):
+        reportError("Missing space after verse number: " + badactor.group(1) + " in " + path, 74)
+    lines = contents.split('\n')
+    if v.orphantext_re.search(contents):
+        prevline = "xx"
+        lineno = 0
+        for line in lines:
+            lineno += 1
+            if not prevline and line and line[0] != '\\':
+                if not v.conflict_re.match(line):
+                    reportError("Unmarked text at line " + str(lineno) + " in " + path, 76)
+            prevline = line
+    nembedded = len(v.embeddedquotes_re.findall(contents))
+    nsingle = contents.count("'") - nembedded
+    ndouble = contents.count('"')
+    if ndouble > 0:
+        if nsingle == 0:
+            reportError(f"Straight quotes in {path}: {ndouble} doubles.", 75)
+        else:
+            reportError(f"Straight quotes in {path}: {ndouble} doubles, {nsingle} singles not counting {nembedded} word-medial.", 75)
+    elif nsingle > 0:
+        reportError(f"Straight quotes in {path}: {nsingle} singles not counting {nembedded} word-medial.", 75)
+
+# The same checks as done by verifyFile() now
+def wholeFileScan(raw, contents, path):
+    found = verifyUSFM.scanText(raw, whole=(raw is contents))
+    if found.wjwj:
+        verifier.reportError("Empty \\wj \\wj* pair(s) in " + path, 77)
+    if found.backslasheol:
+        verifier.reportError("Stranded backslash(es) at end of line(s) in " + path, 78)
+    if found.null:
+        verifier.reportError("Null bytes found in " + path, 79)
+    verifier.verifyWholeFile(contents, path, found if raw is contents else None)
+
+# Returns the best time in seconds of several calls to fn(), and the messages reported by the last call.
+def timeit(fn, *args):
+    best = None
+    for i in range(repetitions):
+        messages.clear()
+        start = time.perf_counter()
+        fn(*args)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return (best, list(messages))
+
+def benchmarkFile(path):
+    global nFiles, nDiffs, totalRegex, totalScan
+    with io.open(path, "tr", 1, encoding="utf-8-sig") as input:
+        raw = input.read(-1)
+    contents = raw
+    if "lemma=" in raw or "x-occurrences" in raw:
+        contents = usfm_utils.unalign_usfm(raw)
+    nFiles += 1
+    fname = os.path.basename(path)
+    (regexTime, expected) = timeit(wholeFileRegex, raw, contents, fname)
+    (scanTime, actual) = timeit(wholeFileScan, raw, contents, fname)
+    totalRegex += regexTime
+    totalScan += scanTime
+    sys.stdout.write(f"{fname}: {len(raw)} chars, {len(expected)} messages, regex {regexTime*1000:.1f} ms, scanText {scanTime*1000:.1f} ms\n")
+    if actual != expected:
+        nDiffs += 1
+        sys.stdout.write(f"  messages differ:\n    regex:    {expected}\n    scanText: {actual}\n")
+
+def benchmarkFolder(folder):
+    for fname in os.listdir(folder):
+        path = os.path.join(folder, fname)
+        if fname[0] != '.' and os.path.isdir(path):
+            benchmarkFolder(path)
+        elif fname.endswith('sfm'):
+            benchmarkFile(path)
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] != 'hard-coded-path':
+        source_dir = sys.argv[1]
+    if len(sys.argv) > 2:
+        repetitions = int(sys.argv[2])
+    verifier = verifyUSFM.Verifier("", config={'source_dir': source_dir, 'language_code': ""})
+    verifier.reportError = collectError
+    if os.path.isdir(source_dir):
+        benchmarkFolder(source_dir)
+    elif os.path.isfile(source_dir):
+        benchmarkFile(source_dir)
+    else:
+        sys.stderr.write("Invalid folder or file: " + source_dir)
+        exit(-1)
+    if totalScan > 0:
+        sys.stdout.write(f"{nFiles} file(s), {nDiffs} with different messages. Total regex {totalRegex:.2f}s, scanText {totalScan:.2f}s ({totalRegex/totalScan:.1f}x)\n")
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+# This script parses one or more .usfm files with both parseUsfm backends
+# (the pyparsing grammar and the hand-written scanner) and reports any difference
+# in the token streams, along with the time taken by each backend.
+# Use it to check the scanner against real books before relying on it.
+# tests/test_parseUsfm.py makes the same comparison on the sample books in tests/data.
+#
+# Usage: python compare_parsers.py <folder or file>
+
+import sys
+import os
+import io
+import time
+import parseUsfm
+
+nFiles = 0
+nDiffs = 0
+
+# Compares the token streams for a single file.
+def compareFile(path):
+    global nFiles, nDiffs
+    with io.open(path, "tr", 1, encoding="utf-8-sig") as input:
+        str = input.read(-1)
+    nFiles += 1
+
+    start = time.perf_counter()
+    parseUsfm.backend = 'pyparsing'
+    expected = parseUsfm.parseString(str)
+    pyparsingTime = time.perf_counter() - start
+
+    start = time.perf_counter()
+    parseUsfm.backend = 'scanner'
+    actual = parseUsfm.parseString(str)
+    scannerTime = time.perf_counter() - start
+
+    fname = os.path.basename(path)
+    sys.stdout.write(f"{fname}: {len(expected)} tokens, pyparsing {pyparsingTime:.2f}s, scanner {scannerTime:.2f}s\n")
+    for i in range(max(len(expected), len(actual))):
+        e = (type(expected[i]), expected[i].type, expected[i].value) if i < len(expected) else None
+        a = (type(actual[i]), actual[i].type, actual[i].value) if i < len(actual) else None
+        if e != a:
+            nDiffs += 1
+            sys.stdout.write(f"  token {i} differs:\n    pyparsing: {e}\n    scanner:   {a}\n")
+            break
+
+# Compares the token streams for the book or books contained in the specified folder
+def compareFolder(folder):
+    for fname in os.listdir(folder):
+        path = os.path.join(folder, fname)
+        if fname[0] != '.' and os.path.isdir(path):
+            compareFolder(path)
+        elif fname.endswith('sfm'):
+            compareFile(path)
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        sys.stderr.write("Usage: python compare_parsers.py <folder or file>\n")
+        exit(-1)
+    source_dir = sys.argv[1]
+    if os.path.isdir(source_dir):
+        compareFolder(source_dir)
+    elif os.path.isfile(source_dir):
+        compareFile(source_dir)
+    else:
+        sys.stderr.write("Invalid folder or file: " + source_dir)
+        exit(-1)
+    sys.stdout.write(f"{nFiles} file(s) compared, {nDiffs} with differences.\n")
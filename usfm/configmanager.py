@@ -5,6 +5,9 @@ from configparser import ConfigParser
 import os
 import io
 
+# Sections that take the place of the config file, set in the worker processes that run the wizard's jobs.
+overrides = None
+
 class ToolsConfigManager:
     def __init__(self):
         # self.configpath = os.path.expanduser("~/Documents/tools_config.ini")
@@ -21,6 +24,9 @@ class ToolsConfigManager:
     # Creates default config file if it is empty or doesn't exist.
     # Reads the config file.
     def _init_config(self):
+        if overrides is not None:
+            self.config.read_dict(overrides)
+            return
         self.config.read(self.configpath, encoding='utf-8')
         if not self.config.sections():
             self._make_default_config()
@@ -50,9 +56,15 @@ class ToolsConfigManager:
     
     def write_section(self, sectionname, sec):
         self.config[sectionname] = sec
+        if overrides is not None:
+            return
         with io.open(self.configpath, "tw", encoding='utf-8', newline='\n') as file:
             self.config.write(file)
 
+    # Returns the values of all sections, to be used as overrides by a job in a worker process.
+    def snapshot(self):
+        return {name: dict(self.config[name]) for name in self.config.sections()}
+
     def default_section(self, sectionname):
         match sectionname:
             case 'MarkParagraphs':
@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+# Runs the scripts of the USFM Wizard in worker processes.
+# Each job calls the main() function of one script module in its own process, so the wizard stays responsive,
+# a job can be cancelled, and independent steps can run at the same time on different folders.
+# In the worker process the script reports to a JobGui, which takes the place of the wizard and
+# passes each message over a queue. The wizard polls the queue from the Tk mainloop with after().
+# A job reads its configuration from a snapshot of the config file taken when the job starts,
+# so the user can change the settings of a step while it runs.
+# A cancelled job stops at the next progress message from the script, which is normally between books,
+# and its process is terminated if it has not stopped after cancelGrace seconds.
+# A script marks the places where it replaces files with writingFiles(), and a job is never terminated
+# in one of them, so that no file is left half-written.
+
+import contextlib
+import importlib
+import multiprocessing
+import queue
+import threading
+import time
+import traceback
+
+pollInterval = 100      # milliseconds between polls of the message queue
+cancelGrace = 5         # seconds a cancelled job has to stop by itself before its process is terminated
+
+# The config section read by each script
+scriptSections = {'mark_paragraphs': 'MarkParagraphs',
+                  'plaintext2usfm': 'Plaintext2Usfm',
+                  'revertChanges': 'RevertChanges',
+                  'txt2USFM': 'Txt2USFM',
+                  'usfm2usx': 'Usfm2Usx',
+                  'usfm_cleanup': 'UsfmCleanup',
+                  'verifyManifest': 'VerifyManifest',
+                  'verifyUSFM': 'VerifyUSFM'}
+
+# Returns the folder that the script works in, according to the configuration.
+def jobFolder(module, sections):
+    return sections.get(scriptSections.get(module), {}).get('source_dir', "")
+
+# Raised in the worker process by the first progress message from the script after the job is cancelled.
+# Derived from BaseException so that the scripts' own exception handlers let it through.
+class Cancelled(BaseException):
+    pass
+
+# Takes the place of the wizard for a script running in a worker process.
+# The scripts append their messages to progress while holding progress_lock, then call event_generate().
+class JobGui:
+    def __init__(self, jobid, messages, cancel, writeLock):
+        self.jobid = jobid
+        self.messages = messages
+        self.cancel = cancel
+        self.writeLock = writeLock      # held while the script replaces files, see writingFiles()
+        self.progress = ""
+        self.progress_lock = threading.Lock()
+
+    # Sends the event to the wizard, along with the messages accumulated since the last event.
+    # Only a progress message, which a script sends before it starts on a book, stops a cancelled job.
+    def event_generate(self, event, when=None):
+        with self.progress_lock:
+            text = self.progress
+            self.progress = ""
+        self.messages.put((self.jobid, event, text))
+        if event == '<<ScriptProgress>>' and self.cancel.is_set():
+            raise Cancelled()
+
+# Returns a context manager for the part of a script that replaces files.
+# A job is not terminated while its script is in that part. Does nothing if the script is not running in a job.
+def writingFiles(gui):
+    return gui.writeLock if isinstance(gui, JobGui) else contextlib.nullcontext()
+
+# The main function of a worker process.
+# Sends (jobid, None, status) when the script is finished.
+def runJob(jobid, module, sections, messages, cancel, writeLock):
+    import configmanager
+    configmanager.overrides = sections
+    status = ""
+    try:
+        script = importlib.import_module(module)
+        script.main(JobGui(jobid, messages, cancel, writeLock))
+    except Cancelled:
+        status = "Cancelled."
+    except SystemExit:
+        pass
+    except BaseException:
+        status = traceback.format_exc()
+    messages.put((jobid, None, status))
+
+class Job:
+    def __init__(self, jobid, module, count, folder, owner):
+        self.id = jobid
+        self.module = module
+        self.count = count      # number of progress messages expected, normally one per book
+        self.folder = folder
+        self.owner = owner      # the wizard step that started the job
+        self.done = 0           # number of progress messages received
+        self.book = ""          # the last progress message, which names the book being processed
+        self.status = ""        # messages to be shown at the end of the job
+        self.finished = False   # True when the script has returned
+        self.process = None
+        self.cancel = None
+        self.writeLock = None
+        self.cancelTime = None
+
+# Starts jobs and polls their messages.
+# listener has the methods onJobMessage(job, text), onJobProgress(job, text) and onJobEnd(job),
+# which are called from the Tk mainloop of root.
+class JobRunner:
+    def __init__(self, root, listener):
+        self.root = root
+        self.listener = listener
+        # Worker processes are spawned, not forked, because the wizard process has Tk and threads running.
+        self.context = multiprocessing.get_context('spawn')
+        self.messages = self.context.Queue()
+        self.jobs = dict()
+        self.nextId = 1
+        self.polling = False
+
+    # Returns the running job that works in the folder, or None.
+    def busy(self, folder):
+        for job in self.jobs.values():
+            if folder and job.folder == folder:
+                return job
+        return None
+
+    # Starts the main() function of the script module in a new worker process, and returns the Job.
+    # sections is the configuration, as returned by ToolsConfigManager.snapshot().
+    # The caller should first check that no other job is busy in the same folder.
+    def start(self, module, count, sections, owner=None):
+        job = Job(self.nextId, module, count, jobFolder(module, sections), owner)
+        self.nextId += 1
+        job.cancel = self.context.Event()
+        job.writeLock = self.context.RLock()
+        job.process = self.context.Process(target=runJob,
+                                           args=(job.id, module, sections, self.messages, job.cancel, job.writeLock))
+        job.process.start()
+        self.jobs[job.id] = job
+        if not self.polling:
+            self.polling = True
+            self.root.after(pollInterval, self.poll)
+        return job
+
+    # Asks the job to stop.
+    def cancel(self, job):
+        if job.id in self.jobs and job.cancelTime is None:
+            job.cancelTime = time.monotonic()
+            job.cancel.set()
+
+    # Terminates the job's process, unless it is replacing files.
+    # If wait is True, waits for the script to finish replacing files, otherwise leaves the job running.
+    # Returns True if the process was terminated.
+    def terminate(self, job, wait=False):
+        if not job.writeLock.acquire(block=wait):
+            return False
+        try:
+            job.process.terminate()
+            job.process.join()
+        finally:
+            job.writeLock.release()
+        return True
+
+    # Cancels all jobs and waits for them to stop, terminating any that take longer than cancelGrace.
+    # Called when the wizard exits.
+    def shutdown(self):
+        for job in self.jobs.values():
+            self.cancel(job)
+        deadline = time.monotonic() + cancelGrace
+        for job in self.jobs.values():
+            job.process.join(max(0, deadline - time.monotonic()))
+            if job.process.is_alive():
+                self.terminate(job, wait=True)
+        self.jobs.clear()
+
+    # Passes the queued messages to the listener, and ends the jobs whose processes have exited.
+    def poll(self):
+        exited = [job for job in self.jobs.values() if not job.process.is_alive()]
+        while True:
+            try:
+                (jobid, event, text) = self.messages.get_nowait()
+            except queue.Empty:
+                break
+            if jobid in self.jobs:
+                self.dispatch(self.jobs[jobid], event, text)
+        for job in exited:
+            self.endJob(job)
+        now = time.monotonic()
+        for job in self.jobs.values():
+            if job.cancelTime is not None and now - job.cancelTime > cancelGrace and job.process.is_alive():
+                self.terminate(job)
+        if self.jobs:
+            self.root.after(pollInterval, self.poll)
+        else:
+            self.polling = False
+
+    def dispatch(self, job, event, text):
+        match event:
+            case '<<ScriptProgress>>':
+                job.done += 1
+                if text:
+                    job.book = text.rsplit('\n', 1)[-1]
+                self.listener.onJobProgress(job, text)
+            case '<<ScriptMessage>>':
+                if text:
+                    self.listener.onJobMessage(job, text)
+            case _:     # '<<ScriptEnd>>', or None from runJob()
+                if text:
+                    job.status = text if not job.status else f"{job.status}\n{text}"
+                if event is None:
+                    job.finished = True
+
+    def endJob(self, job):
+        del self.jobs[job.id]
+        if job.cancelTime is not None and not job.finished:
+            job.status = "Cancelled." if not job.status else f"{job.status}\nCancelled."
+        elif not job.finished:
+            job.status = f"{job.status}\n{job.module} stopped unexpectedly.".lstrip()
+        self.listener.onJobEnd(job)
@@ -10,7 +10,7 @@ state = None
 
 import os
 import sys
-import parseUsfm
+import tokencache
 import io
 import re
 import json
@@ -135,7 +135,7 @@ def processFile(path):
 
     print("CHECKING " + shortname(path))
     sys.stdout.flush()
-    for token in parseUsfm.parseString(str):
+    for token in tokencache.parseString(str):
         take(token)
     state.addID("")
     sys.stderr.flush()
@@ -5,14 +5,23 @@
 # Does not insert paragraph marks in the middle of sentences, unless the sentence_sensitive config setting is False.
 # Marks unmarked text as section headings where present in model.
 # The input file(s) should be verified, correct USFM, except for unmarked text which may become section headings.
+# Set the USFM_PARAGRAPH_INDEX environment variable to a folder to save the paragraph and section locations found
+# in each model file there, with one subfolder for each model_dir, so a model file is only scanned again when it changes.
+# Without it, the model files are scanned every time.
+# Set the USFM_MARK_WORKERS environment variable to convert the files of a folder in that many processes.
 
 import configmanager
+import jobrunner
+import configparser
 import sys
 import os
+import tokencache
 import parseUsfm
 import io
 import re
 import shutil
+import hashlib
+import json
 import sentences
 import usfm_verses
 from usfmFile import usfmFile
@@ -22,6 +31,8 @@ config = None
 nCopied = 0     # number of paragraphs and sections copied from model
 issuesFile = None
 state = None
+collected = None    # In a worker process, the messages reported while converting a file.
+modelMessages = None    # The messages reported while scanning a model file.
 
 # Marker types
 TEXT = 1
@@ -286,16 +297,14 @@ def convertFile(usfmpath, fname):
     sys.stdout.flush()
     success = isParseable(str, fname)
     if success:
-        reportProgress(f"Converting {fname}")
-        sys.stdout.flush()
-        tokens = parseUsfm.parseString(str)
+        tokens = tokencache.parseString(str)
         for token in tokens:
             take(token)
         state.usfmClose()
         if nCopied > startn:
             renameUsfmFiles(usfmpath)
         else:
-            sys.stdout.write(f"  No changes to {fname}\n")
+            write(f"  No changes to {fname}\n")
             removeTempFiles(usfmpath)
     else:
         state.usfmClose()
@@ -307,12 +316,67 @@ def convertFolder(folder):
     if not os.path.isdir(folder):
         reportError("Invalid folder path given: " + folder)
         return
+    paths = listFiles(folder)
+    if workers > 1 and len(paths) > 1:
+        processFiles(paths)
+    else:
+        for path in paths:
+            processFile(path)
+
+# Returns the paths of the usfm files in the specified folder and its subfolders, in the order they are converted.
+def listFiles(folder):
+    paths = []
     for fname in os.listdir(folder):
         path = os.path.join(folder, fname)
         if fname[0] != '.' and os.path.isdir(path):
-            convertFolder(path)
+            paths += listFiles(path)
         elif fname.endswith('sfm'):
-            processFile(path)
+            paths.append(path)
+    return paths
+
+# Parallel conversion
+# Each file is converted in a worker process, starting from a new State. The worker collects the messages
+# instead of reporting them, and the main process reports them in the order of the files.
+workers = int(os.environ.get('USFM_MARK_WORKERS', '1'))
+
+# Runs in a worker process.
+# Returns the messages reported while converting the file, and the number of paragraphs and sections copied.
+def processFileWorker(path, settings):
+    global config, gui, state, nCopied, collected
+    parser = configparser.ConfigParser(interpolation=None)
+    parser.read_dict({'MarkParagraphs': settings})
+    config = parser['MarkParagraphs']
+    gui = None
+    state = State()
+    nCopied = 0
+    collected = []
+    processFile(path)
+    return (collected, nCopied)
+
+# Converts the specified files in worker processes, and reports the results in order.
+# A file whose worker fails is reported, and the other files are still converted.
+def processFiles(paths):
+    from concurrent.futures import ProcessPoolExecutor
+    global nCopied
+    settings = dict(config)
+    executor = ProcessPoolExecutor(max_workers=min(workers, len(paths)))
+    try:
+        futures = [executor.submit(processFileWorker, path, settings) for path in paths]
+        for (path, future) in zip(paths, futures):
+            fname = os.path.basename(path)
+            try:
+                (messages, n) = future.result()
+            except parseUsfm.ParseError as e:
+                reportError(f"File cannot be parsed: {fname}: {e.message}")
+                continue
+            except Exception as e:
+                reportError(f"File cannot be converted: {fname}: {e}")
+                continue
+            for (report, *args) in messages:
+                globals()[report](*args)
+            nCopied += n
+    finally:
+        executor.shutdown(cancel_futures=True)  # a cancelled job does not wait for the files not yet started
 
 # Copies specified file to same file name with orig appended.
 # Does not overwrite existing backup file.
@@ -366,6 +430,11 @@ def closeIssuesFiles():
 # Writes message to stderr and to issues.txt.
 # If it is not a real issue, writes message to report file.
 def reportError(msg, realIssue=True):
+    if modelMessages is not None:
+        modelMessages.append((msg, realIssue))
+    if collected is not None:
+        collected.append(('reportError', msg, realIssue))
+        return
     if realIssue:
         reportStatus(msg)     # message to gui
         try:
@@ -381,6 +450,9 @@ def reportError(msg, realIssue=True):
 # Sends a progress report to the GUI, and to stdout.
 def reportProgress(msg):
     global gui
+    if collected is not None:
+        collected.append(('reportProgress', msg))
+        return
     if gui:
         with gui.progress_lock:
             gui.progress = msg if not gui.progress else f"{gui.progress}\n{msg}"
@@ -389,12 +461,22 @@ def reportProgress(msg):
 
 def reportStatus(msg):
     global gui
+    if collected is not None:
+        collected.append(('reportStatus', msg))
+        return
     if gui:
         with gui.progress_lock:
             gui.progress = msg if not gui.progress else f"{gui.progress}\n{msg}"
         gui.event_generate('<<ScriptMessage>>', when="tail")
     print(msg)
 
+# Writes the message to stdout only.
+def write(msg):
+    if collected is not None:
+        collected.append(('write', msg))
+        return
+    sys.stdout.write(msg)
+
 
 # Sets the chapter number in the state object
 # If there is still a tentative paragraph mark, remove it.
@@ -468,23 +550,95 @@ def scan(token):
         state.addID(token.value)
 
 # Gathers the location and type of all paragraph marks in the model USFM file.
+# Uses the model index if the model file has been scanned before.
 def scanModelFile(modelpath, fname):
+    global modelMessages
     success = False
     if os.path.isfile(modelpath):
-        input = io.open(modelpath, "tr", 1, encoding="utf-8-sig")
-        str = input.read(-1)
-        input.close()
-        sys.stdout.flush()
-        success = isParseable(str, os.path.basename(modelpath))
-        if success:
-            reportProgress(f"Parsing model file: {fname}")
+        with io.open(modelpath, "tr", 1, encoding="utf-8-sig") as input:
+            contents = input.read(-1)
+        indexPath = modelIndexPath(modelpath)
+        key = modelKey(contents)
+        if (entry := loadModelIndex(indexPath, key)) is not None:
+            return takeModelIndex(entry, fname)
+        modelMessages = []
+        try:
+            success = isParseable(contents, os.path.basename(modelpath))
             sys.stdout.flush()
-            state.addFile(fname)
-            tokens = parseUsfm.parseString(str)
-            for token in tokens:
-                scan(token)
+            if success:
+                reportProgress(f"Parsing model file: {fname}")
+                sys.stdout.flush()
+                state.addFile(fname)
+                for token in tokencache.iterTokens(contents):
+                    scan(token)
+            storeModelIndex(indexPath, key, success, modelMessages)
+        finally:
+            modelMessages = None
     return success
 
+# Model index
+# Each model file has one entry, a JSON file that holds the State after scanning the model file,
+# including the locations of its paragraphs and sections, and the issues reported about the model file.
+# The entry is used if its key matches the text of the model file, the settings that affect the scan,
+# and the version of this script and the parser.
+index_dir = os.environ.get('USFM_PARAGRAPH_INDEX', "")
+
+with open(__file__, 'rb') as input:
+    fingerprint = hashlib.sha1(input.read() + parseUsfm.version.encode('ascii')).digest()
+
+# Returns the path of the index entry for the specified model file, or None if there is no index.
+def modelIndexPath(modelpath):
+    if not index_dir:
+        return None
+    folder = hashlib.sha1(os.path.abspath(os.path.dirname(modelpath)).encode('utf-8', 'surrogatepass')).hexdigest()
+    return os.path.join(index_dir, folder, os.path.basename(modelpath) + ".json")
+
+def modelKey(contents):
+    h = hashlib.sha1(fingerprint)
+    h.update(repr(config.getboolean('copy_nb', fallback=False)).encode('ascii'))
+    h.update(contents.encode('utf-8', 'surrogatepass'))
+    return h.hexdigest()
+
+# Returns the index entry if it exists and matches the key, otherwise None.
+def loadModelIndex(indexPath, key):
+    if not indexPath:
+        return None
+    try:
+        with io.open(indexPath, "tr", encoding='utf-8') as input:
+            entry = json.load(input)
+        return entry if entry['key'] == key else None
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+# Saves the State after scanning a model file. Failure to write is not an error; the model is just scanned next time.
+def storeModelIndex(indexPath, key, success, messages):
+    if not indexPath:
+        return
+    entry = {'key': key, 'success': success, 'messages': messages}
+    if success:
+        entry['state'] = {attr: value for (attr, value) in vars(state).items() if attr != 'usfm'}
+    tmppath = f"{indexPath}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(indexPath), exist_ok=True)
+        with io.open(tmppath, "tw", encoding='utf-8', newline='\n') as output:
+            json.dump(entry, output)
+        os.replace(tmppath, indexPath)
+    except (OSError, TypeError, ValueError):
+        if os.path.exists(tmppath):
+            os.remove(tmppath)
+
+# Reports the messages saved in the index entry, and sets the State as if the model file had been scanned.
+def takeModelIndex(entry, fname):
+    for (msg, realIssue) in entry['messages']:
+        reportError(msg, realIssue)
+    if entry['success']:
+        reportProgress(f"Using model index for: {fname}")
+        state.addFile(fname)
+        for (attr, value) in entry['state'].items():
+            if attr != 'fname':
+                setattr(state, attr, value)
+    return entry['success']
+
 def countParagraphs(path):
     with io.open(path, "tr", 1, encoding="utf-8-sig") as input:
         str = input.read(-1)
@@ -493,20 +647,25 @@ def countParagraphs(path):
     npoetry = str.count("\\q")
     return (nchapters, nparagraphs, npoetry)
 
+# Reports progress before the temporary and backup files are created, so that a cancelled job stops before them,
+# and the job is not terminated until they are renamed or removed.
 def processFile(path):
     global config
     fname = os.path.basename(path)
+    reportProgress(f"Converting {fname}")
+    sys.stdout.flush()
     (nChapters, nParagraphs, nPoetry) = countParagraphs(path)
 
     #if nParagraphs / nChapters < 2.5 and nPoetry / nChapters < 15:
     model_path = os.path.join(config['model_dir'], fname)
     if os.path.isfile(model_path):
-        if scanModelFile(model_path, fname):
-            backupUsfmFile(path)
-            if not convertFile(path, fname):
-                reportError("File cannot be converted: " + fname)
-        else:
-            reportError("Model file is unusable; file cannot be processed " + fname)
+        with jobrunner.writingFiles(gui):
+            if scanModelFile(model_path, fname):
+                backupUsfmFile(path)
+                if not convertFile(path, fname):
+                    reportError("File cannot be converted: " + fname)
+            else:
+                reportError("Model file is unusable; file cannot be processed " + fname)
     else:
         reportError("Model file not found; file cannot be processed: " + fname)
 
@@ -10,6 +10,7 @@ import os
 import codecs
 import string
 import sys
+import bulkedit
 
 # Globals
 source_dir = r'C:\DCS\Danish\work'
@@ -28,6 +29,8 @@ newstring.append('# ')
 # The matches occur in sequence, so the result of one match impacts the next.
 inlinekey = []
 inlinekey.append( re.compile(r'\{ \[([^\]]+)\] \}', flags=re.UNICODE) )
+# What each match is replaced with, as for match.expand()
+inlinereplacement = r"\\f + \\ft \1 \\f*"
 
 # Copies lines from input to output.
 # Modifies targeted input lines before writing them to output.
@@ -50,7 +53,7 @@ def convertByLine(path):
         for i in range(len(inlinekey)):
             sub = inlinekey[i].search(line)
             while sub:
-                line = line[0:sub.start()] + "\\f + \\ft " + sub.group(1) + " \\f*" + line[sub.end():]
+                line = line[0:sub.start()] + sub.expand(inlinereplacement) + line[sub.end():]
                 #line = sub.group(1) + u"" + sub.group(2)
                 sub = inlinekey[i].search(line)
         output.write(line)
@@ -130,6 +133,16 @@ replacement = ""
 #sub_re = re.compile(r'[Ll]ih?at[\s]*\:+[\s]*\n+[\s]*\[\[', re.UNICODE)
 #sub_re = re.compile(r'# +[\*]+(.*)[\*]+', re.UNICODE)
 
+# Set use_bulkedit to edit the files with these rules instead of convertFile(), in parallel.
+# The rules make the same changes as convertByLine(), from inlinekey and inlinereplacement.
+# For the changes of convertFileBySub() instead, use bulkedit.Rule("sub_re", sub_re, replacement).
+# The rules are applied in order. Files that do not contain a key string of any rule, which bulkedit derives
+# from the patterns, are skipped quickly. A dry run (or --dry-run) reports the changes without writing files.
+use_bulkedit = False
+dry_run = False
+workers = os.cpu_count()
+rules = [bulkedit.Rule(f"inlinekey[{i}]", key, inlinereplacement, byLine=True) for (i, key) in enumerate(inlinekey)]
+
 # Stream edit the file by a simple, regular expression substitution
 # To do only one substitution per file, change the count argument to re.sub(), below.
 def convertFileBySub(path):
@@ -175,9 +188,20 @@ def convertFolder(folder):
 
 # Processes all .txt files in specified directory, one at a time
 if __name__ == "__main__":
+    if "--dry-run" in sys.argv:
+        sys.argv.remove("--dry-run")
+        dry_run = True
+    if dry_run and not use_bulkedit:
+        sys.stderr.write("A dry run reports the changes of the bulk edit rules. Set use_bulkedit to use them.\n")
+        sys.exit(-1)
     if len(sys.argv) > 1 and sys.argv[1] != 'hard-coded-path':
         source_dir = sys.argv[1]
 
+    if use_bulkedit and source_dir and os.path.isdir(source_dir):
+        result = bulkedit.editFolder(source_dir, rules, filename_re, workers, dry_run, yes_backup, max_changes)
+        result.report(sys.stdout, dry_run)
+        sys.exit(0)
+
     if source_dir and os.path.isdir(source_dir):
         convertFolder(source_dir)
         sys.stdout.write("Done. Changed " + str(nChanged) + " files.\n")
@@ -187,4 +211,4 @@ if __name__ == "__main__":
         convertFile(path)
         sys.stdout.write("Done. Changed " + str(nChanged) + " files.\n")
     else:
-        sys.stderr.write("Usage: python streamEdit.py <folder>\n  Use . for current folder.\n")
+        sys.stderr.write("Usage: python streamEdit.py <folder> [--dry-run]\n  Use . for current folder.\n")
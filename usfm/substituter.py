@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+# Applies an ordered list of string substitutions, such as substitutions.subs,
+# with the same result as calling str.replace() for each pair in order.
+# The list is compiled once into steps, and the compiled form can be applied to any number of texts.
+# Consecutive pairs that cannot affect each other's matches are fused into one step, which replaces
+# all of their sources in a single pass over the text. A pair whose source could be created by the
+# replacement of an earlier pair, or could overlap the source of an earlier pair, starts a new step,
+# so cascading substitutions still happen in the original order.
+# Pairs whose source does not occur in the text are skipped.
+# str.replace() does not copy the text when the source does not occur, and it is much faster than a regular
+# expression, so a fused step only makes its substitutions in a single pass when at least fusedMinimum of its
+# sources occur in the text. Otherwise the sources that occur are replaced one at a time, which gives the same result.
+# The same module is used in the usfm, md and tsv folders.
+
+import re
+
+fusedMinimum = 24   # about where a single pass became faster than str.replace() for each source, in CPython 3.12
+
+class Substituter:
+    def __init__(self, subs):
+        self.steps = []     # (sources, {source: replacement}, regular expression or None)
+        group = []
+        for (source, replacement) in subs:
+            if group and not canFuse(group, source):
+                self.steps.append(compileStep(group))
+                group = []
+            group.append((source, replacement))
+        if group:
+            self.steps.append(compileStep(group))
+
+    # Returns the text with all the substitutions made.
+    def apply(self, text):
+        for (sources, table, regex) in self.steps:
+            if regex is None:
+                text = text.replace(sources[0], table[sources[0]])
+                continue
+            present = [source for source in sources if source in text]
+            if len(present) >= fusedMinimum:
+                text = regex.sub(lambda match: table[match.group(0)], text)
+            else:
+                for source in present:
+                    text = text.replace(source, table[source])
+        return text
+
+# Returns a step that makes the substitutions in the group.
+def compileStep(group):
+    sources = tuple(source for (source, replacement) in group)
+    regex = re.compile("|".join(re.escape(source) for source in sources)) if len(group) > 1 else None
+    return (sources, dict(group), regex)
+
+# Returns True if a pair with the specified source can be fused with the group of earlier pairs.
+def canFuse(group, source):
+    if not source:
+        return False
+    for (earlierSource, earlierReplacement) in group:
+        if canOverlap(earlierSource, source) or canCreate(earlierReplacement, source):
+            return False
+    return True
+
+# Returns True if occurrences of a and b in the same text can overlap.
+def canOverlap(a, b):
+    if not a or a in b or b in a:
+        return True
+    for n in range(1, min(len(a), len(b))):
+        if a.endswith(b[:n]) or b.endswith(a[:n]):
+            return True
+    return False
+
+# Returns True if replacing something with the replacement can create a new occurrence of the source.
+# A new occurrence includes part of the replacement, or joins the text on both sides of a deletion.
+def canCreate(replacement, source):
+    if not replacement:
+        return len(source) > 1
+    return any(c in replacement for c in source)
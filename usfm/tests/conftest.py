@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+# The scripts in the usfm folder import each other as top-level modules, so the folder goes on the path.
+# Sample books are in tests/data.
+
+import os
+import sys
+
+import pytest
+
+testsDir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(testsDir))
+
+dataDir = os.path.join(testsDir, "data")
+
+# Returns the text of a sample book in tests/data.
+def readSample(fname):
+    with open(os.path.join(dataDir, fname), encoding="utf-8") as input:
+        return input.read()
+
+@pytest.fixture(params=sorted(f for f in os.listdir(dataDir) if f.endswith(".usfm")))
+def sampleName(request):
+    return request.param
+
+@pytest.fixture
+def sample(sampleName):
+    return readSample(sampleName)
+
+# Parses with the specified backend, and restores the module settings afterwards.
+@pytest.fixture
+def parseWith(monkeypatch):
+    import parseUsfm
+    def parse(text, backend):
+        monkeypatch.setattr(parseUsfm, 'backend', backend)
+        return tokenKeys(parseUsfm.parseString(text))
+    return parse
+
+# Returns comparable (class, type, value) tuples for the tokens.
+def tokenKeys(tokens):
+    return [(type(t), t.type, t.value) for t in tokens]
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+# The bulk edit rules of the streamEdit scripts must make the same changes as convertByLine(),
+# and write the files the same way.
+
+import importlib.util
+import os
+
+import pytest
+
+import bulkedit
+import streamEdit
+from conftest import testsDir
+
+repoDir = os.path.dirname(os.path.dirname(testsDir))
+
+# The md folder has its own streamEdit.py, which uses the same bulkedit module.
+def mdStreamEdit():
+    spec = importlib.util.spec_from_file_location("md_streamEdit", os.path.join(repoDir, "md", "streamEdit.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+usfmTexts = ["\\v 1 { [a note] } text { [another] }\r\n\\v 2 { [x] }{ [y] }\n",
+             "\ufeff\\id TIT\n\\v 1 { [nested { [inner] }] }\n",
+             "\\v 1 no notes\n",
+             "\\v 1 { [unfinished\n] }\n"]
+mdTexts = ["## Heading\n### Deeper\n# Title\n## ## twice\n",
+           "\ufefftext ## not at start\r\n##no space\r\n",
+           "# Title only\n"]
+
+def writeFiles(folder, texts, ext):
+    os.makedirs(folder)
+    for (i, text) in enumerate(texts):
+        with open(os.path.join(folder, f"{i}.{ext}"), 'w', encoding='utf-8', newline='') as output:
+            output.write(text)
+
+def readFiles(folder, ext):
+    return {fname: open(os.path.join(folder, fname), 'rb').read() for fname in sorted(os.listdir(folder)) if fname.endswith(ext)}
+
+@pytest.mark.parametrize("folder", ["usfm", "md"])
+def test_rules_make_the_changes_of_convertByLine(folder, tmp_path):
+    (module, texts, ext) = (streamEdit, usfmTexts, "usfm") if folder == "usfm" else (mdStreamEdit(), mdTexts, "md")
+    for name in ("byline", "bulk"):
+        writeFiles(str(tmp_path / name), texts, ext)
+    for fname in readFiles(str(tmp_path / "byline"), ext):
+        module.convertByLine(str(tmp_path / "byline" / fname))
+    result = bulkedit.editFolder(str(tmp_path / "bulk"), module.rules, module.filename_re, workers=1)
+    changed = sorted(os.path.basename(path) for path in result.changed)
+    assert changed == sorted(fname[:-len(".orig")] for fname in readFiles(str(tmp_path / "bulk"), ".orig"))
+    assert changed
+    byline = readFiles(str(tmp_path / "byline"), ext)
+    for (fname, contents) in readFiles(str(tmp_path / "bulk"), ext).items():
+        if fname in changed:
+            assert contents == byline[fname]
+        else:
+            assert contents.decode('utf-8-sig').splitlines() == byline[fname].decode('utf-8').splitlines()
+
+def test_dry_run_writes_nothing(tmp_path):
+    writeFiles(str(tmp_path / "bulk"), usfmTexts, "usfm")
+    before = readFiles(str(tmp_path / "bulk"), "")
+    result = bulkedit.editFolder(str(tmp_path / "bulk"), streamEdit.rules, streamEdit.filename_re, workers=1, dry_run=True)
+    assert readFiles(str(tmp_path / "bulk"), "") == before
+    assert len(result.changed) == 2
+    assert result.hits == {"inlinekey[0]": 6}
+
+@pytest.mark.parametrize(("pattern", "keys"), [
+    (r'\{ \[([^\]]+)\] \}', ["{ ["]),
+    (r'(##+ )', ["#"]),
+    (r'\\em \\em\*', ["\\em \\em*"]),
+    (r'rc://(en|fr)/x', ["rc://"]),
+    (r'a|bcd', None),
+    (r'(?i)abc', None),
+    (r'\w+', None),
+    (r'(?i:abc)d', ["d"]),
+    (r'(?i:ab)', None),
+])
+def test_keys_are_derived_from_the_pattern(pattern, keys):
+    assert bulkedit.Rule("rule", pattern, "").keys == keys
+    if keys:
+        assert bulkedit.Rule("rule", pattern, "", keys=["given"]).keys == ["given"]
+
+def test_case_insensitive_groups_are_not_keys():
+    rule = bulkedit.Rule("rule", r'x(?i:abc)d', "Z")
+    assert bulkedit.applyRules("xABCd", [rule]) == ("Z", {"rule": 1})
+
+def test_keys_with_line_breaks_match_any_line_endings(tmp_path):
+    writeFiles(str(tmp_path / "bulk"), ["a\r\nb\r\n", "a\rb\r", "a\nb\n", "a b\r\n"], "usfm")
+    result = bulkedit.editFolder(str(tmp_path / "bulk"), [bulkedit.Rule("x", r'a\nb', "Z")], streamEdit.filename_re, workers=1)
+    assert sorted(os.path.basename(path) for path in result.changed) == ["0.usfm", "1.usfm", "2.usfm"]
+    assert result.hits == {"x": 3}
+    assert readFiles(str(tmp_path / "bulk"), "usfm") == {"0.usfm": b"Z\n", "1.usfm": b"Z\n", "2.usfm": b"Z\n", "3.usfm": b"a b\r\n"}
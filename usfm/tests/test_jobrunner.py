@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+# A cancelled job stops only at a progress message, and is never terminated while it is replacing files.
+# The job in test_terminate_waits_for_the_files_to_be_replaced runs main() below in a worker process.
+
+import os
+import queue
+import threading
+import time
+
+import pytest
+
+import configmanager
+import jobrunner
+
+# The script of the test job. Replaces a file slowly, then hangs without sending any progress message.
+def main(gui):
+    folder = configmanager.overrides['Test']['folder']
+    with jobrunner.writingFiles(gui):
+        open(os.path.join(folder, "started"), 'w').close()
+        with open(os.path.join(folder, "book.usfm"), 'w') as output:
+            while not os.path.exists(os.path.join(folder, "release")):
+                time.sleep(0.01)
+            output.write("complete")
+    while True:
+        time.sleep(0.01)
+
+class Root:
+    def after(self, ms, fn):
+        pass
+
+def waitFor(path, timeout=30):
+    deadline = time.monotonic() + timeout
+    while not os.path.exists(path):
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+def test_only_progress_messages_stop_a_cancelled_job():
+    cancel = threading.Event()
+    gui = jobrunner.JobGui(1, queue.Queue(), cancel, threading.RLock())
+    gui.event_generate('<<ScriptProgress>>')
+    cancel.set()
+    gui.event_generate('<<ScriptMessage>>')
+    gui.event_generate('<<ScriptEnd>>')
+    with pytest.raises(jobrunner.Cancelled):
+        gui.event_generate('<<ScriptProgress>>')
+    assert [event for (jobid, event, text) in list(gui.messages.queue)] == \
+        ['<<ScriptProgress>>', '<<ScriptMessage>>', '<<ScriptEnd>>', '<<ScriptProgress>>']
+
+def test_writingFiles_does_nothing_outside_a_job():
+    with jobrunner.writingFiles(None):
+        pass
+
+def test_terminate_waits_for_the_files_to_be_replaced(tmp_path):
+    runner = jobrunner.JobRunner(Root(), None)
+    job = runner.start("test_jobrunner", 1, {'Test': {'folder': str(tmp_path)}})
+    try:
+        waitFor(str(tmp_path / "started"))
+        runner.cancel(job)
+        assert not runner.terminate(job)
+        assert job.process.is_alive()
+        (tmp_path / "release").touch()
+        assert runner.terminate(job, wait=True)
+        assert not job.process.is_alive()
+        assert (tmp_path / "book.usfm").read_text() == "complete"
+    finally:
+        if job.process.is_alive():
+            job.process.kill()
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+# A file whose worker fails is reported by name, and does not stop the other files from being converted.
+# With USFM_PARAGRAPH_INDEX set, a model file that is unchanged since it was scanned converts a book the same way
+# from its index entry.
+
+import os
+import shutil
+
+import pytest
+
+import configmanager
+import mark_paragraphs
+import parseUsfm
+import usfm_verses
+
+# Stands in for processFileWorker() in the worker processes.
+def failingWorker(path, settings):
+    if path.endswith("bad.usfm"):
+        raise ValueError("bad data")
+    if path.endswith("unparsable.usfm"):
+        raise parseUsfm.ParseError("Expected USFM marker or text")
+    return ([('reportError', "Converted " + path, True)], 2)
+
+def test_a_failed_file_is_reported_and_the_others_converted(monkeypatch):
+    errors = []
+    monkeypatch.setattr(mark_paragraphs, 'processFileWorker', failingWorker)
+    monkeypatch.setattr(mark_paragraphs, 'reportError', lambda msg, realIssue=True: errors.append(msg))
+    monkeypatch.setattr(mark_paragraphs, 'config', {'source_dir': "", 'model_dir': ""})
+    monkeypatch.setattr(mark_paragraphs, 'workers', 2)
+    monkeypatch.setattr(mark_paragraphs, 'nCopied', 0)
+    mark_paragraphs.processFiles(["a.usfm", "bad.usfm", "unparsable.usfm", "b.usfm"])
+    assert errors == ["Converted a.usfm",
+                      "File cannot be converted: bad.usfm: bad data",
+                      "File cannot be parsed: unparsable.usfm: Expected USFM marker or text",
+                      "Converted b.usfm"]
+    assert mark_paragraphs.nCopied == 4
+
+# A model book of Titus with paragraphs, poetry, \m and a section heading, and a jammed verse number that is
+# reported as an issue. The book to convert has the same verses without any of them.
+def titus(marked):
+    lines = ["\\id TIT", "\\h Titus"]
+    for (chapter, n) in enumerate(usfm_verses.verseCounts["TIT"]['verses'], start=1):
+        lines.append(f"\\c {chapter}")
+        for verse in range(1, n + 1):
+            if marked and verse % 5 == 1:
+                lines.append("\\p")
+            if marked and verse % 5 == 3:
+                lines.append("\\q1")
+            if marked and verse % 5 == 4:
+                lines.append("\\m")
+            if marked and verse == 7:
+                lines.append("\\s A heading")
+            jammed = "," if marked and (chapter, verse) == (2, 2) else " "
+            lines.append(f"\\v {verse}{jammed}Verse {verse} of chapter {chapter}.")
+    return "\n".join(lines) + "\n"
+
+# Converts the book against the model, and returns the converted book, the issues, and the progress messages.
+def markParagraphs(tmp_path, copy_nb=False):
+    source = tmp_path / "source"
+    if source.exists():
+        shutil.rmtree(source)
+    source.mkdir()
+    (source / "57-TIT.usfm").write_text(titus(False), encoding="utf-8")
+    progress = []
+    (tmp_path / "home" / "AppData" / "Local").mkdir(parents=True, exist_ok=True)
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setenv('HOME', str(tmp_path / "home"))
+        monkeypatch.setattr(configmanager, 'overrides', {'MarkParagraphs': {
+            'model_dir': str(tmp_path / "model"), 'source_dir': str(source), 'filename': "",
+            'copy_nb': str(copy_nb), 'removeS5markers': "True", 'sentence_sensitive': "True"}})
+        monkeypatch.setattr(mark_paragraphs, 'reportProgress', progress.append)
+        mark_paragraphs.main()
+    issues = (source / "issues.txt").read_text(encoding="utf-8") if (source / "issues.txt").exists() else ""
+    return ((source / "57-TIT.usfm").read_text(encoding="utf-8"), issues, progress)
+
+@pytest.fixture
+def model(tmp_path, monkeypatch):
+    (tmp_path / "model").mkdir()
+    (tmp_path / "model" / "57-TIT.usfm").write_text(titus(True), encoding="utf-8")
+    monkeypatch.setattr(mark_paragraphs, 'index_dir', str(tmp_path / "index"))
+    monkeypatch.setattr(mark_paragraphs, 'workers', 1)
+    return tmp_path / "model" / "57-TIT.usfm"
+
+def test_the_index_gives_the_same_conversion(tmp_path, model):
+    (cold, coldIssues, coldProgress) = markParagraphs(tmp_path)
+    assert "Parsing model file: 57-TIT.usfm" in coldProgress
+    assert cold != titus(False)
+    assert "verse number(s) not followed by space" in coldIssues
+    assert os.listdir(tmp_path / "index")
+    (warm, warmIssues, warmProgress) = markParagraphs(tmp_path)
+    assert "Using model index for: 57-TIT.usfm" in warmProgress
+    assert "Parsing model file: 57-TIT.usfm" not in warmProgress
+    assert (warm, warmIssues) == (cold, coldIssues)
+
+def test_the_index_is_not_used_after_changes(tmp_path, model, monkeypatch):
+    markParagraphs(tmp_path)
+    model.write_text(titus(True).replace("\\q1", "\\p"), encoding="utf-8")
+    (converted, issues, progress) = markParagraphs(tmp_path)
+    assert "Parsing model file: 57-TIT.usfm" in progress
+    assert "\\q1" not in converted
+    assert "Using model index for: 57-TIT.usfm" in markParagraphs(tmp_path)[2]
+    (expected, expectedIssues, progress) = markParagraphs(tmp_path, copy_nb=True)
+    assert "Parsing model file: 57-TIT.usfm" in progress
+    assert "\\m" in expected
+    monkeypatch.setattr(mark_paragraphs, 'index_dir', "")
+    assert markParagraphs(tmp_path, copy_nb=True)[:2] == (expected, expectedIssues)
+
+def test_there_is_no_index_by_default(tmp_path, model, monkeypatch):
+    monkeypatch.setattr(mark_paragraphs, 'index_dir', "")
+    assert mark_paragraphs.modelIndexPath(str(model)) is None
+    markParagraphs(tmp_path)
+    assert "Parsing model file: 57-TIT.usfm" in markParagraphs(tmp_path)[2]
+    assert not (tmp_path / "index").exists()
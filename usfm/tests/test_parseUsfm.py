@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+# The scanner backend must produce exactly the tokens of the pyparsing grammar,
+# and iterTokens() exactly the tokens of parseString(), wherever the text is split into chunks.
+
+import io
+import pickle
+
+import pytest
+
+import parseUsfm
+from conftest import tokenKeys
+
+# Edge cases for the scanner: white space around markers, escapes, unknown markers and end markers.
+edgeCases = [
+    "\\id GEN\n\\c 1\n\\v 1 text",
+    "  \n\\id GEN x\n\\c 1 \\v 1\ttabbed\ttext\n",
+    "\\id GEN\n\\c 1\n\\p\n\\v 1 a\xa0b \\nd Lord\\nd* c\n\\v 2",
+    "\\id GEN\n\\c 1\n\\v 1 stray \\ backslash \\\\ and at end \\",
+    "\\id GEN\n\\c1\n\\v1 missing spaces \\v 2-3 range\n",
+    "\\id GEN\n\\f + \\fr 1:1 \\ft note\\f*\\f+ \\ft joined\\f*\\x - \\xo 1 \\xt ref\\x*",
+    "\\id GEN\n\\zaln-s |x=\"1\"\\*\\w word|x-occurrence=\"1\"\\w*\\zaln-e\\* \\unknown\\* \\k key\\k*",
+    "\\id GEN\n\\s\n\\s1 \n\\cl\n\\toc3 \n\\rem\\v 1 \\qs\\qs*\\*",
+    "\\id GEN\r\n\\c 1\r\n\\v 1 carriage returns\r\n",
+    "\\id GEN\n\\c 1\n\\v 1  \\p em space before a marker",
+]
+
+def test_scanner_matches_pyparsing_on_samples(sample, parseWith):
+    assert parseWith(sample, 'scanner') == parseWith(sample, 'pyparsing')
+
+@pytest.mark.parametrize("text", edgeCases)
+def test_scanner_matches_pyparsing_on_edge_cases(text, parseWith):
+    assert parseWith(text, 'scanner') == parseWith(text, 'pyparsing')
+
+@pytest.mark.parametrize("backend", ['pyparsing', 'scanner'])
+def test_unparseable_text_exits(backend, monkeypatch):
+    monkeypatch.setattr(parseUsfm, 'backend', backend)
+    with pytest.raises(SystemExit) as exited:
+        parseUsfm.parseString(" \n ")
+    assert isinstance(exited.value, parseUsfm.ParseError)
+    assert exited.value.code is None
+    assert exited.value.text == " \n "
+    copy = pickle.loads(pickle.dumps(exited.value))
+    assert (type(copy), copy.message, copy.text, copy.code) == (parseUsfm.ParseError, exited.value.message, " \n ", None)
+
+@pytest.mark.parametrize("backend", ['pyparsing', 'scanner'])
+@pytest.mark.parametrize("chunksize", [1, 7, 64, 500, 16384])
+def test_iterTokens_matches_parseString(sample, backend, chunksize, monkeypatch):
+    monkeypatch.setattr(parseUsfm, 'backend', backend)
+    expected = tokenKeys(parseUsfm.parseString(sample))
+    assert tokenKeys(parseUsfm.iterTokens(io.StringIO(sample), chunksize)) == expected
+
+# Every line that starts with a backslash is a possible chunk boundary,
+# including lines that start a chunk with an end marker, an escape or an unknown marker.
+@pytest.mark.parametrize("text", edgeCases)
+def test_iterTokens_splits_at_every_line(text, monkeypatch):
+    monkeypatch.setattr(parseUsfm, 'backend', 'scanner')
+    expected = tokenKeys(parseUsfm.parseString(text))
+    assert tokenKeys(parseUsfm.iterTokens(io.StringIO(text), chunksize=1)) == expected
+
+def test_iterTokens_reads_a_path(tmp_path, sample):
+    path = tmp_path / "book.usfm"
+    path.write_text("\ufeff" + sample, encoding="utf-8")
+    assert tokenKeys(parseUsfm.iterTokens(path)) == tokenKeys(parseUsfm.parseString(sample))
+
+@pytest.mark.parametrize("backend", ['pyparsing', 'scanner'])
+def test_parseParallel_matches_serial(sample, backend, monkeypatch):
+    monkeypatch.setattr(parseUsfm, 'backend', backend)
+    assert len(parseUsfm.splitChapters(sample, 8)) > 1
+    assert tokenKeys(parseUsfm.parseParallel(sample, 2)) == tokenKeys(parseUsfm.parseSerial(sample))
+    assert parseUsfm.getExecutor(2) is parseUsfm.getExecutor(2)
+
+def test_parseParallel_does_not_nest_in_a_worker(sample, monkeypatch):
+    def noExecutor(max_workers):
+        raise AssertionError("started a pool in a worker process")
+    monkeypatch.setattr(parseUsfm.multiprocessing, 'parent_process', lambda: object())
+    monkeypatch.setattr(parseUsfm, 'getExecutor', noExecutor)
+    assert tokenKeys(parseUsfm.parseParallel(sample, 2)) == tokenKeys(parseUsfm.parseSerial(sample))
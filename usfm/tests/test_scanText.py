@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+# verifyUSFM.scanText() must find exactly what the separate regular expression passes that it replaced found.
+
+import random
+import re
+
+import pytest
+
+import verifyUSFM as v
+from test_parseUsfm import edgeCases
+
+# The pieces of the random texts, chosen to make the patterns match, overlap and just miss.
+pieces = ["\\c", "\\c ", "\\v", "\\v ", "\\wj", " \\wj ", "\\wj*", "\\", "\\ ", " ", "  ", "\n", "\n\n", "\r\n",
+          "'", "a", "b'c", "1", "12", "-", "3-4", ":", "x", "\x00", "<< HEAD", "<<<< HEAD", "\\p"]
+
+def randomTexts(n, seed=11):
+    rand = random.Random(seed)
+    return ["".join(rand.choice(pieces) for i in range(rand.randint(1, 40))) for j in range(n)]
+
+# The (line number, line) of each non-empty line after an empty line that does not start with a backslash.
+def orphanLines(text):
+    orphans = []
+    prevline = "xx"
+    for (lineno, line) in enumerate(text.split('\n'), 1):
+        if not prevline and line and line[0] != '\\':
+            orphans.append((lineno, line))
+        prevline = line
+    return orphans
+
+def spans(matches):
+    return [m.span() for m in matches]
+
+def assertSameAsRegex(text):
+    found = v.scanText(text)
+    assert found.wjwj == bool(v.wjwj_re.search(text))
+    assert found.backslasheol == bool(v.backslasheol_re.search(text))
+    assert found.null == ('\x00' in text)
+    for (matches, pattern) in zip(found.badChapters, (v.bad_chapter_re1, v.bad_chapter_re2, v.bad_chapter_re3)):
+        assert spans(matches) == spans(pattern.finditer(text))
+    for (matches, pattern) in zip(found.badVerses, (v.bad_verse_re1, v.bad_verse_re2, v.bad_verse_re3)):
+        assert spans(matches) == spans(pattern.finditer(text))
+    assert found.orphantext == bool(v.orphantext_re.search(text))
+    if found.orphantext:
+        assert found.orphans == orphanLines(text)
+    assert found.nembedded == len(v.embeddedquotes_re.findall(text))
+    assert found.nsingle == text.count("'")
+    partial = v.scanText(text, whole=False)
+    assert (partial.wjwj, partial.backslasheol, partial.null) == (found.wjwj, found.backslasheol, found.null)
+
+def test_scanText_matches_regex_on_samples(sample):
+    assertSameAsRegex(sample)
+
+@pytest.mark.parametrize("text", edgeCases)
+def test_scanText_matches_regex_on_edge_cases(text):
+    assertSameAsRegex(text)
+
+@pytest.mark.parametrize("text", randomTexts(500))
+def test_scanText_matches_regex_on_random_text(text):
+    assertSameAsRegex(text)
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+# A Substituter must give the same text as calling str.replace() for each pair in order,
+# whether it makes a step's substitutions in one pass or one at a time.
+
+import filecmp
+import importlib.util
+import os
+import random
+
+import pytest
+
+import substituter
+from conftest import testsDir
+from substituter import Substituter
+
+repoDir = os.path.dirname(os.path.dirname(testsDir))
+
+def replaceInOrder(subs, text):
+    for (source, replacement) in subs:
+        text = text.replace(source, replacement)
+    return text
+
+# Returns the substitutions.subs of the specified folder.
+def folderSubs(folder):
+    spec = importlib.util.spec_from_file_location(folder + "_substitutions", os.path.join(repoDir, folder, "substitutions.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.subs
+
+@pytest.fixture(params=[1, substituter.fusedMinimum, 10000], ids=["fused", "default", "one-at-a-time"])
+def fusedMinimum(request, monkeypatch):
+    monkeypatch.setattr(substituter, 'fusedMinimum', request.param)
+
+@pytest.mark.parametrize("folder", ["usfm", "md", "tsv"])
+def test_folder_subs_on_samples(folder, sample, fusedMinimum):
+    subs = folderSubs(folder)
+    assert Substituter(subs).apply(sample) == replaceInOrder(subs, sample)
+    text = "".join(source for (source, replacement) in subs) + sample[:2000]
+    assert Substituter(subs).apply(text) == replaceInOrder(subs, text)
+
+def randomCase(rand):
+    alphabet = "ab c"
+    word = lambda n: "".join(rand.choice(alphabet) for i in range(rand.randint(0, n)))
+    subs = [(word(3) or "a", word(3)) for i in range(rand.randint(1, 8))]
+    return (subs, word(40))
+
+@pytest.mark.parametrize("seed", range(300))
+def test_random_subs(seed, fusedMinimum):
+    (subs, text) = randomCase(random.Random(seed))
+    assert Substituter(subs).apply(text) == replaceInOrder(subs, text)
+
+def test_the_copies_are_the_same():
+    for folder in ("md", "tsv"):
+        assert filecmp.cmp(os.path.join(repoDir, "usfm", "substituter.py"), os.path.join(repoDir, folder, "substituter.py"), shallow=False)
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+# The token cache must give the tokens of the parser whether it reads them from an entry or parses them,
+# read and write entries a block at a time, and keep an entry only when all of its tokens were taken.
+
+import os
+
+import pytest
+
+import parseUsfm
+import tokencache
+from conftest import tokenKeys
+
+@pytest.fixture
+def cacheDir(tmp_path, monkeypatch):
+    monkeypatch.setattr(tokencache, 'cache_dir', str(tmp_path))
+    monkeypatch.setattr(tokencache, 'blockTokens', 10)
+    return tmp_path
+
+def entries(cacheDir):
+    return sorted(os.listdir(cacheDir))
+
+def test_cache_is_off_without_a_folder(sample, monkeypatch):
+    monkeypatch.setattr(tokencache, 'cache_dir', "")
+    assert tokenKeys(tokencache.iterTokens(sample)) == tokenKeys(parseUsfm.parseString(sample))
+    assert tokenKeys(tokencache.parseString(sample)) == tokenKeys(parseUsfm.parseString(sample))
+
+def test_cold_and_warm_tokens_match_the_parser(sample, cacheDir):
+    expected = tokenKeys(parseUsfm.parseString(sample))
+    assert tokenKeys(tokencache.iterTokens(sample)) == expected
+    assert entries(cacheDir) == [tokencache.cacheKey(sample) + ".tok"]
+    assert tokenKeys(tokencache.iterTokens(sample)) == expected
+    assert tokenKeys(tokencache.parseString(sample)) == expected
+
+def test_entry_is_written_in_blocks(sample, cacheDir):
+    list(tokencache.iterTokens(sample))
+    with open(tokencache.entryPath(tokencache.cacheKey(sample)), 'rb') as input:
+        input.read(len(tokencache.magic))
+        (ntokens, ntypebytes, nvaluebytes) = tokencache.header.unpack(input.read(tokencache.header.size))
+    assert ntokens == tokencache.blockTokens
+
+def test_partly_taken_tokens_leave_no_entry(sample, cacheDir):
+    tokens = tokencache.iterTokens(sample)
+    next(tokens)
+    tokens.close()
+    assert entries(cacheDir) == []
+
+@pytest.mark.parametrize("damage", ["truncate", "garble"])
+def test_damaged_entry_is_replaced(sample, cacheDir, damage):
+    expected = tokenKeys(parseUsfm.parseString(sample))
+    list(tokencache.iterTokens(sample))
+    path = tokencache.entryPath(tokencache.cacheKey(sample))
+    with open(path, 'rb') as input:
+        data = input.read()
+    if damage == "truncate":
+        data = data[:len(data) * 2 // 3]
+    else:
+        data = data[:-20] + b'\xff' * 20
+    with open(path, 'wb') as output:
+        output.write(data)
+    assert tokenKeys(tokencache.iterTokens(sample)) == expected
+    assert tokenKeys(tokencache.iterTokens(sample)) == expected
+    assert entries(cacheDir) == [os.path.basename(path)]
+
+def test_eviction_keeps_the_cache_small(cacheDir, monkeypatch):
+    monkeypatch.setattr(tokencache, 'maxBytes', 1)
+    monkeypatch.setattr(tokencache, 'sinceEvict', None)
+    list(tokencache.iterTokens("\\id GEN\n\\c 1\n\\v 1 one"))
+    assert entries(cacheDir) == []
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+# A Verifier keeps all of its state, so that verifiers in different threads do not see each other's issues,
+# and text that cannot be parsed is reported as an issue rather than ending the program.
+# A folder gives the same issues.txt and wordlist.txt whether its files are verified one at a time, in worker
+# processes, from the result cache, or while profiling.
+
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import configmanager
+import verifyUSFM
+from conftest import readSample
+
+def issueKeys(issues):
+    return [(issue.id, issue.reference, issue.message) for issue in issues]
+
+def verifyText(text, fname, language_code="en"):
+    verifier = verifyUSFM.Verifier(language_code)
+    return (issueKeys(verifier.verify_text(text, fname)), verifier.words)
+
+def test_verify_text_returns_the_issues(sample, sampleName):
+    verifier = verifyUSFM.Verifier("en")
+    issues = verifier.verify_text(sample, sampleName)
+    assert all(isinstance(issue, verifyUSFM.Issue) for issue in issues)
+    assert verifier.words
+    assert verifier.issues is None
+    assert verifier.summary == {}
+
+def test_verify_text_gives_the_same_issues_again(sample, sampleName):
+    verifier = verifyUSFM.Verifier("en")
+    first = issueKeys(verifier.verify_text(sample, sampleName))
+    assert issueKeys(verifier.verify_text(sample, sampleName)) == first
+
+def test_unparsable_text_is_an_issue():
+    issues = verifyUSFM.Verifier("en").verify_text(" \n" * 60, "57-TIT.usfm")
+    assert issueKeys(issues) == [(82, "", "Unable to parse 57-TIT.usfm: Expected USFM marker or text")]
+
+def test_threads_with_a_verifier_each_match_serial_runs(sampleName):
+    text = readSample(sampleName)
+    jobs = [(text, sampleName, language_code) for language_code in ("en", "hi", "fr")] * 4
+    expected = [verifyText(*job) for job in jobs]
+    with ThreadPoolExecutor(max_workers=6) as executor:
+        assert list(executor.map(lambda job: verifyText(*job), jobs)) == expected
+
+def test_module_functions_use_the_default_verifier(tmp_path, monkeypatch):
+    text = readSample("57-TIT.usfm")
+    (tmp_path / "57-TIT.usfm").write_text(text, encoding="utf-8")
+    verifier = verifyUSFM.Verifier("en", config={'source_dir': str(tmp_path), 'language_code': "en"})
+    monkeypatch.setattr(verifyUSFM, 'defaultVerifier', verifier)
+    messages = []
+    monkeypatch.setattr(verifier, 'reportError', lambda msg, errorId=0, summarize_only=False: messages.append(msg))
+    verifyUSFM.verifyFile(str(tmp_path / "57-TIT.usfm"))
+    verifyUSFM.reportError("From the module", 1)
+    expected = verifyUSFM.Verifier("en", config=dict(verifier.config))
+    expectedIssues = expected.verify_text(text, str(tmp_path / "57-TIT.usfm"))
+    assert messages == [issue.message for issue in expectedIssues] + ["From the module"]
+    assert verifier.bookIDs == ["TIT"]
+    assert verifier.words == expected.words
+
+# A folder with the sample books, another book of Titus, which is a duplicate ID,
+# and optionally a file that cannot be parsed, which ends the run.
+def makeFolder(tmp_path, unparsable=False):
+    folder = tmp_path / "source"
+    folder.mkdir()
+    for fname in ("41-MAT-aligned.usfm", "57-TIT.usfm"):
+        (folder / fname).write_text(readSample(fname), encoding="utf-8")
+    (folder / "58-TIT.usfm").write_text("\\id TIT short copy\n\\h Titus\n\\mt Titus\n\\c 1\n\\p\n"
+        "\\v 1 Paul, a servant of God, wrote this short letter to Titus in Crete.\n\\v 3 He skipped a verse here.\n",
+        encoding="utf-8")
+    if unparsable:
+        (folder / "99-BAD.usfm").write_text(" \n" * 60, encoding="utf-8")
+    return folder
+
+# Runs main() on the folder, with its files in name order.
+# Returns the text of issues.txt, and of wordlist.txt or None if the run ended before writing it.
+@pytest.fixture
+def verifyFolder(tmp_path, monkeypatch):
+    (tmp_path / "home" / "AppData" / "Local").mkdir(parents=True)
+    monkeypatch.setenv('HOME', str(tmp_path / "home"))
+    monkeypatch.delenv('USFM_VERIFY_PROFILE', raising=False)
+    monkeypatch.delenv('USFM_WORD_INDEX', raising=False)
+    monkeypatch.setattr(verifyUSFM, 'listFiles', lambda dir, listFiles=verifyUSFM.listFiles: sorted(listFiles(dir)))
+    monkeypatch.setattr(verifyUSFM, 'defaultVerifier', verifyUSFM.defaultVerifier)
+    def verify(folder, workers=1, cache=None, **settings):
+        for fname in ("issues.txt", "wordlist.txt"):
+            if (folder / fname).exists():
+                (folder / fname).unlink()
+        monkeypatch.setattr(verifyUSFM, 'workers', workers)
+        monkeypatch.setattr(verifyUSFM, 'cache_dir', str(cache) if cache else "")
+        config = {'source_dir': str(folder), 'filename': "", 'language_code': "en"}
+        config.update(settings)
+        monkeypatch.setattr(configmanager, 'overrides', {'VerifyUSFM': config})
+        try:
+            verifyUSFM.main()
+        except SystemExit:      # closes issues.txt as the end of the process would
+            if verifyUSFM.defaultVerifier.issuesFile:
+                verifyUSFM.defaultVerifier.issuesFile.close()
+                verifyUSFM.defaultVerifier.issuesFile = None
+        wordlist = (folder / "wordlist.txt").read_text(encoding="utf-8") if (folder / "wordlist.txt").exists() else None
+        return ((folder / "issues.txt").read_text(encoding="utf-8"), wordlist)
+    return verify
+
+# Records the names of the files verified, rather than taken from the cache.
+@pytest.fixture
+def verified(monkeypatch):
+    names = []
+    verifyOneFile = verifyUSFM.Verifier.verifyOneFile
+    def recordingVerifyOneFile(self, contents, path):
+        names.append(os.path.basename(path))
+        return verifyOneFile(self, contents, path)
+    monkeypatch.setattr(verifyUSFM.Verifier, 'verifyOneFile', recordingVerifyOneFile)
+    return names
+
+@pytest.mark.parametrize("unparsable", [False, True], ids=["parsable", "unparsable"])
+def test_parallel_run_matches_serial(tmp_path, verifyFolder, unparsable):
+    folder = makeFolder(tmp_path, unparsable)
+    (issues, wordlist) = verifyFolder(folder)
+    assert verifyFolder(folder, workers=3) == (issues, wordlist)
+    lines = issues.splitlines()
+    # A duplicate book ID is reported after the messages of the later file
+    duplicate = lines.index("Duplicate ID: TIT")
+    assert lines[duplicate - 1] == "Low paragraph count (1) for TIT"
+    if unparsable:
+        assert lines[duplicate + 1:] == ["Unable to parse 99-BAD.usfm: Expected USFM marker or text"]
+        assert wordlist is None
+    else:
+        assert "SUMMARY:" in lines[duplicate + 1:]
+        assert "Titus" in wordlist
+
+def test_cached_results_match_a_run_without_the_cache(tmp_path, verifyFolder, verified):
+    folder = makeFolder(tmp_path)
+    cache = tmp_path / "cache"
+    expected = verifyFolder(folder)
+    del verified[:]
+    assert verifyFolder(folder, cache=cache) == expected
+    assert verified == ["41-MAT-aligned.usfm", "57-TIT.usfm", "58-TIT.usfm"]
+    del verified[:]
+    assert verifyFolder(folder, cache=cache) == expected
+    assert verified == []
+
+def test_changes_miss_the_cache(tmp_path, verifyFolder, verified):
+    folder = makeFolder(tmp_path)
+    cache = tmp_path / "cache"
+    verifyFolder(folder, cache=cache)
+    with open(folder / "58-TIT.usfm", "a", encoding="utf-8") as output:
+        output.write("\\v 4 Another verse, with a word that is new.\n")
+    expected = verifyFolder(folder)
+    del verified[:]
+    assert verifyFolder(folder, cache=cache) == expected
+    assert verified == ["58-TIT.usfm"]
+    expected = verifyFolder(folder, suppress1="True")
+    assert expected != verifyFolder(folder)
+    del verified[:]
+    assert verifyFolder(folder, cache=cache, suppress1="True") == expected
+    assert verified == ["41-MAT-aligned.usfm", "57-TIT.usfm", "58-TIT.usfm"]
+
+def test_profile_is_written_and_issues_are_unchanged(tmp_path, verifyFolder, verified, monkeypatch):
+    folder = makeFolder(tmp_path)
+    cache = tmp_path / "cache"
+    expected = verifyFolder(folder, cache=cache)
+    monkeypatch.setenv('USFM_VERIFY_PROFILE', "1")
+    del verified[:]
+    assert verifyFolder(folder, workers=3, cache=cache) == expected
+    assert verified == ["41-MAT-aligned.usfm", "57-TIT.usfm", "58-TIT.usfm"]     # no cached or parallel results
+    with open(folder / "verify_profile.json", encoding="utf-8") as input:
+        profile = json.load(input)
+    assert sorted(profile) == ["files", "total"]
+    assert sorted(profile['files']) == ["41-MAT-aligned.usfm", "57-TIT.usfm", "58-TIT.usfm"]
+    functions = profile['total']['functions']
+    for name in ('verifyContents', 'parse', 'unalign_usfm', 'take', 'takeText', 'reportError', 'dumpWords'):
+        assert functions[name]['calls'] > 0 and functions[name]['seconds'] >= 0
+    assert profile['files']['57-TIT.usfm']['functions']['verifyContents']['calls'] == 1
+    assert profile['total']['errors']['23'] == 1
+    assert sum(profile['total']['errors'].values()) == functions['reportError']['calls']
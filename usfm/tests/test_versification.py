@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+# The versification tables must number every verse of usfm_verses.verseCounts once, in book order.
+
+import pytest
+
+import usfm_verses
+import versification as vs
+
+def allVerses():
+    for id in vs.books:
+        for (chapter, n) in enumerate(usfm_verses.verseCounts[id]['verses'], start=1):
+            for verse in range(1, n + 1):
+                yield (id, chapter, verse)
+
+def test_ordinals_count_the_verses_in_order():
+    verses = list(allVerses())
+    assert len(verses) == vs.nOrdinals
+    assert [vs.ordinal(*ref) for ref in verses] == list(range(vs.nOrdinals))
+    assert list(vs.references(0, vs.nOrdinals - 1)) == verses
+
+def test_first_and_last_verses():
+    assert vs.reference(0) == ("GEN", 1, 1)
+    assert vs.reference(vs.nOrdinals - 1) == ("REV", 22, 21)
+
+@pytest.mark.parametrize("ordinal", [-1, -vs.nOrdinals, vs.nOrdinals, vs.nOrdinals + 1])
+def test_reference_out_of_range(ordinal):
+    with pytest.raises(ValueError):
+        vs.reference(ordinal)
+
+@pytest.mark.parametrize("ref", [("GEN", 0, 1), ("GEN", 1, 0), ("GEN", 1, 32), ("GEN", 51, 1), ("XYZ", 1, 1), ("FRT", 1, 1)])
+def test_invalid_verse_has_no_ordinal(ref):
+    assert not vs.isValid(*ref)
+    assert vs.ordinal(*ref) == -1
+
+def test_ordinals_of_book_chapter_and_verses():
+    assert [vs.reference(n) for n in vs.ordinals("TIT", 3)] == [("TIT", 3, v) for v in range(1, 16)]
+    assert len(vs.ordinals("TIT")) == sum(usfm_verses.verseCounts["TIT"]['verses'])
+    assert [vs.reference(n) for n in vs.ordinals("TIT", 1, 3, 5)] == [("TIT", 1, v) for v in (3, 4, 5)]
+    assert vs.ordinals("TIT", 1, 15, 99)[-1] == vs.ordinal("TIT", 1, 16)
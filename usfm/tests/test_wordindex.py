@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+# The word index lists as new the words that a run added which were not in any book at the end of the run before.
+
+import pytest
+
+import wordindex
+
+@pytest.fixture
+def indexPath(tmp_path):
+    return str(tmp_path / "wordindex.db")
+
+# Indexes the books, {name: [words]}, in a run of its own, and returns the words that are new in that run.
+def run(indexPath, tmp_path, books):
+    index = wordindex.WordIndex(indexPath)
+    for (name, words) in books.items():
+        hash = " ".join(sorted(words))
+        index.updateBook(str(tmp_path / name), name, hash, {word: (1, name + " 1:1") for word in words})
+    new = [word for (word, name, ref) in index.newWords()]
+    nruns = index.connection.execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+    index.close()
+    return (new, nruns)
+
+def test_new_words_are_the_words_added_since_the_previous_run(indexPath, tmp_path):
+    assert run(indexPath, tmp_path, {"A.usfm": ["a", "b"]}) == (["a", "b"], 1)
+    assert run(indexPath, tmp_path, {"B.usfm": ["b", "c"]}) == (["c"], 2)
+
+def test_a_word_that_comes_back_is_new_again(indexPath, tmp_path):
+    run(indexPath, tmp_path, {"A.usfm": ["a", "b"]})
+    assert run(indexPath, tmp_path, {"A.usfm": ["a"]}) == ([], 2)
+    assert run(indexPath, tmp_path, {"A.usfm": ["a", "b"]}) == (["b"], 3)
+
+def test_a_run_that_changes_nothing_is_not_recorded(indexPath, tmp_path):
+    run(indexPath, tmp_path, {"A.usfm": ["a"]})
+    run(indexPath, tmp_path, {"B.usfm": ["b"]})
+    assert run(indexPath, tmp_path, {"A.usfm": ["a"], "B.usfm": ["b"]}) == (["b"], 2)
+
+def test_a_word_added_by_two_books_in_one_run_is_listed_once(indexPath, tmp_path):
+    assert run(indexPath, tmp_path, {"A.usfm": ["a"], "B.usfm": ["a", "b"]}) == (["a", "b"], 1)
@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+# Persistent cache of parsed USFM token streams, shared by the usfm tools.
+# Entries are keyed by a hash of the USFM text together with the parser version and the list of
+# token classes, so a book that has not changed since any tool last parsed it is loaded instead of parsed.
+# Entries are stored in a compact binary format (below), one block of tokens at a time, so that iterTokens()
+# never holds more than a block of a book's tokens in memory, whether it reads them from the cache or parses them.
+# When the cache grows beyond maxBytes, the least recently used entries are removed.
+#
+# The cache is off unless the USFM_TOKEN_CACHE environment variable names the folder to keep it in.
+
+import array
+import hashlib
+import io
+import os
+import struct
+import sys
+import threading
+import parseUsfm
+
+cache_dir = os.environ.get('USFM_TOKEN_CACHE', "")
+maxBytes = 64 * 1024 * 1024
+evictInterval = maxBytes // 16  # bytes written between checks of the size of the cache
+blockTokens = 4096              # maximum number of tokens in a block
+
+# Binary format of a cache entry:
+#   magic
+#   blocks, each of which has
+#       header: number of tokens, size of the type names, size of the token values
+#       type names, utf-8, separated by NUL characters
+#       class code of each token, array('H')
+#       type name index of each token, array('H')
+#       length in characters of each token value, array('I')
+#       all the token values, concatenated, utf-8
+#   a header with no tokens, which ends the entry
+# The arrays are written in native byte order; the cache is not meant to be copied between machines.
+magic = b'USFMTOK2'
+header = struct.Struct('<III')
+
+# Changes whenever the tokens produced by parseUsfm could change, which invalidates all existing entries.
+fingerprint = hashlib.sha1(
+    f"{parseUsfm.version}|{sys.byteorder}|{','.join(cls.__name__ for cls in parseUsfm.TokenClass.registry)}".encode('ascii')
+).digest()
+
+# Returns the list of tokens in the specified USFM text, from the cache if possible.
+def parseString(unicodeString):
+    if not cache_dir:
+        return parseUsfm.parseString(unicodeString)
+    return list(iterTokens(unicodeString))
+
+# Generates the tokens in the specified USFM text, from the cache if possible.
+# Otherwise the tokens are generated as they are parsed, and written to the cache as they go.
+# The entry is kept only if the caller takes all the tokens.
+# If parseUsfm parses the book in parallel, the whole book is parsed before the first token is generated.
+def iterTokens(unicodeString):
+    if not cache_dir:
+        yield from parseUsfm.iterTokens(io.StringIO(unicodeString))
+        return
+    key = cacheKey(unicodeString)
+    ntaken = 0
+    try:
+        with open(entryPath(key), 'rb') as input:
+            os.utime(input.fileno())    # marks the entry as recently used
+            for token in readEntry(input):
+                yield token
+                ntaken += 1
+        return
+    except (OSError, ValueError, IndexError, struct.error):
+        pass    # no entry, or a damaged one, which is replaced, skipping the tokens already taken from it
+    if parseUsfm.isParallel(unicodeString):
+        tokens = parseUsfm.parseString(unicodeString)     # may parse in parallel
+    else:
+        tokens = parseUsfm.iterTokens(io.StringIO(unicodeString))
+    writer = EntryWriter(entryPath(key))
+    try:
+        for token in tokens:
+            writer.add(token)
+            if ntaken:
+                ntaken -= 1
+            else:
+                yield token
+        writer.commit()
+    finally:
+        writer.discard()
+
+def cacheKey(unicodeString):
+    h = hashlib.sha1(fingerprint)
+    h.update(unicodeString.encode('utf-8', 'surrogatepass'))
+    return h.hexdigest()
+
+def entryPath(key):
+    return os.path.join(cache_dir, key + ".tok")
+
+# Generates the tokens of the cache entry in the file, reading one block at a time.
+# Raises ValueError if the entry is damaged.
+def readEntry(input):
+    if input.read(len(magic)) != magic:
+        raise ValueError("Not a token cache entry")
+    classes = parseUsfm.TokenClass.registry
+    while True:
+        (ntokens, ntypebytes, nvaluebytes) = header.unpack(input.read(header.size))
+        if ntokens == 0:
+            if input.read(1):
+                raise ValueError("Data after the end of a token cache entry")
+            return
+        types = readBytes(input, ntypebytes).decode('utf-8').split('\0')
+        (codes, typeIndex, lengths) = (readArray(input, typecode, ntokens) for typecode in ('H', 'H', 'I'))
+        values = readBytes(input, nvaluebytes).decode('utf-8', 'surrogatepass')
+        start = 0
+        for code, t, n in zip(codes, typeIndex, lengths):
+            token = classes[code](values[start:start+n])
+            token.type = types[t]
+            start += n
+            yield token
+
+def readBytes(input, n):
+    data = input.read(n)
+    if len(data) != n:
+        raise ValueError("Token cache entry is truncated")
+    return data
+
+def readArray(input, typecode, n):
+    a = array.array(typecode)
+    a.frombytes(readBytes(input, a.itemsize * n))
+    return a
+
+# Writes a cache entry one block at a time, as the tokens are added.
+# The entry is written to a temporary file, which takes the place of the entry when it is committed.
+# Failure to write is not an error; the tokens just are not cached.
+class EntryWriter:
+    def __init__(self, path):
+        self.path = path
+        self.tmppath = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        self.block = []
+        self.size = 0
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            self.output = open(self.tmppath, 'wb')
+            self.output.write(magic)
+        except OSError:
+            self.discard()
+
+    def add(self, token):
+        if self.output:
+            self.block.append(token)
+            if len(self.block) >= blockTokens:
+                self.writeBlock()
+
+    def writeBlock(self):
+        try:
+            data = encodeBlock(self.block)
+            self.output.write(data)
+            self.size += len(data)
+        except (OSError, TypeError):
+            self.discard()
+        self.block = []
+
+    # Writes the rest of the tokens and the end of the entry, and puts the entry in place.
+    def commit(self):
+        if not self.output:
+            return
+        if self.block:
+            self.writeBlock()
+        try:
+            self.output.write(header.pack(0, 0, 0))
+            self.output.close()
+            self.output = None
+            os.replace(self.tmppath, self.path)
+        except OSError:
+            self.discard()
+            return
+        written(self.size)
+
+    # Abandons the entry, unless it has been committed.
+    def discard(self):
+        output = getattr(self, 'output', None)
+        self.output = None
+        if output:
+            output.close()
+        if os.path.exists(self.tmppath):
+            try:
+                os.remove(self.tmppath)
+            except OSError:
+                pass
+
+def encodeBlock(tokens):
+    types = {}
+    codes = array.array('H')
+    typeIndex = array.array('H')
+    lengths = array.array('I')
+    for token in tokens:
+        codes.append(token.code)
+        typeIndex.append(types.setdefault(token.type, len(types)))
+        lengths.append(len(token.value))
+    typeNames = '\0'.join(types).encode('utf-8')
+    values = ''.join(token.value for token in tokens).encode('utf-8', 'surrogatepass')
+    return b''.join((header.pack(len(codes), len(typeNames), len(values)), typeNames,
+                     codes.tobytes(), typeIndex.tobytes(), lengths.tobytes(), values))
+
+# The cache is checked for size after the first entry written by a process, and after every evictInterval bytes.
+writtenLock = threading.Lock()
+sinceEvict = None   # bytes written since the last check, None before the first
+
+def written(nbytes):
+    global sinceEvict
+    with writtenLock:
+        due = sinceEvict is None or sinceEvict + nbytes >= evictInterval
+        sinceEvict = 0 if due else sinceEvict + nbytes
+    if due:
+        evict()
+
+# Removes the least recently used entries until the cache is no larger than maxBytes.
+def evict():
+    entries = []
+    total = 0
+    try:
+        with os.scandir(cache_dir) as it:
+            for entry in it:
+                if entry.name.endswith(".tok"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+    except OSError:
+        return
+    if total > maxBytes:
+        entries.sort()
+        for mtime, size, path in entries:
+            if total <= maxBytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+# Removes all entries from the cache.
+def clear():
+    if cache_dir and os.path.isdir(cache_dir):
+        for fname in os.listdir(cache_dir):
+            if fname.endswith(".tok"):
+                os.remove(os.path.join(cache_dir, fname))
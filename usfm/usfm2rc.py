@@ -17,7 +17,7 @@ import os
 import operator
 from pathlib import Path
 import usfm_verses
-import parseUsfm
+import tokencache
 import io
 import re
 import yaml
@@ -534,16 +534,14 @@ def convertFile(usfmpath, fname):
     state = State()
     state.reset()
     state.recordInputChunks( loadChunksUsfm(usfmpath) )
-    input = io.open(usfmpath, "tr", 1, encoding="utf-8-sig")
-    str = input.read(-1)
-    input.close()
+    with io.open(usfmpath, "tr", 1, encoding="utf-8-sig") as input:
+        contents = input.read(-1)
+    success = isParseable(contents, fname)
 
     sys.stdout.flush()
-    success = isParseable(str, fname)
     if success:
         print("CONVERTING " + fname + ":")
-        tokens = parseUsfm.parseString(str)
-        for token in tokens:
+        for token in tokencache.iterTokens(contents):
             take(token)
         state.usfmFile.write("\n")
         state.usfmFile.close()
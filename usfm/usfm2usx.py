@@ -33,6 +33,7 @@ from pathlib import Path
 import sys
 import os
 import parseUsfm
+import tokencache
 import usfm_verses
 import io
 import codecs
@@ -385,7 +386,7 @@ def convertFile(usfmpath, bookId):
         input = io.open(usfmpath, "tr", encoding="utf-8-sig")
         str = input.read()
         input.close()
-        for token in parseUsfm.parseString(str):
+        for token in tokencache.parseString(str):
             take(token)
         closeUsx()
         copy(os.path.join(en_book_dir, 'LICENSE.md'), target_book_dir)
@@ -9,15 +9,17 @@
 # Capitalizes first word in sentences. (optional)
 
 import configmanager
+import jobrunner
 import re       # regular expression module
 import io
 import os
 import shutil
 import sys
 import substitutions
+from substituter import Substituter
 import quotes
 import doublequotes
-import parseUsfm
+import tokencache
 import sentences
 import usfmFile
 from datetime import date
@@ -140,6 +142,7 @@ def fix_booktitles(str):
     str = fix_booktitles_x(str, re.compile(r'(\\mt1? )([^\n]+\n)'))
     return str
 
+substituter = Substituter(substitutions.subs)
 spacey3_re = re.compile(r'\\v [0-9]+ ([\(\'"«“‘])[\s]', re.UNICODE)    # verse starts with free floating quote mark
 jammedparen_re = re.compile(r'[^\s]\(')
 
@@ -147,8 +150,7 @@ jammedparen_re = re.compile(r'[^\s]\(')
 # Reduces double periods to single periods
 # Removes space after quote or left paren at beginning of verse.
 def fix_punctuation(str):
-    for pair in substitutions.subs:
-        str = str.replace(pair[0], pair[1])
+    str = substituter.apply(str)
     pos = str.find("..", 0)
     while pos >= 0:
         if pos != str.find("...", pos):
@@ -367,7 +369,7 @@ def convert_by_token(path):
     usfm.setInlineTags({"f", "ft", "f*", "rq", "rq*", "fe", "fe*", "fr", "fk", "fq", "fqa", "fqa*"})
     global needcaps
     needcaps = True
-    tokens = parseUsfm.parseString(str)
+    tokens = tokencache.parseString(str)
     for token in tokens:
         changes += take(token, usfm)
     usfm.close()
@@ -375,37 +377,40 @@ def convert_by_token(path):
     return (changes > 0)
 
 # Corrects issues in the USFM file
+# The file is reported as changed after its backup is in place, and the job is not terminated in between.
 def convertFile(path):
     global nChanged
     reportProgress(f"Checking {shortname(path)}")
 
     prev_nChanged = nChanged
     tmppath = path + ".tmp"
-    if os.path.exists(tmppath):
-        os.remove(tmppath)
-    os.rename(path, tmppath)    # to preserve time stamp
-    shutil.copyfile(tmppath, path)
-
-    if convert_wholefile(path):
-        nChanged += 1
-    if convert_by_line(path):
-        nChanged += 1
-    if enable[5]:   # capitalization
-        if convert_by_token(path):
-            nChanged += 1
+    with jobrunner.writingFiles(gui):
+        if os.path.exists(tmppath):
+            os.remove(tmppath)
+        os.rename(path, tmppath)    # to preserve time stamp
+        shutil.copyfile(tmppath, path)
 
+        if convert_wholefile(path):
+            nChanged += 1
+        if convert_by_line(path):
+            nChanged += 1
+        if enable[5]:   # capitalization
+            if convert_by_token(path):
+                nChanged += 1
+
+        if nChanged > prev_nChanged:
+            nChanged = prev_nChanged + 1
+            bakpath = path + ".orig"
+            if not os.path.isfile(bakpath):
+                os.rename(tmppath, bakpath)
+            else:
+                os.remove(tmppath)
+        else:       # no changes to file
+            os.remove(path)
+            os.rename(tmppath, path)
     if nChanged > prev_nChanged:
-        nChanged = prev_nChanged + 1
         reportStatus(f"Changed {shortname(path)}")
         sys.stdout.flush()
-        bakpath = path + ".orig"
-        if not os.path.isfile(bakpath):
-            os.rename(tmppath, bakpath)
-        else:
-            os.remove(tmppath)
-    else:       # no changes to file
-        os.remove(path)
-        os.rename(tmppath, path)
 
 # Recursive routine to convert all files under the specified folder
 def convertFolder(folder):
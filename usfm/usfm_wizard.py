@@ -12,8 +12,8 @@ from idlelib.tooltip import Hovertip
 import os
 import re
 import sys
-import time
-import threading
+import multiprocessing
+import jobrunner
 import g_selectProcess
 import g_txt2USFM
 import g_verifyUSFM
@@ -50,10 +50,7 @@ class UsfmWizard(tkinter.Tk):
 
         self.process = 'SelectProcess'
         self.activate_step('SelectProcess')
-        self.bind('<<ScriptMessage>>', self.onScriptMessage)
-        self.bind('<<ScriptProgress>>', self.onScriptProgress)
-        self.bind('<<ScriptEnd>>', self.onScriptEnd)
-        self.progress_lock = threading.Lock()
+        self.jobs = jobrunner.JobRunner(self, self)
         self.bind('<Enter>', self.normalize_window)
         self.n = 0
 
@@ -72,35 +69,34 @@ class UsfmWizard(tkinter.Tk):
         self.attributes("-topmost", False)
         self.unbind("<Enter>")
 
+    # Runs the main() function of the script module in a worker process, with the current configuration.
+    # Messages from the script go to the current step, even if the user moves on to other steps while it runs.
+    # count is the number of progress messages expected from the script.
     def execute_script(self, module, count):
-        self.titleframe.start_progress(count)
+        sections = self.config.snapshot()
+        other = self.jobs.busy(jobrunner.jobFolder(module, sections))
+        if other:
+            messagebox.showwarning(title='USFM Wizard', message=f"{other.module} is still running in {other.folder}.",
+                                   detail="Wait for it to finish, or cancel it.")
+            self.current_step.onScriptEnd("")
+            return
+        job = self.jobs.start(module, count, sections, self.current_step)
+        self.titleframe.start_progress(job, self.jobs.cancel)
         self.titleframe.tkraise()
-        self.progress = ""
-        self.current_script_module = sys.modules[module]
-        target = getattr(self.current_script_module, "main")
-        self.thread = threading.Thread(target=target, args=(self, ))
-        self.thread.start()
-        self.titleframe.increment_progress(0)
 
-    def onScriptMessage(self, event):
-        with self.progress_lock:
-            copystr = self.progress
-            self.progress = ""
-        if copystr:
-            self.current_step.onScriptMessage(copystr)
+    # Called by self.jobs in the mainloop.
+    def onJobMessage(self, job, text):
+        job.owner.onScriptMessage(text)
 
-    def onScriptProgress(self, event):
-        self.onScriptMessage(event)
-        self.titleframe.increment_progress()
+    def onJobProgress(self, job, text):
+        if text:
+            job.owner.onScriptMessage(text)
+        self.titleframe.show_progress(job)
 
-    def onScriptEnd(self, event):
-        time.sleep(0.2)     # show completeness this much longer before removing progress bar
-        self.thread.join()
-        with self.progress_lock:
-            copystr = self.progress
-            self.progress = ""
-        self.current_step.onScriptEnd(copystr)
-        self.titleframe.stop_progress()
+    def onJobEnd(self, job):
+        job.owner.onScriptEnd(job.status)
+        self.titleframe.show_progress(job)
+        self.after(200, self.titleframe.stop_progress, job)   # show completeness this much longer before removing progress bar
 
     def set_process(self, selection):
         self.process = selection
@@ -177,24 +173,34 @@ class UsfmWizard(tkinter.Tk):
     def save_values(self, stepname, values):
         self.config.write_section(stepname, values)
 
-# The Title_Frame implements a Label for step titles, and a Progressbar for step executions.
+# The Title_Frame implements a Label for step titles, and a Progressbar for each running job.
+# Each Progressbar has a label showing the book being processed, and a Cancel button.
 # These go on row 1 of the main UsfmWizard Frame.
 class Title_Frame(Frame):
     def __init__(self, parent):
         super().__init__(parent)
         self.step_label = ttk.Label(self, font='TKHeadingFont')
         self.step_label.grid(row=1, column=1, padx=(0,25))
-        self.progressbar = ttk.Progressbar(self, length=235, orient='horizontal', mode='determinate')
+        self.bars = dict()      # (label, progressbar, button) for each running job, by job id
 
-    def start_progress(self, n):
-        self.progressbar['maximum'] = n
-        self.progressbar.grid(row=1, column=2, sticky="ew")
-        # self.update()   # this may be unnecessary after I get the threads going
-    def increment_progress(self, delta=1):
-        self.progressbar['value'] += delta
-    def stop_progress(self):
-        self.progressbar.stop()
-        self.progressbar.grid_forget()
+    def start_progress(self, job, cancel):
+        label = ttk.Label(self, text=job.module, width=28)
+        progressbar = ttk.Progressbar(self, length=235, orient='horizontal', mode='determinate',
+                                      maximum=max(job.count, 1))
+        button = ttk.Button(self, text="Cancel", width=7, command=lambda: cancel(job))
+        label.grid(row=job.id, column=2, sticky="w")
+        progressbar.grid(row=job.id, column=3, sticky="ew")
+        button.grid(row=job.id, column=4, padx=(5,0))
+        Hovertip(button, hover_delay=500, text=f"Stop {job.module} after the current book.")
+        self.bars[job.id] = (label, progressbar, button)
+    def show_progress(self, job):
+        if job.id in self.bars:
+            (label, progressbar, button) = self.bars[job.id]
+            label['text'] = job.book[:40] if job.book else job.module
+            progressbar['value'] = min(job.done, job.count)
+    def stop_progress(self, job):
+        for widget in self.bars.pop(job.id, ()):
+            widget.destroy()
 
 # Buttons_Frame reserves a row of five buttons on the UsfmWizard main Frame.
 # The buttons are initially hidden.
@@ -282,11 +288,13 @@ def about(*args):
     messagebox.showinfo(title='About USFM Wizard', message=f"Version {app_version}",
                         detail=f"Config file: {configpath}")
 def exit_wizard(*args):
+    wizard.jobs.shutdown()
     wizard.destroy()
-    # It would be nice if I killed any threads that are still running here.
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()    # for the worker processes of a frozen executable
     wizard = UsfmWizard()
     create_menu(wizard)
+    wizard.protocol("WM_DELETE_WINDOW", exit_wizard)
     wizard.attributes("-topmost", True)    # works around issue where wizard comes up behind cmd window
     wizard.mainloop()
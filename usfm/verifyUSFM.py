@@ -7,34 +7,40 @@
 #   language_code
 #   standard_chapter_title (optional)
 #   suppress1 thru suppress11 (optional)
+#   word_index (optional)
 # Detects whether files are aligned USFM.
+# Set the USFM_VERIFY_WORKERS environment variable to verify the files of a folder in that many processes.
+# The output is the same as when the files are verified one at a time.
+# Set the USFM_VERIFY_CACHE environment variable to a folder to save the results for each file of a verified folder
+# there, so that files that have not changed since the last run are not verified again.
+# Set the USFM_WORD_INDEX environment variable, or the word_index config value, to an index file to also keep the
+# words of each file in that index, which can be queried with wordindex.py. Keep it outside source_dir.
+# Set the USFM_VERIFY_PROFILE environment variable, or the profile config value, to record the time spent
+# in each check and the number of issues of each type, in verify_profile.json next to issues.txt.
+# Other programs can verify USFM text in memory with the Verifier class, which returns the issues it finds.
+# All the state of a run is kept in a Verifier. The functions of this module that a script run used to provide,
+# such as verifyFile(), work on the default Verifier, which main() sets up from the config file.
 
-config = None
-suppress = [False]*12
-std_titles = None
-state = None
-gui = None
-
-lastToken = None
-aligned_usfm = False
-usfm_version = 2
-issuesFile = None
-issues: dict = {}   # Can't put in State because we want to accumulate issues across all files.
-wordlist = dict()
 
 import configmanager
 import os
 from pathlib import Path
 import sys
 import parseUsfm
+import tokencache
 import io
-import operator
+import hashlib
+import pickle
+import time
+import json
 import footnoted_verses
 import usfm_verses
+import versification
 import re
 import unicodedata
 import usfm_utils
 import sentences
+import wordindex
 from datetime import date
 
 # Marker types
@@ -50,11 +56,13 @@ class State:
         self.IDs = []
         self.ID = ""
         self.titles = []
+        self.booktitles = []
         self.chaptertitles = []
         self.nChapterLabels = 0
         self.nParagraphs = 0
         self.nPoetry = 0
         self.chapter = 0
+        self.lastChapter = 0
         self.verse = 0
         self.lastVerse = 0
         self.startChunkVerse = 1
@@ -77,6 +85,9 @@ class State:
         self.prevMarkerType = OTHER
         self.currMarker = None
         self.prevMarker = None
+        self.toc3 = None
+        self.upperCaseReported = False
+        self.asciiVerse = False
 
     def __repr__(self):
         return f'State({self.reference})'
@@ -145,7 +156,7 @@ class State:
     def addChapterLabel(self, title):
         tokens = title.split()
         for token in tokens:
-            if decimal_value(token) == state.chapter:
+            if decimal_value(token) == self.chapter:
                 pos = title.find(token)
                 title = (title[:pos] + title[pos+len(token):]).strip()
                 if title not in self.chaptertitles:
@@ -314,42 +325,16 @@ def decimal_value(s):
 
 # Returns the number of chapters that the specified book should contain
 def nChapters(id):
-    return usfm_verses.verseCounts[id]['chapters']
+    return len(versification.chapterVerses[id])
 
 # Returns the number of verses that the specified chapter should contain
 def nVerses(id, chap):
-    chaps = usfm_verses.verseCounts[id]['verses']
-    n = chaps[chap-1]
-    return n
+    return versification.chapterVerses[id][chap-1]
 
 # Returns the English title for the specified book
 def bookTitleEnglish(id):
     return usfm_verses.verseCounts[id]['en_name']
 
-def shortname(longpath):
-    source_dir = Path(config['source_dir'])
-    shortname = Path(longpath)
-    if shortname.is_relative_to(source_dir):
-        shortname = shortname.relative_to(source_dir)
-    return str(shortname)
-
-# If issues.txt file is not already open, opens it for writing.
-# First renames existing issues.txt file to issues-oldest.txt unless
-# issues-oldest.txt already exists.
-# Returns file pointer.
-def openIssuesFile():
-    global issuesFile
-    if not issuesFile:
-        source_dir = config['source_dir']
-        path = os.path.join(source_dir, "issues.txt")
-        if os.path.exists(path):
-            bakpath = os.path.join(source_dir, "issues-oldest.txt")
-            if not os.path.exists(bakpath):
-                os.rename(path, bakpath)
-        issuesFile = io.open(path, "tw", encoding='utf-8', newline='\n')
-        issuesFile.write(f"Issues detected by verifyUSFM, {date.today()}, {source_dir}\n-------------------\n")
-    return issuesFile
-
 # Returns the longest common substring at the start of s1 and s2
 def long_substring(s1, s2):
     if s1.startswith(s2):
@@ -359,350 +344,17 @@ def long_substring(s1, s2):
         i += 1
     return s1[0:i]
 
-# Writes error message to stderr and to issues.txt.
-# Keeps track of how many errors of each type.
-def reportError(msg, errorId=0, summarize_only=False):
-    if not summarize_only:
-        reportToGui('<<ScriptMessage>>', msg)
-        write(msg, sys.stderr)
-        issuesfile = openIssuesFile()
-        issuesfile.write(msg + "\n")
-
-    if errorId > 0:
-        global issues
-        if errorId in issues:
-            newmsg = long_substring(msg, issues[errorId][0])
-            newcount = issues[errorId][1] + 1
-        else:
-            newmsg = msg
-            newcount = 1
-        issues[errorId] = (newmsg, newcount)
-
-# Sends a progress message to the GUI, and to stdout.
-def reportProgress(msg):
-    reportToGui('<<ScriptProgress>>', msg)
-    write(msg, sys.stdout)
-
-# Sends a status message to the GUI, and to stdout.
-def reportStatus(msg):
-    reportToGui('<<ScriptMessage>>', msg)
-    write(msg, sys.stdout)
-
-def reportToGui(event, msg):
-    if gui:
-        with gui.progress_lock:
-            gui.progress = msg if not gui.progress else f"{gui.progress}\n{msg}"
-        gui.event_generate(event, when="tail")
-
-# This little function streams the specified message and handles UnicodeEncodeError
-# exceptions, which are common in Indian language texts. 2/5/24.
-def write(msg, stream):
-    try:
-        stream.write(msg + "\n")
-    except UnicodeEncodeError as e:
-        stream.write(state.reference + ": (Unicode...)\n")
-
-# Write summary of issues to issuesFile
-def reportIssues():
-    global issues
-    total = 0
-    issuesfile = openIssuesFile()
-    issuesfile.write("\nSUMMARY:\n")
-    for issue in sorted(issues.items(), key=lambda kv: kv[1][1], reverse=True):
-        total += issue[1][1]
-        issuesfile.write(f"{issue[1][0]}...:  {issue[1][1]} occurrence(s).\n")
-    issuesfile.write(f"\n{total} issues found.")
-
-# Writes the word list to a file.
-def dumpWords():
-    path = os.path.join(config['source_dir'], "wordlist.txt")
-    with io.open(path, "tw", encoding='utf-8', newline = '\n') as file:
-        file.write("For better viewing, used a fixed-width font if available.\n")
-        file.write("---------------------------------------------------------\n")
-        for entry in sorted(wordlist.items(), key=wordkey):
-            line = f"{entry[0]:20}  {entry[1][0]}"
-            if entry[1][0] < 3:
-                line = line + ",   " + entry[1][1]
-            file.write(line + '\n')
-
 # Returns sort key for the specified item. 
 def wordkey(item):
     word = item[0].lstrip("' .,:;!?-[]{}()<>\"“‘’”*/")
     return str.lower(word)
 
-# Report missing text or all ASCII text, in previous verse
-def previousVerseCheck():
-    if not isOptional(state.reference) and state.getTextLength() < 10 and state.verse != 0:
-        if state.getTextLength() == 0:
-            reportError("Empty verse: " + state.reference, 1)
-        elif not isShortVerse(state.reference):
-            reportError("Verse fragment: " + state.reference, 2)
-    if not suppress[9] and state.asciiVerse and state.getTextLength() > 0:
-        reportError("Verse is entirely ASCII: " + state.reference, 3)
-
-def longChunkCheck():
-    max_chunk_length = 400  # set lower if this is ever needed again
-    if not aligned_usfm and state.verse - (max_chunk_length-1) > state.startChunkVerse:
-        reportError("Long chunk: " + state.startChunkRef + "-" + str(state.verse) + "   (" + str(state.verse-state.startChunkVerse+1) + " verses)", 4)
-
-
-# Verifies that at least one book title is specified, other than the English book title.
-# This method is called just before chapter 1 begins, so there has been every
-# opportunity for the book title to be specified.
-def verifyBookTitle():
-    title_ok = False
-    en_name = bookTitleEnglish(state.ID)
-    for title in state.booktitles:
-        if title and title != en_name:
-            title_ok = True
-    if not title_ok:
-        reportError("No non-English book title for " + state.ID, 5)
-
-# Reports inconsistent chapter titling
-def verifyChapterTitles():
-    global std_titles
-    if len(state.chaptertitles) > 1 and len(state.chaptertitles) != len(std_titles):
-        reportError(f"Inconsistent chapter titling: {state.chaptertitles} in {state.ID}", 6)
-    if state.nChapterLabels > 1 and state.nChapterLabels != state.chapter:
-        reportError(f"Some chapters do not have chapter labels but {state.nChapterLabels} do.", 7)
-
-# Verifies correct number of verses for the current chapter.
-# This method is called just before the next chapter begins.
-def verifyVerseCount():
-    if state.chapter > 0 and state.verse != nVerses(state.ID, state.chapter):
-        # Acts may have 40 o4 41 verses, normally 41.
-        # 2 Cor. may have 13 or 14 verses, normally 14.
-        # 3 John may have 14 or 15 verses, normally 14.
-        # Revelation 12 may have 17 or 18 verses, normally 17.
-        if state.reference != 'REV 12:18' and state.reference != '3JN 1:15' and state.reference != '2CO 13:13' \
-            and state.reference != 'ACT 19:40':
-            reportError(f"Chapter normally has {nVerses(state.ID, state.chapter)} verses: {state.reference}", 8)
-
-def verifyFootnotes():
-    if state.footnote_starts != state.footnote_ends:
-        reportError("Mismatched footnote tags (" + str(state.footnote_starts) + " started and " + str(state.footnote_ends) + " ended) in " + state.ID, 9)
-    if state.endnote_starts != state.endnote_ends:
-        reportError("Mismatched endnote tags (" + str(state.endnote_starts) + " started and " + str(state.endnote_ends) + " ended) in " + state.ID, 10)
-
-# Checks whether the entire file was empty or unreadable
-def verifyNotEmpty(filename):
-    if not state.ID or state.chapter == 0:
-        if not state.ID in {'FRT','BAK'}:
-            reportError("File may be empty, or open in another program: " + filename, 11)
-
-def verifyChapterCount():
-    if state.ID and state.chapter != nChapters(state.ID):
-        reportError("There should be " + str(nChapters(state.ID)) + " chapters in " + state.ID + " but " + str(state.chapter) + " chapters are found.", 12)
-
-# \b is used to indicate additional white space between paragraphs.
-# No text or verse marker should follow this marker
-# and it should not be used before or after titles to indicate white space.
-def takeB():
-    state.addB()
-
-# Processes a chapter tag
-def takeC(c):
-    # Report missing text in previous verse
-    if c != "1":
-        previousVerseCheck()
-        # longChunkCheck()
-    state.addChapter(c)
-    if len(state.IDs) == 0:
-        reportError("Missing ID before chapter: " + c, 13)
-    if state.chapter < state.lastChapter:
-        reportError("Chapter out of order: " + state.reference, 14)
-    elif state.chapter == state.lastChapter:
-        reportError("Duplicate chapter: " + state.reference, 15)
-    elif state.chapter > state.lastChapter + 2:
-        reportError("Missing chapters before: " + state.reference, 16)
-    elif state.chapter > state.lastChapter + 1:
-        reportError("Missing chapter(s) between: " + state.lastRef + " and " + state.reference, 17)
-
-# Processes a chapter label
-def takeCL(label):
-    global std_titles
-    # Report missing text in previous verse
-    title = state.addChapterLabel(label.rstrip())   # gets title without chapter number, but spacing unchanged
-    if len(std_titles) > 0:
-        if title not in std_titles:
-            reportError(f"Non-standard chapter label at {state.reference}: {label}", 42)
-
-# Handles all the footnote and endnote token types
-def takeFootnote(token):
-    if token.isF_S() or token.isRQS():
-        if state.footnote_starts != state.footnote_ends:
-            reportError(f"Footnote starts before previous one is terminated at {state.reference}", 18)
-        state.addFootnoteStart()
-    elif token.isFE_S():
-        if state.endnote_starts != state.endnote_ends:
-            reportError(f"Endnote starts before previous one is terminated at {state.reference}", 19)
-        reportError(f"Warning: endnote \\fe ... \\fe* at {state.reference} may break USFM Converter and Scripture App Builder.", 20)
-        state.addEndnoteStart()
-    elif token.isF_E() or token.isRQE():
-        state.addFootnoteEnd()
-    elif token.isFE_E():
-        state.addEndnoteEnd()
-    else:
-        if not state.inFootnote():
-            reportError(f"Footnote marker ({token.type}) not between \\f ... \\f* pair at {state.reference}", 21)
-    takeText(token.value, footnote=True)
-
-def takeID(id):
-    if len(id) < 3:
-        reportError("Invalid ID: " + id, 22)
-    id = id[0:3].upper()
-    if id in state.getIDs():
-        reportError("Duplicate ID: " + id, 23)
-    state.addID(id)
-
-def reportParagraphMarkerErrors(type):
-    if state.currMarkerType in {QQ,PP} and not suppress[4]:
-        reportError("Warning: back to back paragraph/poetry markers after: " + state.reference, 24)
-    if state.needText() and not isOptional(state.reference):
-        reportError("Paragraph marker after verse marker, or empty verse: " + state.reference, 25)
-    if type == 'nb' and state.currMarkerType != C:
-        reportError("\\nb marker should follow chapter marker: " + state.reference, 25.1)
-
-def takeP(type):
-    reportParagraphMarkerErrors(type)
-    if not aligned_usfm and not suppress[3] and not state.sentenceEnded():
-        if state.verse > 0:
-            reportError(f"Punctuation missing at end of paragraph: {state.reference}", 26, suppress[11])
-        else:
-            reportError(f"Punctuation missing at end of paragraph before {state.reference}", 26.1, suppress[11])
-    state.addParagraph() if type != 'nb' else state.addNB()
-
-def takeQ(type):
-    reportParagraphMarkerErrors(type)
-    state.addPoetry()
-
-def takeS5():
-    # longChunkCheck()
-    state.addS5()
-    takeSection('s5')
-
-def takeSection(tag):
-    if not suppress[4]:
-        if state.currMarkerType == PP:
-            reportError(f"Warning: useless paragraph (p,m,nb) marker before \\{tag} marker at: {state.reference}", 27)
-        elif state.currMarkerType == QQ:
-            reportError(f"Warning: useless \q before \\{tag} marker at: {state.reference}", 28)
-        elif state.currMarkerType == B:
-            reportError(f"\\b may not be used before or after section heading. {state.reference}", 29)
-    state.addSection()
-
-def takeTitle(token):
-    if token.isTOC3():
-        state.addToc3(token.value)
-        global usfm_version
-        if usfm_version == 2:
-            if (len(token.value) != 3 or not token.value.isascii()):
-                reportError("Invalid toc3 value in " + state.reference, 64)
-            elif token.value.upper() != state.ID:
-                reportError(f"toc3 value ({token.value}) not the same as book ID in {state.reference}", 64.5)
-    else:
-        state.addTitle(token.value)
-    if token.isMT() and token.value.isascii() and not suppress[9]:
-        reportError("mt token has ASCII value in " + state.reference, 30)
-    if token.value.isupper() and not state.upperCaseReported and not suppress[8]:
-        reportError("Upper case book title in " + state.reference, 31)
-        state.reportedUpperCase()
-    if token.value.startswith("Ii"):
-        reportError(f"Mixed case roman numerals in \\{token.type} field", 31.1)
-    if state.currMarkerType == B:
-        reportError("\\b may not be used before or after titles or headings. " + state.reference, 32)
-
 vv_re = re.compile(r'([0-9]+)-([0-9]+)')
 vinvalid_re = re.compile(r'[^\d\-]')
 
-# Receives a string containing a verse number or range of verse numbers.
-# Reports missing text in previous verse.
-# Reports errors related to the verse number(s), such as missing or duplicated verses.
-def takeV(vstr):
-    if state.currMarkerType == B:
-        reportError(f"\\b should be used only between paragraphs. {state.reference}", 33)
-    if vstr != "1":
-        previousVerseCheck()   # Checks previous verse
-    vlist = []
-    if vstr.find('-') > 0:
-        vv_range = vv_re.search(vstr)
-        if vv_range:
-            vnStart = int(vv_range.group(1))
-            vnEnd = int(vv_range.group(2))
-            # while vn <= vnEnd:
-            #     vlist.append(vn)
-            #     vn += 1
-            for vn in range(vnStart, vnEnd + 1):
-                vlist.append(vn)
-        else:
-            reportError("Problem in verse range near " + state.reference, 34)
-    else:
-        vlist.append(int(vstr))
-
-    for vn in vlist:
-        v = str(vn)
-        state.addVerse(str(vn))
-        if len(state.IDs) == 0 and state.chapter == 0:
-            reportError("Missing ID before verse: " + v, 35)
-        if state.chapter == 0:
-            reportError("Missing chapter tag: " + state.reference, 36)
-        if state.verse == 1 and state.needPP:
-            reportError("Need paragraph marker before: " + state.reference, 37, suppress[2])
-        if state.needQQ:
-            reportError("Need \\q or \\p after acrostic heading before: " + state.reference, 38)
-            state.resetPoetry()
-        if state.verse < state.lastVerse and state.addError(state.lastRef):
-            reportError("Verse out of order: " + state.reference + " after " + state.lastRef, 39)
-            state.addError(state.reference)
-        elif state.verse == state.lastVerse:
-            reportError("Duplicated verse number: " + state.reference, 40)
-        elif state.verse == state.lastVerse + 2 and not isOptional(state.reference, True):
-            if state.addError(state.lastRef):
-                reportError("Missing verse between: " + state.lastRef + " and " + state.reference, 41)
-        elif state.verse > state.lastVerse + 2 and state.addError(state.lastRef):
-            reportError("Missing verses between: " + state.lastRef + " and " + state.reference, 41.1)
-
 reference_re = re.compile(r'[\d]+[\s]*:[\s]*[\d]+', re.UNICODE)
 bracketed_re = re.compile(r'\[ *([^\]]+) *\]', re.UNICODE)
 
-# Looks for possible verse references and square brackets in the text, not preceded by a footnote marker.
-# This function is only called when parsing a piece of text preceded by a verse marker.
-def reportFootnotes(text):
-    global lastToken
-    if not isFootnote(lastToken):
-        if ref := reference_re.search(text):
-            reportFootnote(ref.group(0))
-        elif ('(' in text or '[' in text or ')' in text) and (isOptional(state.reference) or state.reference in footnoted_verses.footnotedVerses):
-            reportFootnote('(')
-        elif "[" in text:
-            fn = bracketed_re.search(text)
-            if not fn or ' ' in fn.group(1):    # orphan [, or more than one word between brackets
-                reportFootnote('[')
-
-def reportFootnote(trigger):
-    reference = state.reference
-    if ':' in trigger:
-        reportError(f"Probable chapter:verse reference ({trigger}) at {reference} belongs in a footnote", 43)
-    elif isOptional(reference) or reference in footnoted_verses.footnotedVerses:
-        reportError(f"Bracket or parens found in {reference}, a verse that is often footnoted", 43.1)
-    else:
-        reportError(f"Optional text or untagged footnote at {reference}", 43.2)
-
-# Warns when a paragraph break appears in what seems to be the middle of a sentence.
-# Warns when the specified string is supposed to start a sentence but the first word is not capitalized.
-# Warns when a sentence later in the string does not start with a capital letter.
-def reportCaps(s):
-    if state.needCaps():
-        word = sentences.firstword(s)
-        if word and word[0].islower():
-            if state.currMarkerType == PP or state.prevMarkerType == PP:
-                reportError(f"First word of paragraph not capitalized near {state.reference}", 44, suppress[10])
-            else:
-                reportError(f"First word in sentence is not capitalized: \"{word}\" at {state.reference}", 44.1, suppress[10])
-    for word in sentences.nextfirstwords(s):
-        if word[0].islower():
-            reportError(f"First word in sentence is not capitalized: \"{word}\" in {state.reference}", 44.1, suppress[10])
-
 # Returns a string containing text preceding specified start position and following end position
 def context(text, start, end):
     start = 0 if start < 0 else 1 + text.rfind(' ', 0, start)
@@ -720,52 +372,6 @@ spacey4_re = re.compile(r'[\s][\(\'"«“‘’”»›]$', re.UNICODE)       #
 wordmedial_punct_re = re.compile(r'[\w][.?!;:,()\[\]"«“‘”»›][.?!;:,()\[\]\'"«“‘’”»›]*[\w]')
 outsidequote_re = re.compile(r'([\'"’”»›][\.!])', re.UNICODE)   # Period or exclamation outside closing quote.
 
-def reportPunctuation(text):
-    global lastToken
-    if bad := punctuation_re.search(text):
-        i = bad.start()
-        if text[i:i+3] != '...' or text[i:i+4] == "....":
-            chars = bad.group(1)
-            if not (chars[0] in ',.' and chars[1] in "0123456789"):   # it's a number
-                if not (chars[0] == ":" and chars[1] in "0123456789"):
-                    reportError("Check the punctuation at " + state.reference + ": " + chars, 45)
-                elif not (state.inFootnote() or lastToken.getType().startswith('io') \
-                          or lastToken.getType().startswith('ip')):
-                    s = context(text, bad.start()-2, bad.end()+1)
-                    reportError(f"Untagged footnote (probable) at {state.reference}: {s}", 46)
-    #if bad := adjacent_re.search(text):
-        #i = bad.start()
-        #if text[i:i+3] != "..." or text[i:i+4] == "....":   # Don't report proper ellipses ...
-            #reportError("Check repeated punctuation at " + state.reference + ": " + bad.group(1), 47)
-    if bad := spacey_re.search(text):
-        reportError("Space before phrase ending mark at " + state.reference + ": " + bad.group(1), 48)
-    if bad := outsidequote_re.search(text):
-        i = bad.start()
-        if text[i+1:i+4] != "...":
-            reportError(f"Punctuation after quote mark at {state.reference}: {bad.group(1)}", 50)
-
-    if bad := spacey2_re.search(text):
-        s = context(text, bad.start()-2, bad.end()+2)
-    elif bad := spacey3_re.match(text):
-        s = context(text, 0, bad.end()+2)
-    elif bad := spacey4_re.search(text):
-        s = context(text, bad.start()-2, len(text))
-    if bad:
-        reportError(f"Free floating mark at {state.reference}: {s}", 49)
-
-    if "''" in text or '""' in text:
-        reportError("Repeated quotes at " + state.reference, 51)
-    bad = wordmedial_punct_re.search(text)
-    if bad and text[bad.end()-1] not in "0123456789":
-        s = context(text, bad.start(), bad.end())
-        reportError(f"Word medial punctuation in {state.reference}: {s}", 52)
-    if '/' in text:
-        reportError(f"Forward slash in {state.reference}", 52.1)
-    if '\\' in text:
-        reportError(f"Backslash in {state.reference}", 52.2)
-    if '=' in text:
-        reportError(f"Equals sign (=) in {state.reference}", 52.3)
-
 numberembed_re = re.compile(r'[^\s,:\.\d\(\[\-]+[\d]+[^\s,;\.\d\)\]]+')
 numberprefix_re = re.compile(r'[^\s,\.\d\(\[][\d]+', re.UNICODE)
 numbersuffix_re = re.compile(r'[\d]+[^\s,;:.\-?!"\d\)\]]', re.UNICODE)
@@ -775,107 +381,20 @@ leadingzero_re = re.compile(r'[\s]0[0-9,]*', re.UNICODE)
 number_re = re.compile(r'[^\d](\d+)[^\d,]')       # possible verse number in text
 chapverse_re = re.compile(r'(\d+)([:\-])(\d+)')
 
-def reportNumbers(t, footnote):
-    verseflag = False
-    if not footnote:
-        if t.startswith(str(state.verse) + " "):
-            reportError("Verse number in text (probable): " + state.reference, 59)
-            verseflag = True
-        elif v := number_re.search(t):
-            while v:
-                if v.group(1) == str(state.verse) or v.group(1) == str(state.verse+1):
-                    reportError(f"Possible verse number ({v.group(1)}) in text at {state.reference}", 59.1)
-                    verseflag = True
-                v = number_re.search(t, v.end()-1)
-        if not verseflag:
-            chapverse = chapverse_re.search(t)
-            while chapverse:
-                if chapverse.group(2) == ":" or int(chapverse.group(3)) > int(chapverse.group(1)):
-                    reportError(f"Likely verse reference ({chapverse.group(0)}) in text at {state.reference}", 59.2)
-                    verseflag = True
-                chapverse = chapverse_re.search(t, chapverse.end())
-    if embed := numberembed_re.search(t):
-        reportError(f"Embedded number in word: {embed.group(0)} at {state.reference}", 60)
-    elif not verseflag:
-        if suffixed := numbersuffix_re.search(t):
-            if not footnote:
-                reportError(f"Invalid number suffix: {suffixed.group(0)} at {state.reference}", 60.2)
-        if prefixed := numberprefix_re.search(t):
-            if not footnote or (prefixed.group(0)[0] not in {':','-'}):
-                reportError(f"Invalid number prefix: {prefixed.group(0)} at {state.reference}", 60.1)
-    if unsegmented := unsegmented_re.search(t):
-        if len(unsegmented.group(0)) > 4:
-            reportError(f"Unsegmented number: {unsegmented.group(0)} at {state.reference}", 61.5)
-    if fmt := numberformat_re.search(t):
-        reportError(f"Space in number {fmt.group(0)} at {state.reference}", 61.6)
-    elif leadzero := leadingzero_re.search(t):
-        reportError(f"Invalid leading zero: {leadzero.group(0)} at {state.reference}", 61)
-
 period_re = re.compile(r'[\s]*[\.,;:!\?]', re.UNICODE)  # detects phrase-ending punctuation standing alone or starting a phrase
 
-# Performs checks on some text, at most a verse in length.
-def takeText(t, footnote=False):
-    global lastToken
-    if not state.textOkay() and not isTextCarryingToken(lastToken):
-        if t[0] == '\\':
-            reportError("Uncommon or invalid marker near " + state.reference, 53)
-        else:
-            # print u"Missing verse marker before text: <" + t.encode('utf-8') + u"> around " + state.reference
-            # reportError(u"Missing verse marker or extra text around " + state.reference + u": <" + t[0:10] + u'>.')
-            reportError("Missing verse marker or extra text near " + state.reference, 54)
-        if lastToken:
-            reportError("  preceding Token was \\" + lastToken.getValue(), 0)
-        else:
-            reportError("  no preceding Token", 0)
-    if state.textOkay() and state.verse == 0:
-        reportError(f"Unmarked text before {state.reference + ':1'}", 76)
-    if "<" in t and not ">" in t:
-        if "<< HEAD" in t:
-            reportError("Unresolved translation conflict near " + state.reference, 55)
-        else:
-            reportError("Angle bracket not closed at " + state.reference, 56)
-    if "Conflict Parsing Error" in t:
-        reportError("BTT Writer artifact in " + state.reference, 57)
-    if not suppress[3] and not aligned_usfm:    # report punctuation issues
-        reportPunctuation(t)
-    if period := period_re.match(t):    # text starts with a period
-        if len(t) <= period.end() + 1:
-            reportError(f"Orphaned punctuation at {state.reference}", 58)
-        else:
-            reportError("Text begins with phrase-ending punctuation in " + state.reference, 58.1)
-    if lastToken.isV() and not aligned_usfm:
-        reportFootnotes(t)
-    if not suppress[1]:
-        reportNumbers(t, footnote)
-    if not footnote:
-        reportCaps(t)
-        state.endSentence( sentences.endsSentence(t) )
-    state.addText(t)
-    addWords(t)
-
 allpunc = ".,:;!?-\[\]{}()<>'\"“‘’”*/"
 quoteend_re = re.compile(r"[.,:;!?-\[\]{}()<>'\"“‘’”*/]'$")
 notnumberinfootnote_re = re.compile(r'[^\d:\-.,]')
 
-def addWords(t):
-    for item in t.split():
-        word = item.strip(".,:;!?+-[]{}()<>\"“‘’”*/")
-        if quoteend_re.search(word):
-            word = word.rstrip(allpunc)
-        if word:
-            if not state.inFootnote() or notnumberinfootnote_re.search(word):
-                (count, ref) = wordlist.get(word, (0, None))
-                ref = state.reference if count == 0 else ""
-                wordlist[word] = (count+1, ref)
-
 # Returns true if token is part of a footnote
 def isFootnote(token):
-    return (token.getType().startswith("f") and token.getType() != "fig") or token.getType().startswith("rq")
+    return token.bit & parseUsfm.FOOTNOTE
     #return token.isF_S() or token.isF_E() or token.isFR() or token.isFT() or token.isFP() or token.isFE_S() or token.isFE_E()
 
 # Returns true if token is part of a cross reference
 def isCrossRef(token):
-    return token.isX_S() or token.isX_E() or token.isXO() or token.isXT()
+    return token.bit & parseUsfm.CROSSREF
 
 # Returns True if the specified verse reference is an optional verse.
 # Pass previous=True to check the previous verse.
@@ -899,84 +418,29 @@ def isShortVerse(ref):
 'JOB 3:2', 'JOB 9:1', 'JOB 12:1', 'JOB 16:1', 'JOB 19:1', 'JOB 21:1', 'JOB 27:1', 'JOB 29:1', 'LUK 20:30' }
 
 def isPoetry(token):
-    return token.isQ() or token.isQ1() or token.isQ2() or token.isQ3() or token.isQA() or \
-           token.isQR() or token.isQC()
+    return token.bit & parseUsfm.POETRY
 
 def isIntro(token):
-    return token.is_is() or token.is_ip() or token.is_iot() or token.is_io() or token.is_im()
+    return token.bit & parseUsfm.INTRO
 
 def isSpecialText(token):
-    return token.isWJS() or token.isADDS() or token.isNDS() or token.isPNS() or token.isQTS() or token.is_k_s()
+    return token.bit & parseUsfm.SPECIALTEXT
+
+textCarrying = parseUsfm.tokenMask(parseUsfm.BToken, parseUsfm.MToken, parseUsfm.DToken, parseUsfm.SPToken) | \
+    parseUsfm.SPECIALTEXT | parseUsfm.FOOTNOTE | parseUsfm.CROSSREF | parseUsfm.POETRY | parseUsfm.INTRO
 
 def isTextCarryingToken(token):
-    return token.isB() or token.isM() or isSpecialText(token) or token.isD() or token.isSP() or \
-           isFootnote(token) or isCrossRef(token) or isPoetry(token) or isIntro(token)
+    return token and token.bit & textCarrying
 
 def isTitleToken(token):
-    return token.isH() or token.isTOC1() or token.isTOC2() or token.isTOC3() or token.isMT() or token.is_imt()
+    return token.bit & parseUsfm.TITLE
+
+numericCandidate = parseUsfm.tokenMask(parseUsfm.TEXTToken, parseUsfm.CLToken, parseUsfm.CPToken, parseUsfm.FTToken) | \
+    parseUsfm.TITLE
 
 # Returns True if the token value should be checked for Arabic numerals
 def isNumericCandidate(token):
-    return token.isTEXT() or isTitleToken(token) or token.isCL() or token.isCP() or token.isFT()
-
-def take(token):
-    global lastToken
-    global usfm_version
-
-    if not token.isTEXT():
-        if not state.addMarker(token.type):
-            reportError(f"Back to back markers of type {token.type} at {state.reference}", 62)
-    else:
-        takeText(token.value, state.inFootnote())
-
-    if token.isID():
-        takeID(token.value)
-    elif token.isC():
-        if not suppress[5]:
-            verifyVerseCount()  # for the preceding chapter
-        if not state.ID:
-            reportError("Missing book ID: " + state.reference, 62.1)
-            sys.exit(-1)
-        if token.value == "1":
-            verifyBookTitle()
-        takeC(token.value)
-    elif token.isCL():
-        takeCL(token.value)
-    elif token.isP() or token.isPI() or token.isPC() or token.isNB() or token.isM():
-        takeP(token.type)
-        if token.value:     # paragraph markers can be followed by text
-            reportError("Unexpected: text returned as part of paragraph token." +  state.reference, 63)
-            takeText(token.value)
-    elif token.isV():
-        takeV(token.value)
-    elif isFootnote(token):
-        takeFootnote(token)
-    elif token.isS5():
-        takeS5()
-    elif token.isS() or token.isMR() or token.isMS() or token.isD() or token.isSP():
-        takeSection(token.type)
-    elif token.isQA():
-        state.addAcrosticHeading()
-    elif isPoetry(token):
-        takeQ(token.type)
-    elif token.isB():
-        takeB()
-    elif isTitleToken(token):
-        takeTitle(token)
-    elif token.isUSFM():    # non-standard USFM token but is used by UnfoldingWord software
-        usfm_version = int(token.value[0])
-    elif token.isUnknown():
-        if token.value == "p":
-            reportError("Orphaned paragraph marker after " + state.reference, 65)
-        elif token.value == "v":
-            reportError("Unnumbered verse after " + state.reference, 66)
-        elif usfm_version == 2:
-            reportError("Invalid USFM token (\\" + token.value + ") near " + state.reference, 67)
-
-    if config['language_code'] in {"ur"} and isNumericCandidate(token) and re.search(r'[0-9]', token.value):
-        reportError("Arabic numerals in footnote at " + state.reference, 68)
-
-    lastToken = token
+    return token.bit & numericCandidate
 
 bad_chapter_re1 = re.compile(r'[^\n](\\c\s*\d+)', re.UNICODE)
 bad_chapter_re2 = re.compile(r'(\\c[0-9]+)', re.UNICODE)
@@ -984,179 +448,1176 @@ bad_chapter_re3 = re.compile(r'(\\c\s*\d+)[^\d\s]+[\n\r]', re.UNICODE)
 bad_verse_re1 = re.compile(r'([^\n\r\s]\\v\s*\d+)', re.UNICODE)
 bad_verse_re2 = re.compile(r'(\\v[0-9]+)', re.UNICODE)
 bad_verse_re3 = re.compile(r'(\\v\s*[-0-9]+[^-\d\s])', re.UNICODE)
-
-# Receives the text of an entire book as input.
-# Reports bad patterns.
-def verifyChapterAndVerseMarkers(text, path):
-    for badactor in bad_chapter_re1.finditer(text):
-        reportError("Missing newline before chapter marker: " + badactor.group(1) + " in " + path, 69)
-    for badactor in bad_chapter_re2.finditer(text):
-        reportError("Missing space before chapter number: " + badactor.group(0) + " in " + path, 70)
-    for badactor in bad_chapter_re3.finditer(text):
-        reportError("Missing space after chapter number: " + badactor.group(1) + " in " + path, 71)
-    for badactor in bad_verse_re1.finditer(text):
-        s = badactor.group(1)
-        if s[0] < ' ' or s[0] > '~': # not printable ascii
-            s = s[1:]
-        reportError("Missing white space before verse marker: " + s + " in " + path, 72)
-    for badactor in bad_verse_re2.finditer(text):
-        reportError("Missing space before verse number: " + badactor.group(0) + " in " + path, 73)
-    for badactor in bad_verse_re3.finditer(text):
-        s = badactor.group(1)
-#        if s[-1] < ' ' or s[-1] > '~': # not printable ascii
-#            s = s[:-1]
-        reportError("Missing space after verse number: " + s + " in " + path, 74)
-
-def verifyParagraphCount():
-    if state.nParagraphs / state.chapter <= 2.5 and state.nPoetry / state.chapter <= 15:
-        reportError(f"Low paragraph count ({state.nParagraphs + state.nPoetry}) for {state.ID}", 73.5)
-
 orphantext_re = re.compile(r'\n\n[^\\]', re.UNICODE)
 embeddedquotes_re = re.compile(r"\w'\w")
+conflict_re = re.compile(r'<+ HEAD', re.UNICODE)   # conflict resolution tag
+wjwj_re = re.compile(r' \\wj +\\wj\*', flags=re.UNICODE)
+backslasheol_re = re.compile(r'\\ *\n')
 
-# Receives the text of an entire book as input.
-# Verifies things that are better done as a whole file.
-# Can't report verse references because we haven't started to parse the book yet.
-def verifyWholeFile(contents, path):
-    verifyChapterAndVerseMarkers(contents, path)
-
-    lines = contents.split('\n')
-    orphans = orphantext_re.search(contents)
-    if orphans:
-        reportOrphans(lines, path)
-
-    if not suppress[6]:
-        nembedded = len(embeddedquotes_re.findall(contents))
-        nsingle = contents.count("'") - nembedded
-        ndouble = contents.count('"')
-        if ndouble > 0:
-            if nsingle == 0 or suppress[7]:
-                reportError(f"Straight quotes in {shortname(path)}: {ndouble} doubles.", 75)
+# The whole-file checks are done in a single pass over the text by scanText().
+# candidates_re finds the places where one or more of the patterns above can match, without consuming
+# any character another pattern needs. Each pattern is then matched at those places only, skipping places
+# inside its own previous match, which finds the same matches as running finditer() with each pattern.
+# Patterns such as bad_verse_re1 and embeddedquotes_re start with a character class that matches almost
+# anywhere, so they are much slower to run on their own.
+# candidates_re has no groups and every alternative starts with a literal character, so that the regex
+# engine can skip quickly to the next candidate. wjwj_re starts with a space, which would defeat that,
+# so it is still searched for separately.
+candidates_re = re.compile(r"\\[cv]|\\ *(?=\n)|'|\n(?=\n)|\x00")
+
+# The results of scanText()
+class TextScan:
+    def __init__(self):
+        self.wjwj = False
+        self.backslasheol = False
+        self.null = False
+        self.badChapters = ([], [], [])     # matches of bad_chapter_re1, 2 and 3
+        self.badVerses = ([], [], [])       # matches of bad_verse_re1, 2 and 3
+        self.orphantext = False             # orphantext_re.search() would succeed
+        self.orphans = []                   # (line number, line) of each non-empty line after an empty line
+                                            # that does not start with a backslash
+        self.nembedded = 0                  # len(embeddedquotes_re.findall())
+        self.nsingle = 0                    # number of ' characters
+
+# Scans the text for everything the whole-file checks look for.
+# With whole=False, only looks for the patterns that verifyFile() checks before an aligned file is unaligned.
+def scanText(text, whole=True):
+    found = TextScan()
+    found.wjwj = wjwj_re.search(text) is not None
+    if not whole:
+        found.backslasheol = backslasheol_re.search(text) is not None
+        found.null = '\x00' in text
+        return found
+    chapterPatterns = (bad_chapter_re1, bad_chapter_re2, bad_chapter_re3)
+    versePatterns = (bad_verse_re1, bad_verse_re2, bad_verse_re3)
+    chapterEnds = [0, 0, 0]
+    verseEnds = [0, 0, 0]
+    embeddedEnd = 0
+    embeddedMatch = embeddedquotes_re.match
+    size = len(text)
+    for match in candidates_re.finditer(text):
+        pos = match.start()
+        c = text[pos]
+        if c == "'":
+            found.nsingle += 1
+            if pos > embeddedEnd and embeddedMatch(text, pos - 1):
+                found.nembedded += 1
+                embeddedEnd = pos + 2
+        elif c == '\\':
+            c = text[pos+1]
+            if c == 'c':
+                (patterns, matches, ends) = (chapterPatterns, found.badChapters, chapterEnds)
+            elif c == 'v':
+                (patterns, matches, ends) = (versePatterns, found.badVerses, verseEnds)
             else:
-                reportError(f"Straight quotes in {shortname(path)}: {ndouble} doubles, {nsingle} singles not counting {nembedded} word-medial.", 75)
-        elif nsingle > 0 and not suppress[7]:
-            reportError(f"Straight quotes in {shortname(path)}: {nsingle} singles not counting {nembedded} word-medial.", 75)
+                found.backslasheol = True
+                continue
+            for n in range(3):
+                start = pos - 1 if n == 0 else pos     # the first pattern starts one character before the marker
+                if start >= ends[n] and (bad := patterns[n].match(text, start)):
+                    matches[n].append(bad)
+                    ends[n] = bad.end()
+        elif c == '\n':
+            if pos + 2 < size and text[pos+2] != '\\':
+                found.orphantext = True
+                if text[pos+2] != '\n':
+                    found.orphans.append(pos + 2)
+        else:
+            found.null = True
+    if text.startswith('\n') and size > 1 and text[1] not in '\n\\':
+        found.orphans.insert(0, 1)  # second line, after an empty first line
+    lineno = 1
+    prevpos = 0
+    for (i, pos) in enumerate(found.orphans):
+        lineno += text.count('\n', prevpos, pos)
+        prevpos = pos
+        end = text.find('\n', pos)
+        found.orphans[i] = (lineno, text[pos:] if end < 0 else text[pos:end])
+    return found
+
+# Returns the paths of all .usfm files under the specified folder, in the order they are verified.
+def listFiles(dir):
+    paths = []
+    dirpath = Path(dir)
+    for path in dirpath.iterdir():
+        if path.name[0] != '.':         # ignore hidden files
+            if path.is_dir():
+                # It's a directory, recurse into it
+                paths += listFiles(path)
+            elif path.is_file() and path.name[-3:].lower() == 'sfm':
+                paths.append(path)
+    return paths
 
+# An issue found by a Verifier.
+class Issue:
+    def __init__(self, id, reference, message, summarize_only=False):
+        self.id = id                    # same as the error ID in the summary of issues.txt, 0 if none
+        self.reference = reference      # the book, chapter and verse being verified when the issue was found
+        self.message = message
+        self.summarize_only = summarize_only    # the message would only be counted in the summary of issues.txt
 
-conflict_re = re.compile(r'<+ HEAD', re.UNICODE)   # conflict resolution tag
+    def __repr__(self):
+        return f'Issue({self.id}, {self.reference!r}, {self.message!r})'
+
+# Sets suppress[9] (ASCII content) for the languages that are known to need it set or cleared.
+def suppressForLanguage(language_code, suppress):
+    if language_code in {'diu','en','es','es-419','gl','ha','hr','id','kcn','kpj','nag','plt','pmy','pt-br','sw','tl','tpi'}:    # ASCII content
+        suppress[9] = True
+    if language_code in {'as','bn','gu','hi','kn','ml','mr','nag','ne','or','pa','ru','ta','te','zh'}:    # ASCII content
+        suppress[9] = False
+
+# Verifies USFM files or text, and keeps everything that a run needs: the settings, the State of the file being
+# verified, and the issues, words and book IDs found so far.
+# A script run reports the issues to stderr, issues.txt and the GUI. A program that calls verify_text() gets
+# them back as a list of Issues instead, so that it can verify any number of books without running this script.
+# A Verifier verifies one file or text at a time. Threads that verify at the same time need a Verifier each.
+class Verifier:
+    # language_code and std_titles are the same as the language_code and standard_chapter_title config values.
+    # suppress is a list of 12 booleans, where suppress[1] thru suppress[11] are the suppress1 thru suppress11
+    # config values. As in a script run, suppress[9] is set for languages known to use ASCII or non-ASCII content.
+    # config is the VerifyUSFM config section of a script run, with the source_dir of the files to verify,
+    # and gui is the wizard that shows the messages, if any.
+    def __init__(self, language_code, suppress=None, std_titles=None, config=None, gui=None):
+        self.config = config if config is not None else {'source_dir': "", 'language_code': language_code}
+        self.suppress = list(suppress) if suppress else [False]*12
+        suppressForLanguage(language_code, self.suppress)
+        self.std_titles = list(std_titles) if std_titles else []
+        self.gui = gui
+        self.state = None           # The State of the file being verified.
+        self.lastToken = None
+        self.aligned_usfm = False
+        self.usfm_version = 2
+        self.issuesFile = None
+        self.summary = dict()       # The first message and number of occurrences of each error ID, for issues.txt.
+        self.wordlist = dict()      # The words of all files verified so far, as written to wordlist.txt.
+        self.bookIDs = []           # The IDs of the books verified so far.
+        self.issues = None          # While verify_text() runs, the Issues found.
+        self.collected = None       # While a file is verified for a worker or the cache, the messages reported.
+        self.wordIndex = None       # The word index being updated, if any.
+        self.profile = None         # The times and counts recorded when profiling, see startProfile().
+        self.profileFile = None     # The file being verified when profiling.
+        self.scanText = scanText            # replaced by timed versions when profiling
+        self.unalign = usfm_utils.unalign_usfm
+        self.iterTokens = tokencache.iterTokens
+
+    # The word list of all texts verified so far, as written to wordlist.txt.
+    @property
+    def words(self):
+        return self.wordlist
+
+    # Verifies the USFM text of one book, which is named by filename in the messages.
+    # Returns the list of Issues found, in the order they would be reported.
+    # Text that cannot be parsed is reported as an Issue, as is anything else that would end a script run.
+    def verify_text(self, text, filename):
+        self.issues = []
+        try:
+            (words, ids, exit) = self.verifyOneFile(text, filename)
+            self.mergeWords(words)
+            return self.issues
+        finally:
+            self.issues = None
+
+    def shortname(self, longpath):
+        source_dir = Path(self.config['source_dir'])
+        shortname = Path(longpath)
+        if shortname.is_relative_to(source_dir):
+            shortname = shortname.relative_to(source_dir)
+        return str(shortname)
+
+    # If issues.txt file is not already open, opens it for writing.
+    # First renames existing issues.txt file to issues-oldest.txt unless
+    # issues-oldest.txt already exists.
+    # Returns file pointer.
+    def openIssuesFile(self):
+        if not self.issuesFile:
+            source_dir = self.config['source_dir']
+            path = os.path.join(source_dir, "issues.txt")
+            if os.path.exists(path):
+                bakpath = os.path.join(source_dir, "issues-oldest.txt")
+                if not os.path.exists(bakpath):
+                    os.rename(path, bakpath)
+            self.issuesFile = io.open(path, "tw", encoding='utf-8', newline='\n')
+            self.issuesFile.write(f"Issues detected by verifyUSFM, {date.today()}, {source_dir}\n-------------------\n")
+        return self.issuesFile
+
+    # Writes error message to stderr and to issues.txt.
+    # Keeps track of how many errors of each type.
+    def reportError(self, msg, errorId=0, summarize_only=False):
+        if self.profile is not None:
+            self.countError(errorId)
+        if self.issues is not None:
+            self.issues.append(Issue(errorId, self.state.reference if self.state else "", msg, summarize_only))
+            return
+        if self.collected is not None:
+            self.collected.append(('reportError', msg, errorId, summarize_only))
+            return
+        if not summarize_only:
+            self.reportToGui('<<ScriptMessage>>', msg)
+            self.write(msg, sys.stderr)
+            issuesfile = self.openIssuesFile()
+            issuesfile.write(msg + "\n")
+
+        if errorId > 0:
+            if errorId in self.summary:
+                newmsg = long_substring(msg, self.summary[errorId][0])
+                newcount = self.summary[errorId][1] + 1
+            else:
+                newmsg = msg
+                newcount = 1
+            self.summary[errorId] = (newmsg, newcount)
+
+    # Sends a progress message to the GUI, and to stdout.
+    def reportProgress(self, msg):
+        if self.issues is not None:
+            return
+        if self.collected is not None:
+            self.collected.append(('reportProgress', msg))
+            return
+        self.reportToGui('<<ScriptProgress>>', msg)
+        self.write(msg, sys.stdout)
+
+    # Sends a status message to the GUI, and to stdout.
+    def reportStatus(self, msg):
+        self.reportToGui('<<ScriptMessage>>', msg)
+        self.write(msg, sys.stdout)
+
+    def reportToGui(self, event, msg):
+        if self.gui:
+            with self.gui.progress_lock:
+                self.gui.progress = msg if not self.gui.progress else f"{self.gui.progress}\n{msg}"
+            self.gui.event_generate(event, when="tail")
+
+    # This little function streams the specified message and handles UnicodeEncodeError
+    # exceptions, which are common in Indian language texts. 2/5/24.
+    def write(self, msg, stream):
+        try:
+            stream.write(msg + "\n")
+        except UnicodeEncodeError as e:
+            stream.write((self.state.reference if self.state else "") + ": (Unicode...)\n")
+
+    # Write summary of issues to issuesFile
+    def reportIssues(self):
+        total = 0
+        issuesfile = self.openIssuesFile()
+        issuesfile.write("\nSUMMARY:\n")
+        for issue in sorted(self.summary.items(), key=lambda kv: kv[1][1], reverse=True):
+            total += issue[1][1]
+            issuesfile.write(f"{issue[1][0]}...:  {issue[1][1]} occurrence(s).\n")
+        issuesfile.write(f"\n{total} issues found.")
+
+    # Writes the word list to a file.
+    def dumpWords(self):
+        path = os.path.join(self.config['source_dir'], "wordlist.txt")
+        with io.open(path, "tw", encoding='utf-8', newline = '\n') as file:
+            file.write("For better viewing, used a fixed-width font if available.\n")
+            file.write("---------------------------------------------------------\n")
+            for entry in sorted(self.wordlist.items(), key=wordkey):
+                line = f"{entry[0]:20}  {entry[1][0]}"
+                if entry[1][0] < 3:
+                    line = line + ",   " + entry[1][1]
+                file.write(line + '\n')
+
+    # Report missing text or all ASCII text, in previous verse
+    def previousVerseCheck(self):
+        if not isOptional(self.state.reference) and self.state.getTextLength() < 10 and self.state.verse != 0:
+            if self.state.getTextLength() == 0:
+                self.reportError("Empty verse: " + self.state.reference, 1)
+            elif not isShortVerse(self.state.reference):
+                self.reportError("Verse fragment: " + self.state.reference, 2)
+        if not self.suppress[9] and self.state.asciiVerse and self.state.getTextLength() > 0:
+            self.reportError("Verse is entirely ASCII: " + self.state.reference, 3)
+
+    def longChunkCheck(self):
+        max_chunk_length = 400  # set lower if this is ever needed again
+        if not self.aligned_usfm and self.state.verse - (max_chunk_length-1) > self.state.startChunkVerse:
+            self.reportError("Long chunk: " + self.state.startChunkRef + "-" + str(self.state.verse) + "   (" + str(self.state.verse-self.state.startChunkVerse+1) + " verses)", 4)
+
+
+    # Verifies that at least one book title is specified, other than the English book title.
+    # This method is called just before chapter 1 begins, so there has been every
+    # opportunity for the book title to be specified.
+    def verifyBookTitle(self):
+        title_ok = False
+        en_name = bookTitleEnglish(self.state.ID)
+        for title in self.state.booktitles:
+            if title and title != en_name:
+                title_ok = True
+        if not title_ok:
+            self.reportError("No non-English book title for " + self.state.ID, 5)
+
+    # Reports inconsistent chapter titling
+    def verifyChapterTitles(self):
+        if len(self.state.chaptertitles) > 1 and len(self.state.chaptertitles) != len(self.std_titles):
+            self.reportError(f"Inconsistent chapter titling: {self.state.chaptertitles} in {self.state.ID}", 6)
+        if self.state.nChapterLabels > 1 and self.state.nChapterLabels != self.state.chapter:
+            self.reportError(f"Some chapters do not have chapter labels but {self.state.nChapterLabels} do.", 7)
+
+    # Verifies correct number of verses for the current chapter.
+    # This method is called just before the next chapter begins.
+    def verifyVerseCount(self):
+        if self.state.chapter > 0 and self.state.verse != nVerses(self.state.ID, self.state.chapter):
+            # Acts may have 40 o4 41 verses, normally 41.
+            # 2 Cor. may have 13 or 14 verses, normally 14.
+            # 3 John may have 14 or 15 verses, normally 14.
+            # Revelation 12 may have 17 or 18 verses, normally 17.
+            if self.state.reference != 'REV 12:18' and self.state.reference != '3JN 1:15' and self.state.reference != '2CO 13:13' \
+                and self.state.reference != 'ACT 19:40':
+                self.reportError(f"Chapter normally has {nVerses(self.state.ID, self.state.chapter)} verses: {self.state.reference}", 8)
+
+    def verifyFootnotes(self):
+        if self.state.footnote_starts != self.state.footnote_ends:
+            self.reportError("Mismatched footnote tags (" + str(self.state.footnote_starts) + " started and " + str(self.state.footnote_ends) + " ended) in " + self.state.ID, 9)
+        if self.state.endnote_starts != self.state.endnote_ends:
+            self.reportError("Mismatched endnote tags (" + str(self.state.endnote_starts) + " started and " + str(self.state.endnote_ends) + " ended) in " + self.state.ID, 10)
+
+    # Checks whether the entire file was empty or unreadable
+    def verifyNotEmpty(self, filename):
+        if not self.state.ID or self.state.chapter == 0:
+            if not self.state.ID in {'FRT','BAK'}:
+                self.reportError("File may be empty, or open in another program: " + filename, 11)
+
+    def verifyChapterCount(self):
+        if self.state.ID and self.state.chapter != nChapters(self.state.ID):
+            self.reportError("There should be " + str(nChapters(self.state.ID)) + " chapters in " + self.state.ID + " but " + str(self.state.chapter) + " chapters are found.", 12)
+
+    # \b is used to indicate additional white space between paragraphs.
+    # No text or verse marker should follow this marker
+    # and it should not be used before or after titles to indicate white space.
+    def takeB(self):
+        self.state.addB()
+
+    # Processes a chapter tag
+    def takeC(self, c):
+        # Report missing text in previous verse
+        if c != "1":
+            self.previousVerseCheck()
+            # longChunkCheck()
+        self.state.addChapter(c)
+        if len(self.state.IDs) == 0:
+            self.reportError("Missing ID before chapter: " + c, 13)
+        if self.state.chapter < self.state.lastChapter:
+            self.reportError("Chapter out of order: " + self.state.reference, 14)
+        elif self.state.chapter == self.state.lastChapter:
+            self.reportError("Duplicate chapter: " + self.state.reference, 15)
+        elif self.state.chapter > self.state.lastChapter + 2:
+            self.reportError("Missing chapters before: " + self.state.reference, 16)
+        elif self.state.chapter > self.state.lastChapter + 1:
+            self.reportError("Missing chapter(s) between: " + self.state.lastRef + " and " + self.state.reference, 17)
+
+    # Processes a chapter label
+    def takeCL(self, label):
+        # Report missing text in previous verse
+        title = self.state.addChapterLabel(label.rstrip())   # gets title without chapter number, but spacing unchanged
+        if len(self.std_titles) > 0:
+            if title not in self.std_titles:
+                self.reportError(f"Non-standard chapter label at {self.state.reference}: {label}", 42)
+
+    # Handles all the footnote and endnote token types
+    def takeFootnote(self, token):
+        if token.isF_S() or token.isRQS():
+            if self.state.footnote_starts != self.state.footnote_ends:
+                self.reportError(f"Footnote starts before previous one is terminated at {self.state.reference}", 18)
+            self.state.addFootnoteStart()
+        elif token.isFE_S():
+            if self.state.endnote_starts != self.state.endnote_ends:
+                self.reportError(f"Endnote starts before previous one is terminated at {self.state.reference}", 19)
+            self.reportError(f"Warning: endnote \\fe ... \\fe* at {self.state.reference} may break USFM Converter and Scripture App Builder.", 20)
+            self.state.addEndnoteStart()
+        elif token.isF_E() or token.isRQE():
+            self.state.addFootnoteEnd()
+        elif token.isFE_E():
+            self.state.addEndnoteEnd()
+        else:
+            if not self.state.inFootnote():
+                self.reportError(f"Footnote marker ({token.type}) not between \\f ... \\f* pair at {self.state.reference}", 21)
+        self.takeText(token.value, footnote=True)
+
+    def takeID(self, id):
+        if len(id) < 3:
+            self.reportError("Invalid ID: " + id, 22)
+        id = id[0:3].upper()
+        if id in self.state.getIDs():
+            self.reportError("Duplicate ID: " + id, 23)
+        self.state.addID(id)
+
+    def reportParagraphMarkerErrors(self, type):
+        if self.state.currMarkerType in {QQ,PP} and not self.suppress[4]:
+            self.reportError("Warning: back to back paragraph/poetry markers after: " + self.state.reference, 24)
+        if self.state.needText() and not isOptional(self.state.reference):
+            self.reportError("Paragraph marker after verse marker, or empty verse: " + self.state.reference, 25)
+        if type == 'nb' and self.state.currMarkerType != C:
+            self.reportError("\\nb marker should follow chapter marker: " + self.state.reference, 25.1)
+
+    def takeP(self, type):
+        self.reportParagraphMarkerErrors(type)
+        if not self.aligned_usfm and not self.suppress[3] and not self.state.sentenceEnded():
+            if self.state.verse > 0:
+                self.reportError(f"Punctuation missing at end of paragraph: {self.state.reference}", 26, self.suppress[11])
+            else:
+                self.reportError(f"Punctuation missing at end of paragraph before {self.state.reference}", 26.1, self.suppress[11])
+        self.state.addParagraph() if type != 'nb' else self.state.addNB()
+
+    def takeQ(self, type):
+        self.reportParagraphMarkerErrors(type)
+        self.state.addPoetry()
 
-def reportOrphans(lines, path):
-    prevline = "xx"
-    lineno = 0
-    for line in lines:
-        lineno += 1
-        if not prevline and line and line[0] != '\\':
+    def takeS5(self):
+        # longChunkCheck()
+        self.state.addS5()
+        self.takeSection('s5')
+
+    def takeSection(self, tag):
+        if not self.suppress[4]:
+            if self.state.currMarkerType == PP:
+                self.reportError(f"Warning: useless paragraph (p,m,nb) marker before \\{tag} marker at: {self.state.reference}", 27)
+            elif self.state.currMarkerType == QQ:
+                self.reportError(f"Warning: useless \q before \\{tag} marker at: {self.state.reference}", 28)
+            elif self.state.currMarkerType == B:
+                self.reportError(f"\\b may not be used before or after section heading. {self.state.reference}", 29)
+        self.state.addSection()
+
+    def takeTitle(self, token):
+        if token.isTOC3():
+            self.state.addToc3(token.value)
+            if self.usfm_version == 2:
+                if (len(token.value) != 3 or not token.value.isascii()):
+                    self.reportError("Invalid toc3 value in " + self.state.reference, 64)
+                elif token.value.upper() != self.state.ID:
+                    self.reportError(f"toc3 value ({token.value}) not the same as book ID in {self.state.reference}", 64.5)
+        else:
+            self.state.addTitle(token.value)
+        if token.isMT() and token.value.isascii() and not self.suppress[9]:
+            self.reportError("mt token has ASCII value in " + self.state.reference, 30)
+        if token.value.isupper() and not self.state.upperCaseReported and not self.suppress[8]:
+            self.reportError("Upper case book title in " + self.state.reference, 31)
+            self.state.reportedUpperCase()
+        if token.value.startswith("Ii"):
+            self.reportError(f"Mixed case roman numerals in \\{token.type} field", 31.1)
+        if self.state.currMarkerType == B:
+            self.reportError("\\b may not be used before or after titles or headings. " + self.state.reference, 32)
+
+    # Receives a string containing a verse number or range of verse numbers.
+    # Reports missing text in previous verse.
+    # Reports errors related to the verse number(s), such as missing or duplicated verses.
+    def takeV(self, vstr):
+        if self.state.currMarkerType == B:
+            self.reportError(f"\\b should be used only between paragraphs. {self.state.reference}", 33)
+        if vstr != "1":
+            self.previousVerseCheck()   # Checks previous verse
+        vlist = []
+        if vstr.find('-') > 0:
+            vv_range = vv_re.search(vstr)
+            if vv_range:
+                vnStart = int(vv_range.group(1))
+                vnEnd = int(vv_range.group(2))
+                # while vn <= vnEnd:
+                #     vlist.append(vn)
+                #     vn += 1
+                for vn in range(vnStart, vnEnd + 1):
+                    vlist.append(vn)
+            else:
+                self.reportError("Problem in verse range near " + self.state.reference, 34)
+        else:
+            vlist.append(int(vstr))
+
+        for vn in vlist:
+            v = str(vn)
+            self.state.addVerse(str(vn))
+            if len(self.state.IDs) == 0 and self.state.chapter == 0:
+                self.reportError("Missing ID before verse: " + v, 35)
+            if self.state.chapter == 0:
+                self.reportError("Missing chapter tag: " + self.state.reference, 36)
+            if self.state.verse == 1 and self.state.needPP:
+                self.reportError("Need paragraph marker before: " + self.state.reference, 37, self.suppress[2])
+            if self.state.needQQ:
+                self.reportError("Need \\q or \\p after acrostic heading before: " + self.state.reference, 38)
+                self.state.resetPoetry()
+            if self.state.verse < self.state.lastVerse and self.state.addError(self.state.lastRef):
+                self.reportError("Verse out of order: " + self.state.reference + " after " + self.state.lastRef, 39)
+                self.state.addError(self.state.reference)
+            elif self.state.verse == self.state.lastVerse:
+                self.reportError("Duplicated verse number: " + self.state.reference, 40)
+            elif self.state.verse == self.state.lastVerse + 2 and not isOptional(self.state.reference, True):
+                if self.state.addError(self.state.lastRef):
+                    self.reportError("Missing verse between: " + self.state.lastRef + " and " + self.state.reference, 41)
+            elif self.state.verse > self.state.lastVerse + 2 and self.state.addError(self.state.lastRef):
+                self.reportError("Missing verses between: " + self.state.lastRef + " and " + self.state.reference, 41.1)
+
+    # Looks for possible verse references and square brackets in the text, not preceded by a footnote marker.
+    # This function is only called when parsing a piece of text preceded by a verse marker.
+    def reportFootnotes(self, text):
+        if not isFootnote(self.lastToken):
+            if ref := reference_re.search(text):
+                self.reportFootnote(ref.group(0))
+            elif ('(' in text or '[' in text or ')' in text) and (isOptional(self.state.reference) or self.state.reference in footnoted_verses.footnotedVerses):
+                self.reportFootnote('(')
+            elif "[" in text:
+                fn = bracketed_re.search(text)
+                if not fn or ' ' in fn.group(1):    # orphan [, or more than one word between brackets
+                    self.reportFootnote('[')
+
+    def reportFootnote(self, trigger):
+        reference = self.state.reference
+        if ':' in trigger:
+            self.reportError(f"Probable chapter:verse reference ({trigger}) at {reference} belongs in a footnote", 43)
+        elif isOptional(reference) or reference in footnoted_verses.footnotedVerses:
+            self.reportError(f"Bracket or parens found in {reference}, a verse that is often footnoted", 43.1)
+        else:
+            self.reportError(f"Optional text or untagged footnote at {reference}", 43.2)
+
+    # Warns when a paragraph break appears in what seems to be the middle of a sentence.
+    # Warns when the specified string is supposed to start a sentence but the first word is not capitalized.
+    # Warns when a sentence later in the string does not start with a capital letter.
+    def reportCaps(self, s):
+        if self.state.needCaps():
+            word = sentences.firstword(s)
+            if word and word[0].islower():
+                if self.state.currMarkerType == PP or self.state.prevMarkerType == PP:
+                    self.reportError(f"First word of paragraph not capitalized near {self.state.reference}", 44, self.suppress[10])
+                else:
+                    self.reportError(f"First word in sentence is not capitalized: \"{word}\" at {self.state.reference}", 44.1, self.suppress[10])
+        for word in sentences.nextfirstwords(s):
+            if word[0].islower():
+                self.reportError(f"First word in sentence is not capitalized: \"{word}\" in {self.state.reference}", 44.1, self.suppress[10])
+
+    def reportPunctuation(self, text):
+        if bad := punctuation_re.search(text):
+            i = bad.start()
+            if text[i:i+3] != '...' or text[i:i+4] == "....":
+                chars = bad.group(1)
+                if not (chars[0] in ',.' and chars[1] in "0123456789"):   # it's a number
+                    if not (chars[0] == ":" and chars[1] in "0123456789"):
+                        self.reportError("Check the punctuation at " + self.state.reference + ": " + chars, 45)
+                    elif not (self.state.inFootnote() or self.lastToken and (self.lastToken.getType().startswith('io') \
+                              or self.lastToken.getType().startswith('ip'))):
+                        s = context(text, bad.start()-2, bad.end()+1)
+                        self.reportError(f"Untagged footnote (probable) at {self.state.reference}: {s}", 46)
+        #if bad := adjacent_re.search(text):
+            #i = bad.start()
+            #if text[i:i+3] != "..." or text[i:i+4] == "....":   # Don't report proper ellipses ...
+                #reportError("Check repeated punctuation at " + state.reference + ": " + bad.group(1), 47)
+        if bad := spacey_re.search(text):
+            self.reportError("Space before phrase ending mark at " + self.state.reference + ": " + bad.group(1), 48)
+        if bad := outsidequote_re.search(text):
+            i = bad.start()
+            if text[i+1:i+4] != "...":
+                self.reportError(f"Punctuation after quote mark at {self.state.reference}: {bad.group(1)}", 50)
+
+        if bad := spacey2_re.search(text):
+            s = context(text, bad.start()-2, bad.end()+2)
+        elif bad := spacey3_re.match(text):
+            s = context(text, 0, bad.end()+2)
+        elif bad := spacey4_re.search(text):
+            s = context(text, bad.start()-2, len(text))
+        if bad:
+            self.reportError(f"Free floating mark at {self.state.reference}: {s}", 49)
+
+        if "''" in text or '""' in text:
+            self.reportError("Repeated quotes at " + self.state.reference, 51)
+        bad = wordmedial_punct_re.search(text)
+        if bad and text[bad.end()-1] not in "0123456789":
+            s = context(text, bad.start(), bad.end())
+            self.reportError(f"Word medial punctuation in {self.state.reference}: {s}", 52)
+        if '/' in text:
+            self.reportError(f"Forward slash in {self.state.reference}", 52.1)
+        if '\\' in text:
+            self.reportError(f"Backslash in {self.state.reference}", 52.2)
+        if '=' in text:
+            self.reportError(f"Equals sign (=) in {self.state.reference}", 52.3)
+
+    def reportNumbers(self, t, footnote):
+        verseflag = False
+        if not footnote:
+            if t.startswith(str(self.state.verse) + " "):
+                self.reportError("Verse number in text (probable): " + self.state.reference, 59)
+                verseflag = True
+            elif v := number_re.search(t):
+                while v:
+                    if v.group(1) == str(self.state.verse) or v.group(1) == str(self.state.verse+1):
+                        self.reportError(f"Possible verse number ({v.group(1)}) in text at {self.state.reference}", 59.1)
+                        verseflag = True
+                    v = number_re.search(t, v.end()-1)
+            if not verseflag:
+                chapverse = chapverse_re.search(t)
+                while chapverse:
+                    if chapverse.group(2) == ":" or int(chapverse.group(3)) > int(chapverse.group(1)):
+                        self.reportError(f"Likely verse reference ({chapverse.group(0)}) in text at {self.state.reference}", 59.2)
+                        verseflag = True
+                    chapverse = chapverse_re.search(t, chapverse.end())
+        if embed := numberembed_re.search(t):
+            self.reportError(f"Embedded number in word: {embed.group(0)} at {self.state.reference}", 60)
+        elif not verseflag:
+            if suffixed := numbersuffix_re.search(t):
+                if not footnote:
+                    self.reportError(f"Invalid number suffix: {suffixed.group(0)} at {self.state.reference}", 60.2)
+            if prefixed := numberprefix_re.search(t):
+                if not footnote or (prefixed.group(0)[0] not in {':','-'}):
+                    self.reportError(f"Invalid number prefix: {prefixed.group(0)} at {self.state.reference}", 60.1)
+        if unsegmented := unsegmented_re.search(t):
+            if len(unsegmented.group(0)) > 4:
+                self.reportError(f"Unsegmented number: {unsegmented.group(0)} at {self.state.reference}", 61.5)
+        if fmt := numberformat_re.search(t):
+            self.reportError(f"Space in number {fmt.group(0)} at {self.state.reference}", 61.6)
+        elif leadzero := leadingzero_re.search(t):
+            self.reportError(f"Invalid leading zero: {leadzero.group(0)} at {self.state.reference}", 61)
+
+    # Performs checks on some text, at most a verse in length.
+    def takeText(self, t, footnote=False):
+        if not self.state.textOkay() and not isTextCarryingToken(self.lastToken):
+            if t[0] == '\\':
+                self.reportError("Uncommon or invalid marker near " + self.state.reference, 53)
+            else:
+                # print u"Missing verse marker before text: <" + t.encode('utf-8') + u"> around " + state.reference
+                # reportError(u"Missing verse marker or extra text around " + state.reference + u": <" + t[0:10] + u'>.')
+                self.reportError("Missing verse marker or extra text near " + self.state.reference, 54)
+            if self.lastToken:
+                self.reportError("  preceding Token was \\" + self.lastToken.getValue(), 0)
+            else:
+                self.reportError("  no preceding Token", 0)
+        if self.state.textOkay() and self.state.verse == 0:
+            self.reportError(f"Unmarked text before {self.state.reference + ':1'}", 76)
+        if "<" in t and not ">" in t:
+            if "<< HEAD" in t:
+                self.reportError("Unresolved translation conflict near " + self.state.reference, 55)
+            else:
+                self.reportError("Angle bracket not closed at " + self.state.reference, 56)
+        if "Conflict Parsing Error" in t:
+            self.reportError("BTT Writer artifact in " + self.state.reference, 57)
+        if not self.suppress[3] and not self.aligned_usfm:    # report punctuation issues
+            self.reportPunctuation(t)
+        if period := period_re.match(t):    # text starts with a period
+            if len(t) <= period.end() + 1:
+                self.reportError(f"Orphaned punctuation at {self.state.reference}", 58)
+            else:
+                self.reportError("Text begins with phrase-ending punctuation in " + self.state.reference, 58.1)
+        if self.lastToken and self.lastToken.isV() and not self.aligned_usfm:
+            self.reportFootnotes(t)
+        if not self.suppress[1]:
+            self.reportNumbers(t, footnote)
+        if not footnote:
+            self.reportCaps(t)
+            self.state.endSentence( sentences.endsSentence(t) )
+        self.state.addText(t)
+        self.addWords(t)
+
+    def addWords(self, t):
+        for item in t.split():
+            word = item.strip(".,:;!?+-[]{}()<>\"“‘’”*/")
+            if quoteend_re.search(word):
+                word = word.rstrip(allpunc)
+            if word:
+                if not self.state.inFootnote() or notnumberinfootnote_re.search(word):
+                    (count, ref) = self.wordlist.get(word, (0, None))
+                    ref = self.state.reference if count == 0 else ""
+                    self.wordlist[word] = (count+1, ref)
+
+    def take(self, token):
+        if not token.isTEXT():
+            if not self.state.addMarker(token.type):
+                self.reportError(f"Back to back markers of type {token.type} at {self.state.reference}", 62)
+        else:
+            self.takeText(token.value, self.state.inFootnote())
+
+        if token.isID():
+            self.takeID(token.value)
+        elif token.isC():
+            if not self.suppress[5]:
+                self.verifyVerseCount()  # for the preceding chapter
+            if not self.state.ID:
+                self.reportError("Missing book ID: " + self.state.reference, 62.1)
+                sys.exit(-1)
+            if token.value == "1":
+                self.verifyBookTitle()
+            self.takeC(token.value)
+        elif token.isCL():
+            self.takeCL(token.value)
+        elif token.isP() or token.isPI() or token.isPC() or token.isNB() or token.isM():
+            self.takeP(token.type)
+            if token.value:     # paragraph markers can be followed by text
+                self.reportError("Unexpected: text returned as part of paragraph token." +  self.state.reference, 63)
+                self.takeText(token.value)
+        elif token.isV():
+            self.takeV(token.value)
+        elif isFootnote(token):
+            self.takeFootnote(token)
+        elif token.isS5():
+            self.takeS5()
+        elif token.isS() or token.isMR() or token.isMS() or token.isD() or token.isSP():
+            self.takeSection(token.type)
+        elif token.isQA():
+            self.state.addAcrosticHeading()
+        elif isPoetry(token):
+            self.takeQ(token.type)
+        elif token.isB():
+            self.takeB()
+        elif isTitleToken(token):
+            self.takeTitle(token)
+        elif token.isUSFM():    # non-standard USFM token but is used by UnfoldingWord software
+            self.usfm_version = int(token.value[0])
+        elif token.isUnknown():
+            if token.value == "p":
+                self.reportError("Orphaned paragraph marker after " + self.state.reference, 65)
+            elif token.value == "v":
+                self.reportError("Unnumbered verse after " + self.state.reference, 66)
+            elif self.usfm_version == 2:
+                self.reportError("Invalid USFM token (\\" + token.value + ") near " + self.state.reference, 67)
+
+        if self.config['language_code'] in {"ur"} and isNumericCandidate(token) and re.search(r'[0-9]', token.value):
+            self.reportError("Arabic numerals in footnote at " + self.state.reference, 68)
+
+        self.lastToken = token
+
+    # Reports bad patterns in chapter and verse markers found by scanText().
+    def verifyChapterAndVerseMarkers(self, found, path):
+        for badactor in found.badChapters[0]:
+            self.reportError("Missing newline before chapter marker: " + badactor.group(1) + " in " + path, 69)
+        for badactor in found.badChapters[1]:
+            self.reportError("Missing space before chapter number: " + badactor.group(0) + " in " + path, 70)
+        for badactor in found.badChapters[2]:
+            self.reportError("Missing space after chapter number: " + badactor.group(1) + " in " + path, 71)
+        for badactor in found.badVerses[0]:
+            s = badactor.group(1)
+            if s[0] < ' ' or s[0] > '~': # not printable ascii
+                s = s[1:]
+            self.reportError("Missing white space before verse marker: " + s + " in " + path, 72)
+        for badactor in found.badVerses[1]:
+            self.reportError("Missing space before verse number: " + badactor.group(0) + " in " + path, 73)
+        for badactor in found.badVerses[2]:
+            s = badactor.group(1)
+    #        if s[-1] < ' ' or s[-1] > '~': # not printable ascii
+    #            s = s[:-1]
+            self.reportError("Missing space after verse number: " + s + " in " + path, 74)
+
+    def verifyParagraphCount(self):
+        if self.state.nParagraphs / self.state.chapter <= 2.5 and self.state.nPoetry / self.state.chapter <= 15:
+            self.reportError(f"Low paragraph count ({self.state.nParagraphs + self.state.nPoetry}) for {self.state.ID}", 73.5)
+
+    # Receives the text of an entire book as input, and the results of scanText() for that text if available.
+    # Verifies things that are better done as a whole file.
+    # Can't report verse references because we haven't started to parse the book yet.
+    def verifyWholeFile(self, contents, path, found=None):
+        if found is None:
+            found = self.scanText(contents)
+        self.verifyChapterAndVerseMarkers(found, path)
+
+        if found.orphantext:
+            self.reportOrphans(found.orphans, path)
+
+        if not self.suppress[6]:
+            nembedded = found.nembedded
+            nsingle = found.nsingle - nembedded
+            ndouble = contents.count('"')
+            if ndouble > 0:
+                if nsingle == 0 or self.suppress[7]:
+                    self.reportError(f"Straight quotes in {self.shortname(path)}: {ndouble} doubles.", 75)
+                else:
+                    self.reportError(f"Straight quotes in {self.shortname(path)}: {ndouble} doubles, {nsingle} singles not counting {nembedded} word-medial.", 75)
+            elif nsingle > 0 and not self.suppress[7]:
+                self.reportError(f"Straight quotes in {self.shortname(path)}: {nsingle} singles not counting {nembedded} word-medial.", 75)
+
+    # Receives (line number, line) for each line that follows an empty line and does not start with a backslash.
+    def reportOrphans(self, orphans, path):
+        for (lineno, line) in orphans:
             if not conflict_re.match(line):
-                reportError("Unmarked text at line " + str(lineno) + " in " + path, 76)
+                self.reportError("Unmarked text at line " + str(lineno) + " in " + path, 76)
             # else:
                 #  Will be reported later as an unresolved translation conflict
-        prevline = line
 
-wjwj_re = re.compile(r' \\wj +\\wj\*', flags=re.UNICODE)
-backslasheol_re = re.compile(r'\\ *\n')
+    # Each file is verified from a new State, so what is found in a file depends only on the file and the settings,
+    # whether the files are verified one at a time or in worker processes.
+    # What belongs to the whole run, the word list and the book IDs, is merged by mergeFile() in the order of the files.
+
+    # Corresponding entry point in tx-manager code is verify_contents_quiet()
+    def verifyFile(self, path):
+        result = self.verifyFileResult(path)
+        self.takeResult(path, result)
+
+    # Verifies one file. Messages are reported as they are found, or collected in a worker process.
+    # Returns (content hash, messages collected, words, book IDs, exit), where exit is None, or a tuple of the
+    # exit code if verification ended the run.
+    def verifyFileResult(self, path):
+        input = io.open(path, "r", buffering=1, encoding="utf-8-sig")
+        contents = input.read(-1)
+        input.close()
+        hash = contentHash(path)
+        (words, ids, exit) = self.verifyOneFile(contents, path)
+        return (hash, self.collected or [], words, ids, exit)
+
+    # Verifies the text of one file from a new State.
+    # Returns (words, book IDs, exit) for mergeFile().
+    def verifyOneFile(self, contents, path):
+        (self.state, self.lastToken, self.usfm_version) = (State(), None, 2)
+        (words, self.wordlist) = (self.wordlist, dict())     # collects the words of this file
+        exit = None
+        try:
+            self.verifyContents(contents, path)
+        except parseUsfm.ParseError as e:
+            self.reportError(f"Unable to parse {self.shortname(path)}: {e.message}", 82)
+            exit = (e.code,)
+        except SystemExit as e:
+            exit = (e.code,)
+        finally:
+            (words, self.wordlist) = (self.wordlist, words)
+        return (words, [id for id in self.state.IDs if id], exit)
+
+    # Reports the messages of a file verified in a worker process, then merges the file into the run.
+    def takeResult(self, path, result):
+        (hash, messages, words, ids, exit) = result
+        for (report, *args) in messages:
+            getattr(self, report)(*args)
+        self.mergeFile(path, hash, words, ids, exit)
+
+    # Merges the words and book IDs of a file into those of the run, in the order of the files.
+    # A book ID that an earlier file already had is reported here, after the messages of the later file.
+    def mergeFile(self, path, hash, words, ids, exit):
+        for id in ids:
+            if id in self.bookIDs:
+                self.reportError("Duplicate ID: " + id, 23)
+            self.bookIDs.append(id)
+        self.mergeWords(words)
+        if self.wordIndex:
+            self.indexWords(path, hash, words)
+        if exit:
+            sys.exit(exit[0])
+
+    # Verifies the text of one file. The path is only used in messages.
+    def verifyContents(self, contents, path):
+        self.aligned_usfm = ("lemma=" in contents or "x-occurrences" in contents)
+        found = self.scanText(contents, whole=not self.aligned_usfm)
+        if found.wjwj:
+            self.reportError("Empty \\wj \\wj* pair(s) in " + self.shortname(path), 77)
+        if found.backslasheol:
+            self.reportError("Stranded backslash(es) at end of line(s) in " + self.shortname(path), 78)
+        if found.null:
+            self.reportError("Null bytes found in " + self.shortname(path), 79)
+        if self.aligned_usfm:
+            contents = self.unalign(contents)
+            found = None
+
+        if len(contents) < 100:
+            self.reportError("Incomplete file: " + self.shortname(path), 80)
+        else:
+            self.reportProgress(f"CHECKING {self.shortname(path)}...")
+            sys.stdout.flush()
+            self.verifyWholeFile(contents, self.shortname(path), found)
+            for token in self.iterTokens(contents):    # tokens are parsed as they are taken
+                self.take(token)
+            if (self.usfm_version == 2 or self.aligned_usfm) and not self.state.toc3:
+                self.reportError("No \\toc3 tag in " + self.shortname(path), 81)
+            self.previousVerseCheck()       # checks last verse in the file
+            self.verifyNotEmpty(path)
+            if not self.suppress[5]:
+                self.verifyVerseCount()      # for the last chapter
+            self.verifyChapterCount()
+            self.verifyFootnotes()
+            self.verifyChapterTitles()
+            self.verifyParagraphCount()
+            sys.stderr.flush()
+
+    # Verifies all .usfm files under the specified folder.
+    def verifyDir(self, dir):
+        paths = listFiles(dir)
+        if self.profile is None and (cache_dir or (workers > 1 and len(paths) > 1)):
+            self.verifyFiles(paths)
+        else:
+            for path in paths:
+                self.verifyFile(path)
+        if self.wordIndex:
+            self.wordIndex.removeMissingBooks(dir, paths)
+
+    # Adds the words of one file to the word list.
+    def mergeWords(self, words):
+        for word, (count, ref) in words.items():
+            (oldcount, oldref) = self.wordlist.get(word, (0, None))
+            self.wordlist[word] = (count, ref) if oldcount == 0 else (oldcount + count, "")
+
+    # Updates the word index with the words of one file.
+    def indexWords(self, path, hash, words):
+        self.wordIndex.updateBook(path, self.shortname(path), hash, words)
+
+    # Verifies one file in this process, collecting the messages so that the result can be cached.
+    def collectFileResult(self, path):
+        self.collected = []
+        try:
+            return self.verifyFileResult(path)
+        finally:
+            self.collected = None
+
+    # Verifies the specified files in worker processes, and reports the results in order.
+    # Uses the cached result instead of a worker for each file that has not changed since it was last verified.
+    # A file whose worker fails is verified again in this process, which reports the failure as a serial run would.
+    def verifyFiles(self, paths):
+        from concurrent.futures import ProcessPoolExecutor
+        settings = (dict(self.config), self.suppress, self.std_titles)
+        cachePaths = [resultPath(path, settings) for path in paths]
+        results = [loadResult(cachePath, path) for (cachePath, path) in zip(cachePaths, paths)]
+        pending = [i for (i, result) in enumerate(results) if result is None]
+        executor = ProcessPoolExecutor(max_workers=min(workers, len(pending))) if workers > 1 and len(pending) > 1 else None
+        try:
+            futures = {i: executor.submit(verifyFileWorker, paths[i], settings) for i in pending} if executor else {}
+            for (i, path) in enumerate(paths):
+                result = results[i]
+                if i in futures:
+                    try:
+                        result = futures[i].result()
+                    except Exception:
+                        result = None
+                    if result:
+                        storeResult(cachePaths[i], result)
+                elif result is None:
+                    result = self.collectFileResult(path)
+                    storeResult(cachePaths[i], result)
+                if result:
+                    self.takeResult(path, result)
+                else:
+                    self.verifyFile(path)
+        finally:
+            if executor:
+                executor.shutdown(cancel_futures=True)
+
+    # Starts recording times and counts, if not already started.
+    def startProfile(self):
+        if self.profile is not None:
+            return
+        self.profile = {'total': newProfile(), 'files': {}}
+        for name in profiledFunctions:
+            setattr(self, name, self.profiled(name, getattr(self, name)))
+        self.verifyContents = self.profiledFile(self.verifyContents)
+        self.unalign = self.profiled('unalign_usfm', self.unalign)
+        self.iterTokens = self.profiledTokens(self.iterTokens)
+
+    # Returns the profiles to add to: the total, and the current file's if any.
+    def currentProfiles(self):
+        if self.profileFile is None:
+            return (self.profile['total'],)
+        return (self.profile['total'], self.profile['files'].setdefault(self.profileFile, newProfile()))
+
+    def addTime(self, name, seconds):
+        for p in self.currentProfiles():
+            (calls, total) = p['functions'].get(name, (0, 0.0))
+            p['functions'][name] = (calls + 1, total + seconds)
+
+    def countError(self, errorId):
+        for p in self.currentProfiles():
+            p['errors'][errorId] = p['errors'].get(errorId, 0) + 1
+
+    # Returns a wrapper of the function that records the number of calls and the time spent.
+    def profiled(self, name, function):
+        def call(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.addTime(name, time.perf_counter() - start)
+        return call
+
+    # Returns a wrapper of verifyContents() that makes the file current while it is verified.
+    def profiledFile(self, function):
+        def call(contents, path):
+            self.profileFile = self.shortname(path)
+            try:
+                return function(contents, path)
+            finally:
+                self.profileFile = None
+        return call
+
+    # Returns a wrapper of tokencache.iterTokens() that records the time spent producing each token.
+    def profiledTokens(self, function):
+        def iterTokens(*args, **kwargs):
+            tokens = iter(function(*args, **kwargs))
+            while True:
+                start = time.perf_counter()
+                try:
+                    token = next(tokens)
+                except StopIteration:
+                    return
+                finally:
+                    self.addTime('parse', time.perf_counter() - start)
+                yield token
+        return iterTokens
+
+    # Writes the recorded times and counts to verify_profile.json, with the functions that took the longest first.
+    def writeProfile(self):
+        def toJson(p):
+            functions = sorted(p['functions'].items(), key=lambda item: item[1][1], reverse=True)
+            return {'functions': {name: {'calls': calls, 'seconds': round(seconds, 6)} for (name, (calls, seconds)) in functions},
+                    'errors': {str(errorId): count for (errorId, count) in sorted(p['errors'].items())}}
+        path = os.path.join(self.config['source_dir'], "verify_profile.json")
+        with io.open(path, "tw", encoding='utf-8', newline='\n') as output:
+            json.dump({'total': toJson(self.profile['total']),
+                       'files': {name: toJson(p) for (name, p) in self.profile['files'].items()}}, output, indent=2)
+
+# Parallel verification
+# Each file is verified in a worker process, which collects the messages and words instead of reporting them.
+# The main process takes the results in the serial order, reports the messages and merges each file into the run,
+# so the output is the same as a serial run.
+# Because the results of the workers do not depend on the preceding files, they are also what is cached.
+# With a single worker, the files that are not cached are verified in this process instead.
+workers = int(os.environ.get('USFM_VERIFY_WORKERS', '1'))
+cache_dir = os.environ.get('USFM_VERIFY_CACHE', "")
+
+# Runs in a worker process.
+# Verifies one file with the specified settings, and returns the result of verifyFileResult().
+def verifyFileWorker(path, settings):
+    (config, suppress, std_titles) = settings
+    verifier = Verifier(config['language_code'], suppress, std_titles, config=config)
+    return verifier.collectFileResult(path)
+
+# Result cache
+# Each file has one entry, which is replaced when the file changes. The entry is found by the path of the file
+# and the settings, and is used if the content hash of the file matches.
+# The fingerprint changes whenever the code that verifies a file could change, which invalidates all existing entries.
+fingerprint = hashlib.sha1()
+for module in (sys.modules[__name__], parseUsfm, tokencache, usfm_utils, sentences, footnoted_verses, usfm_verses,
+               versification):
+    try:
+        with open(module.__file__, 'rb') as input:
+            fingerprint.update(input.read())
+    except (OSError, TypeError):    # no source file
+        fingerprint.update(module.__name__.encode('ascii'))
+fingerprint = fingerprint.digest()
+
+def contentHash(path):
+    with open(path, 'rb') as input:
+        return hashlib.sha1(input.read()).hexdigest()
+
+# Returns the path of the cache entry for the specified file, or None if there is no cache.
+def resultPath(path, settings):
+    if not cache_dir:
+        return None
+    (config, suppress, std_titles) = settings
+    h = hashlib.sha1(fingerprint)
+    h.update(repr((sorted(config.items()), suppress, std_titles, str(Path(path).resolve()))).encode('utf-8', 'surrogatepass'))
+    return os.path.join(cache_dir, h.hexdigest() + ".vfy")
+
+# Returns the cached result for the specified file, or None if the file has changed or there is no usable entry.
+def loadResult(cachePath, path):
+    if not cachePath:
+        return None
+    try:
+        with open(cachePath, 'rb') as input:
+            result = pickle.load(input)
+        return result if result[0] == contentHash(path) else None
+    except Exception:
+        return None
+
+# Writes the result to the cache. Failure to write is not an error; the result just is not cached.
+def storeResult(cachePath, result):
+    if not cachePath:
+        return
+    tmppath = f"{cachePath}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(tmppath, 'wb') as output:
+            pickle.dump(result, output)
+        os.replace(tmppath, cachePath)
+    except (OSError, pickle.PicklingError):
+        if os.path.exists(tmppath):
+            os.remove(tmppath)
+
+# Removes all entries from the cache.
+def clearCache():
+    if cache_dir and os.path.isdir(cache_dir):
+        for fname in os.listdir(cache_dir):
+            if fname.endswith(".vfy"):
+                os.remove(os.path.join(cache_dir, fname))
+
+# Profiling
+# Each method of the Verifier in profiledFunctions is replaced by a wrapper that adds up the number of calls and
+# the time spent in the method. The time of a function includes the time of the functions it calls, so the time of take()
+# includes that of takeText(), which includes that of reportPunctuation(), and so on.
+# parse is the time spent parsing tokens, and unalign_usfm the time spent removing the alignment from aligned files.
+# The counts are kept for each file and for the whole run. Files are verified one at a time in this process
+# when profiling, without the result cache, so that every file is timed.
+profiledFunctions = ('verifyContents', 'scanText', 'verifyWholeFile', 'take', 'takeID', 'takeC', 'takeCL', 'takeV',
+                     'takeP', 'takeQ', 'takeSection', 'takeTitle', 'takeFootnote', 'takeText', 'reportPunctuation',
+                     'reportCaps', 'reportNumbers', 'reportFootnotes', 'addWords', 'previousVerseCheck',
+                     'verifyNotEmpty', 'verifyVerseCount', 'verifyChapterCount', 'verifyFootnotes',
+                     'verifyChapterTitles', 'verifyParagraphCount', 'reportError', 'dumpWords')
+
+def newProfile():
+    return {'functions': {}, 'errors': {}}
+
+# The Verifier of a script run, which the functions below work on.
+defaultVerifier = Verifier("")
+
+def reportError(msg, errorId=0, summarize_only=False):
+    defaultVerifier.reportError(msg, errorId, summarize_only)
+
+def reportProgress(msg):
+    defaultVerifier.reportProgress(msg)
+
+def reportStatus(msg):
+    defaultVerifier.reportStatus(msg)
 
-# Corresponding entry point in tx-manager code is verify_contents_quiet()
 def verifyFile(path):
-    global aligned_usfm
-    input = io.open(path, "r", buffering=1, encoding="utf-8-sig")
-    contents = input.read(-1)
-    input.close()
-
-    if wjwj_re.search(contents):
-        reportError("Empty \\wj \\wj* pair(s) in " + shortname(path), 77)
-    if backslasheol_re.search(contents):
-        reportError("Stranded backslash(es) at end of line(s) in " + shortname(path), 78)
-    if '\x00' in contents:
-        reportError("Null bytes found in " + shortname(path), 79)
-    aligned_usfm = ("lemma=" in contents or "x-occurrences" in contents)
-    if aligned_usfm:
-        contents = usfm_utils.unalign_usfm(contents)
-
-    if len(contents) < 100:
-        reportError("Incomplete file: " + shortname(path), 80)
-    else:
-        reportProgress(f"CHECKING {shortname(path)}...")
-        sys.stdout.flush()
-        tokens = parseUsfm.parseString(contents)    # Slow!
-        verifyWholeFile(contents, shortname(path))  # placed after parseUsfm so that its error messages come after the long parsing time pause
-        for token in tokens:
-            take(token)
-        if (usfm_version == 2 or aligned_usfm) and not state.toc3:
-            reportError("No \\toc3 tag in " + shortname(path), 81)
-        previousVerseCheck()       # checks last verse in the file
-        verifyNotEmpty(path)
-        if not suppress[5]:
-            verifyVerseCount()      # for the last chapter
-        verifyChapterCount()
-        verifyFootnotes()
-        verifyChapterTitles()
-        verifyParagraphCount()
-        state.addID("")
-        sys.stderr.flush()
-
-# Verifies all .usfm files under the specified folder.
+    defaultVerifier.verifyFile(path)
+
+def verifyContents(contents, path):
+    defaultVerifier.verifyContents(contents, path)
+
+def verifyWholeFile(contents, path, found=None):
+    defaultVerifier.verifyWholeFile(contents, path, found)
+
 def verifyDir(dir):
-    dirpath = Path(dir)
-    for path in dirpath.iterdir():
-        if path.name[0] != '.':         # ignore hidden files
-            if path.is_dir():
-                # It's a directory, recurse into it
-                verifyDir(path)
-            elif path.is_file() and path.name[-3:].lower() == 'sfm':
-                verifyFile(path)
+    defaultVerifier.verifyDir(dir)
+
+def reportIssues():
+    defaultVerifier.reportIssues()
+
+def dumpWords():
+    defaultVerifier.dumpWords()
 
 def main(app=None):
-    global config
-    global suppress
-    global language_code
-    global gui
+    global defaultVerifier
 
-    gui = app
     config = configmanager.ToolsConfigManager().get_section('VerifyUSFM')   # configmanager version
     if config:
         source_dir = config['source_dir']
+        suppress = [False]*12
         for i in range(1, len(suppress)):
             suppress[i] = config.getboolean('suppress'+str(i), fallback = False)
         language_code = config['language_code']
-        if language_code in {'diu','en','es','es-419','gl','ha','hr','id','kcn','kpj','nag','plt','pmy','pt-br','sw','tl','tpi'}:    # ASCII content
-            suppress[9] = True
-        if language_code in {'as','bn','gu','hi','kn','ml','mr','nag','ne','or','pa','ru','ta','te','zh'}:    # ASCII content
-            suppress[9] = False
-        global std_titles
         std_titles = [ config.get('standard_chapter_title', fallback = '') ]
         if std_titles == ['']:
             std_titles = []
         uv = config.get('usfm_version', fallback = "2")
         usfm_version = int(uv[0])
-
-        global state
-        state = State()
-        global issues
-        issues = dict()
+        verifier = Verifier(language_code, suppress, std_titles, config=config, gui=app)
+        defaultVerifier = verifier
+        if os.environ.get('USFM_VERIFY_PROFILE') or config.getboolean('profile', fallback = False):
+            verifier.startProfile()
 
         file = config['filename']    # configmanager version
+        indexPath = os.environ.get('USFM_WORD_INDEX') or config.get('word_index', fallback = '')
+        if indexPath:
+            verifier.wordIndex = wordindex.WordIndex(indexPath)
 
         if file:
             path = os.path.join(source_dir, file)
             if os.path.isfile(path):
-                verifyFile(path)
+                verifier.verifyFile(path)
             else:
-                reportError(f"No such file: {path}")
+                verifier.reportError(f"No such file: {path}")
         else:
-            verifyDir(source_dir)
+            verifier.verifyDir(source_dir)
 
-        global issuesFile
-        if issuesFile:
-            reportIssues()
-            issuesFile.close()
-            issuesFile = None
+        if verifier.issuesFile:
+            verifier.reportIssues()
+            verifier.issuesFile.close()
+            verifier.issuesFile = None
         else:
-            reportStatus("No issues to report.")
-        dumpWords()
-        reportStatus("\nDone.")
+            verifier.reportStatus("No issues to report.")
+        verifier.dumpWords()
+        if verifier.wordIndex:
+            verifier.wordIndex.close()
+            verifier.wordIndex = None
+        if verifier.profile is not None:
+            verifier.writeProfile()
+        verifier.reportStatus("\nDone.")
         sys.stdout.flush()
-    if gui:
-        gui.event_generate('<<ScriptEnd>>', when="tail")
+    if app:
+        app.event_generate('<<ScriptEnd>>', when="tail")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+# Versification tables compiled from usfm_verses.verseCounts, for tools that need to compare, sort or
+# range-check references as integers.
+# Every verse of the Bible has an ordinal, counting from 0 at GEN 1:1, with the books in their sort order.
+# Conversions between (book, chapter, verse) and ordinals take constant time.
+# Books without chapters (FRT, BAK, ...) have no verses and no ordinals.
+# Copy this module along with usfm_verses.py to use it in other folders.
+
+import array
+import usfm_verses
+
+books = [id for (id, info) in sorted(usfm_verses.verseCounts.items(), key=lambda item: item[1]['sort'])]
+bookIndex = {id: i for (i, id) in enumerate(books)}
+
+chapterVerses = dict()      # the number of verses in each chapter of each book, array('H')
+chapterStarts = dict()      # the ordinal of verse 1 of each chapter of each book, and the end of the book, array('I')
+ordinalBooks = array.array('B')     # the index in books of the book of each ordinal
+ordinalChapters = array.array('H')  # the chapter of each ordinal
+for id in books:
+    chapterVerses[id] = array.array('H', usfm_verses.verseCounts[id]['verses'])
+    starts = array.array('I', [len(ordinalChapters)])
+    for (chapter, n) in enumerate(chapterVerses[id], start=1):
+        ordinalBooks.extend([bookIndex[id]] * n)
+        ordinalChapters.extend([chapter] * n)
+        starts.append(len(ordinalChapters))
+    chapterStarts[id] = starts
+nOrdinals = len(ordinalChapters)
+
+# Returns the number of chapters in the specified book.
+def nChapters(id):
+    return len(chapterVerses[id])
+
+# Returns the number of verses in the specified chapter. Raises IndexError if the book does not have the chapter.
+def nVerses(id, chapter):
+    return chapterVerses[id][chapter-1]
+
+# Returns True if the book has the specified chapter and verse.
+def isValid(id, chapter, verse):
+    verses = chapterVerses.get(id)
+    return verses is not None and 0 < chapter <= len(verses) and 0 < verse <= verses[chapter-1]
+
+# Returns the ordinal of the specified verse, or -1 if the book does not have the verse.
+def ordinal(id, chapter, verse):
+    if not isValid(id, chapter, verse):
+        return -1
+    return chapterStarts[id][chapter-1] + verse - 1
+
+# Returns (book, chapter, verse) of the specified ordinal. Raises ValueError if there is no such ordinal.
+def reference(ordinal):
+    if not 0 <= ordinal < nOrdinals:
+        raise ValueError(f"No verse has ordinal {ordinal}")
+    chapter = ordinalChapters[ordinal]
+    id = books[ordinalBooks[ordinal]]
+    return (id, chapter, ordinal - chapterStarts[id][chapter-1] + 1)
+
+# Returns the range of ordinals of the specified book, chapter, or verses.
+# Omit the chapter for the whole book, and the verses for the whole chapter.
+# Verses past the end of the chapter are left out.
+def ordinals(id, chapter=None, firstVerse=1, lastVerse=None):
+    starts = chapterStarts[id]
+    if chapter is None:
+        return range(starts[0], starts[-1])
+    end = starts[chapter]
+    if lastVerse is not None:
+        end = min(end, starts[chapter-1] + lastVerse)
+    return range(starts[chapter-1] + firstVerse - 1, end)
+
+# Generates (book, chapter, verse) of each verse from the first to the last ordinal, inclusive.
+def references(first, last):
+    for n in range(first, last + 1):
+        yield reference(n)
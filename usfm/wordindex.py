@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+# Persistent word-frequency index of a translation, kept in an SQLite database.
+# Stores the count of each word in each book (file), along with the reference of the first occurrence.
+# verifyUSFM updates the index with the words of each file it verifies. A file that has not changed since it
+# was last indexed is skipped, so the index stays current without reading the whole translation again.
+# Other tools can add the words of other files (tN, tQ, ...) with updateBook().
+#
+# Usage: python wordindex.py <index file> rare [max count] | unique | new
+#    rare    lists the words that occur no more than max count (default 2) times in all books
+#    unique  lists the words that occur in only one book
+#    new     lists the words added by the latest run that changed the index, which were not in any book before it
+
+import os
+import sqlite3
+import sys
+from datetime import datetime
+from pathlib import Path
+
+schema = """
+CREATE TABLE IF NOT EXISTS runs (id INTEGER PRIMARY KEY, started TEXT);
+CREATE TABLE IF NOT EXISTS books (id INTEGER PRIMARY KEY, path TEXT UNIQUE, name TEXT, hash TEXT, run INTEGER);
+CREATE TABLE IF NOT EXISTS words (id INTEGER PRIMARY KEY, word TEXT UNIQUE);
+CREATE TABLE IF NOT EXISTS new_words (run INTEGER, word INTEGER, PRIMARY KEY (run, word)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS counts (book INTEGER, word INTEGER, count INTEGER, ref TEXT, PRIMARY KEY (book, word)) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS counts_word ON counts (word);
+"""
+
+class WordIndex:
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(schema)
+        self.run = None
+
+    def close(self):
+        self.connection.close()
+
+    # Starts a new run, and remembers the words that are in the index now, at the end of the previous run.
+    # Words added from now on that are not among them are listed by newWords().
+    # updateBook() starts the run when it first changes the index, so a run that changes nothing is not recorded.
+    def startRun(self):
+        with self.connection:
+            db = self.connection
+            self.run = db.execute("INSERT INTO runs (started) VALUES (?)",
+                                  (datetime.now().isoformat(timespec='seconds'),)).lastrowid
+            db.execute("DROP TABLE IF EXISTS temp.previous_words")
+            db.execute("CREATE TEMP TABLE previous_words (word INTEGER PRIMARY KEY)")
+            db.execute("INSERT INTO temp.previous_words SELECT DISTINCT word FROM counts")
+
+    # Returns True if the index has the words of the specified file with the specified content hash.
+    def isCurrent(self, path, hash):
+        row = self.connection.execute("SELECT hash FROM books WHERE path = ?", (bookPath(path),)).fetchone()
+        return row is not None and row[0] == hash
+
+    # Replaces the words of the specified file, unless the index already has them.
+    # words is {word: (count, reference of the first occurrence)}, as collected by verifyUSFM.
+    def updateBook(self, path, name, hash, words):
+        if self.isCurrent(path, hash):
+            return
+        if self.run is None:
+            self.startRun()
+        with self.connection:
+            db = self.connection
+            db.execute("INSERT INTO books (path, name, hash, run) VALUES (?, ?, ?, ?) "
+                       "ON CONFLICT (path) DO UPDATE SET name = excluded.name, hash = excluded.hash, run = excluded.run",
+                       (bookPath(path), name, hash, self.run))
+            book = db.execute("SELECT id FROM books WHERE path = ?", (bookPath(path),)).fetchone()[0]
+            db.execute("DELETE FROM counts WHERE book = ?", (book,))
+            db.executemany("INSERT OR IGNORE INTO words (word) VALUES (?)", ((word,) for word in words))
+            db.executemany("INSERT OR IGNORE INTO new_words (run, word) SELECT ?, id FROM words "
+                           "WHERE word = ? AND id NOT IN temp.previous_words",
+                           ((self.run, word) for word in words))
+            db.executemany("INSERT INTO counts (book, word, count, ref) "
+                           "VALUES (?, (SELECT id FROM words WHERE word = ?), ?, ?)",
+                           ((book, word, count, ref) for (word, (count, ref)) in words.items()))
+
+    # Removes the files under the specified folder that are not in paths, which are the files now in the folder.
+    def removeMissingBooks(self, dir, paths):
+        prefix = os.path.join(bookPath(dir), "")
+        keep = {bookPath(path) for path in paths}
+        rows = self.connection.execute("SELECT id, path FROM books WHERE substr(path, 1, ?) = ?", (len(prefix), prefix))
+        removed = [(id,) for (id, path) in rows.fetchall() if path not in keep]
+        with self.connection:
+            self.connection.executemany("DELETE FROM counts WHERE book = ?", removed)
+            self.connection.executemany("DELETE FROM books WHERE id = ?", removed)
+
+    # Returns (word, total count) of the words that occur no more than maxCount times in all books.
+    def rareWords(self, maxCount=2):
+        return self.connection.execute(
+            "SELECT words.word, SUM(counts.count) AS total FROM counts JOIN words ON words.id = counts.word "
+            "GROUP BY counts.word HAVING total <= ? ORDER BY words.word", (maxCount,)).fetchall()
+
+    # Returns (word, book name, count) of the words that occur in only one book.
+    def uniqueWords(self):
+        return self.connection.execute(
+            "SELECT words.word, books.name, counts.count FROM counts JOIN words ON words.id = counts.word "
+            "JOIN books ON books.id = counts.book "
+            "GROUP BY counts.word HAVING COUNT(*) = 1 ORDER BY books.name, words.word").fetchall()
+
+    # Returns (word, book name, reference) of each word added by the specified run, or by the latest run
+    # if none is specified, that was not in any book at the end of the run before, and is still in one or more books.
+    def newWords(self, run=None):
+        if run is None:
+            run = self.connection.execute("SELECT MAX(id) FROM runs").fetchone()[0]
+        return self.connection.execute(
+            "SELECT words.word, books.name, counts.ref FROM new_words JOIN words ON words.id = new_words.word "
+            "JOIN counts ON counts.word = words.id JOIN books ON books.id = counts.book "
+            "WHERE new_words.run = ? GROUP BY words.id ORDER BY words.word", (run,)).fetchall()
+
+# Files are identified by their full path.
+def bookPath(path):
+    return str(Path(path).resolve())
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[2] not in {'rare', 'unique', 'new'} or not os.path.isfile(sys.argv[1]):
+        sys.stderr.write("Usage: python wordindex.py <index file> rare [max count] | unique | new\n")
+        exit(-1)
+    index = WordIndex(sys.argv[1])
+    if sys.argv[2] == 'rare':
+        rows = index.rareWords(int(sys.argv[3]) if len(sys.argv) > 3 else 2)
+    elif sys.argv[2] == 'unique':
+        rows = index.uniqueWords()
+    else:
+        rows = index.newWords()
+    for row in rows:
+        sys.stdout.write("\t".join(str(value) for value in row) + "\n")
+    index.close()